@@ -0,0 +1,560 @@
+import abc
+import contextlib
+import glob
+import os
+import re
+import threading
+import uuid
+
+import pandas as pd
+import peewee
+
+from typing import Iterator, List, Optional, Tuple
+
+from .database import DATA_DB, DataVersionModel, TransactionConnection
+
+try:
+    import duckdb
+
+except ImportError:  # duckdb is an optional dependency
+    duckdb = None
+
+# peewee fields used to represent columns of the columnar engines, keyed by the start of the column type name
+_FIELD_TYPES = (
+    ('BOOL', peewee.BooleanField),
+    ('TINYINT', peewee.IntegerField),
+    ('SMALLINT', peewee.IntegerField),
+    ('INTEGER', peewee.IntegerField),
+    ('BIGINT', peewee.BigIntegerField),
+    ('HUGEINT', peewee.BigIntegerField),
+    ('UTINYINT', peewee.IntegerField),
+    ('USMALLINT', peewee.IntegerField),
+    ('UINTEGER', peewee.IntegerField),
+    ('UBIGINT', peewee.BigIntegerField),
+    ('FLOAT', peewee.FloatField),
+    ('REAL', peewee.FloatField),
+    ('DOUBLE', peewee.DoubleField),
+    ('DECIMAL', peewee.DecimalField),
+    ('VARCHAR', peewee.TextField),
+    ('TEXT', peewee.TextField),
+    ('TIMESTAMP', peewee.DateTimeField),
+    ('DATE', peewee.DateField),
+    ('BLOB', peewee.BlobField),
+)
+
+# Queries are built with peewee against this (never connected) database and executed by the storage backend
+_QUERY_DATABASE = peewee.SqliteDatabase(None)
+
+
+class _SharedLock:
+    """Lock that can be held by any number of readers, or by a single writer."""
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+
+    @contextlib.contextmanager
+    def shared(self):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._writing)
+            self._readers += 1
+
+        try:
+            yield
+
+        finally:
+            with self._condition:
+                self._readers -= 1
+                self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        with self._condition:
+            self._condition.wait_for(lambda: not self._writing and not self._readers)
+            self._writing = True
+
+        try:
+            yield
+
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+# DuckDB can't open read-only and read-write connections to the same file at the same time in one process, so the
+# connections of each database file are coordinated by a lock shared by all of the backends of the process
+_file_locks = {}
+_file_locks_lock = threading.Lock()
+
+
+def _file_lock(path: str) -> _SharedLock:
+    with _file_locks_lock:
+        return _file_locks.setdefault(os.path.abspath(path), _SharedLock())
+
+
+def _quote(name: str) -> str:
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def _literal(value: str) -> str:
+    return "'{}'".format(value.replace("'", "''"))
+
+
+class StorageBackend(abc.ABC):
+    """Interface for storing data model tables outside of the SQLite data database."""
+
+    @abc.abstractmethod
+    def table_exists(self, table_name: str) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def columns(self, table_name: str) -> List[Tuple[str, str]]:
+        """Return the name and type of each column in a table."""
+        pass
+
+    @abc.abstractmethod
+    def write(self, table_name: str, df: pd.DataFrame, primary_key: str = None):
+        """Append a DataFrame to a table, creating the table if it doesn't exist."""
+        pass
+
+    @abc.abstractmethod
+    def read_frame(self, query: peewee.ModelSelect) -> pd.DataFrame:
+        pass
+
+    @abc.abstractmethod
+    def iter_frames(self, query: peewee.ModelSelect, chunksize: int) -> Iterator[pd.DataFrame]:
+        pass
+
+    @property
+    def location(self) -> str:
+        """Where the backend stores its tables. Query cache keys include it, so results aren't shared between stores."""
+        return f'{type(self).__name__}:{id(self)}:{os.getpid()}'
+
+    def _model_database(self) -> peewee.Database:
+        """Database that generated models are bound to."""
+        return _QUERY_DATABASE
+
+    def generate_model(self, table_name: str) -> peewee.Model:
+        """Create a peewee model for a table. The model is used to build queries, which are executed by the backend."""
+        attributes = {}
+
+        for name, column_type in self.columns(table_name):
+            field = next(
+                (field for prefix, field in _FIELD_TYPES if column_type.upper().startswith(prefix)), peewee.BareField
+            )
+            attributes[name] = field(column_name=name, null=True)
+
+        attributes['Meta'] = type(
+            'Meta', (), dict(database=self._model_database(), table_name=table_name, primary_key=False)
+        )
+
+        return type(table_name, (peewee.Model,), attributes)
+
+
+class DuckDBBackend(StorageBackend):
+    """Store data model tables in a DuckDB database file.
+
+    DuckDB stores tables by column, which makes aggregates over a few columns of wide tables much faster than SQLite.
+    Queries are built with the data model's peewee model as usual. Note that SQL functions specific to SQLite may not
+    be available in DuckDB.
+
+    A database file is only connected to for the duration of each operation, and queries use read-only connections, so
+    other processes (isolated monitors, for example) can read the file whenever it isn't being written.
+    """
+    def __init__(self, database: str = ':memory:'):
+        if duckdb is None:
+            raise ImportError('duckdb is required for DuckDB and Parquet storage.')
+
+        self.database = database
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def location(self) -> str:
+        if self.database == ':memory:':
+            return super().location
+
+        return f'{type(self).__name__}:{os.path.abspath(self.database)}'
+
+    @contextlib.contextmanager
+    def _connect(self, read_only: bool = False) -> Iterator['duckdb.DuckDBPyConnection']:
+        """Connect to the database for a single operation. An in-memory database only exists as long as its connection,
+        so it's kept open and a new cursor (which can be used by a single thread) is returned instead.
+        """
+        if self.database == ':memory:':
+            with self._lock:
+                if self._connection is None:
+                    self._connection = duckdb.connect(self.database)
+
+                cursor = self._connection.cursor()
+
+            with cursor:
+                yield cursor
+
+            return
+
+        lock = _file_lock(self.database)
+
+        with lock.shared() if read_only else lock.exclusive():
+            connection = duckdb.connect(self.database, read_only=read_only)
+
+            try:
+                yield connection
+
+            finally:
+                connection.close()
+
+    @staticmethod
+    def _table_exists(cursor: 'duckdb.DuckDBPyConnection', table_name: str) -> bool:
+        return cursor.execute(
+            'SELECT count(*) FROM information_schema.tables WHERE table_name = ?', [table_name]
+        ).fetchone()[0] > 0
+
+    def table_exists(self, table_name: str) -> bool:
+        if self.database != ':memory:' and not os.path.exists(self.database):
+            return False  # Read-only connections can't create the file
+
+        with self._connect(read_only=True) as cursor:
+            return self._table_exists(cursor, table_name)
+
+    def columns(self, table_name: str) -> List[Tuple[str, str]]:
+        with self._connect(read_only=True) as cursor:
+            return [row[:2] for row in cursor.execute(f'DESCRIBE {_quote(table_name)}').fetchall()]
+
+    def write(self, table_name: str, df: pd.DataFrame, primary_key: str = None):
+        with self._connect() as cursor:
+            cursor.register('new_data', df)
+
+            if not self._table_exists(cursor, table_name):
+                definitions = [
+                    f'{_quote(name)} {column_type}{" PRIMARY KEY" if name == primary_key else ""}'
+                    for name, column_type, *_ in cursor.execute('DESCRIBE SELECT * FROM new_data').fetchall()
+                ]
+
+                cursor.execute(f'CREATE TABLE {_quote(table_name)} ({", ".join(definitions)})')
+
+            columns = ', '.join(_quote(name) for name in df.columns)
+            cursor.execute(f'INSERT INTO {_quote(table_name)} ({columns}) SELECT {columns} FROM new_data')
+            cursor.unregister('new_data')
+
+    def _execute(self, cursor: 'duckdb.DuckDBPyConnection', query: peewee.ModelSelect) -> 'duckdb.DuckDBPyConnection':
+        sql, params = query.sql()
+
+        return cursor.execute(sql, params)
+
+    def read_frame(self, query: peewee.ModelSelect) -> pd.DataFrame:
+        with self._connect(read_only=True) as cursor:
+            return self._execute(cursor, query).df()
+
+    def iter_frames(self, query: peewee.ModelSelect, chunksize: int) -> Iterator[pd.DataFrame]:
+        # The connection stays open (and the database can't be written) until the chunks have been consumed
+        with self._connect(read_only=True) as cursor:
+            result = self._execute(cursor, query)
+            names = [description[0] for description in result.description]
+
+            while True:
+                rows = result.fetchmany(chunksize)
+
+                if not rows:
+                    break
+
+                yield pd.DataFrame.from_records(rows, columns=names)
+
+
+class ParquetBackend(DuckDBBackend):
+    """Store each data model table as a directory of Parquet files, optionally partitioned (hive-style) by one or more
+    columns. Each ingest adds new files; existing files are never rewritten. Tables are queried with DuckDB.
+
+    Primary keys are checked on ingest, but unlike a database table, nothing prevents the files from being modified
+    outside of monitorframe.
+    """
+    def __init__(self, directory: str, partition_by: List[str] = None):
+        super().__init__()
+        self.directory = directory
+        self.partition_by = partition_by
+
+    @property
+    def location(self) -> str:
+        return f'{type(self).__name__}:{os.path.abspath(self.directory)}'
+
+    def _files(self, table_name: str) -> str:
+        return os.path.join(self.directory, table_name, '**', '*.parquet')
+
+    def table_exists(self, table_name: str) -> bool:
+        return bool(glob.glob(self._files(table_name), recursive=True))
+
+    def _view(self, cursor: 'duckdb.DuckDBPyConnection', table_name: str):
+        """Expose the Parquet files of a table as a view with the table's name."""
+        files = _literal(self._files(table_name))
+        cursor.execute(
+            f'CREATE OR REPLACE VIEW {_quote(table_name)} AS '
+            f'SELECT * FROM read_parquet({files}, hive_partitioning = {bool(self.partition_by)})'
+        )
+
+    def columns(self, table_name: str) -> List[Tuple[str, str]]:
+        with self._connect() as cursor:
+            self._view(cursor, table_name)
+
+            return [row[:2] for row in cursor.execute(f'DESCRIBE {_quote(table_name)}').fetchall()]
+
+    def write(self, table_name: str, df: pd.DataFrame, primary_key: str = None):
+        with self._connect() as cursor:
+            cursor.register('new_data', df)
+
+            if primary_key and self.table_exists(table_name):
+                self._view(cursor, table_name)
+                duplicates = cursor.execute(
+                    f'SELECT count(*) FROM {_quote(table_name)} WHERE {_quote(primary_key)} IN '
+                    f'(SELECT {_quote(primary_key)} FROM new_data)'
+                ).fetchone()[0]
+
+                if duplicates:
+                    raise duckdb.ConstraintException(
+                        f'Duplicate key: {duplicates} rows of new data already exist in {table_name}'
+                    )
+
+            output = os.path.join(self.directory, table_name)
+            os.makedirs(output, exist_ok=True)
+
+            if self.partition_by:
+                partitions = ', '.join(_quote(name) for name in self.partition_by)
+                cursor.execute(
+                    f'COPY new_data TO {_literal(output)} (FORMAT PARQUET, PARTITION_BY ({partitions}), '
+                    f"OVERWRITE_OR_IGNORE, FILENAME_PATTERN 'part-{{uuid}}')"
+                )
+
+            else:
+                output = os.path.join(output, f'part-{uuid.uuid4()}.parquet')
+                cursor.execute(f'COPY new_data TO {_literal(output)} (FORMAT PARQUET)')
+
+            cursor.unregister('new_data')
+
+    def _execute(self, cursor: 'duckdb.DuckDBPyConnection', query: peewee.ModelSelect) -> 'duckdb.DuckDBPyConnection':
+        self._view(cursor, query.model._meta.table_name)
+
+        return super()._execute(cursor, query)
+
+
+# Bounds of a time range; None for an open end
+_Range = Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]
+
+_PERIODS = {'year': 'Y', 'month': 'M'}
+
+
+class PartitionedBackend(StorageBackend):
+    """Store each data model table in the SQLite data database as one table per year or month of a time column.
+
+    A view with the data model's table name combines the partitions, so model and query_to_pandas work as usual.
+    Queries that filter the time column with comparisons (combined with &) only read the partitions that overlap the
+    requested range. Old partitions can be moved into a standalone database file with archive, without rewriting the
+    other partitions.
+
+    The time column should contain datetimes (or strings that pandas can convert). If mjd is True, numeric times are
+    treated as Modified Julian Dates.
+    """
+    def __init__(self, time_column: str, period: str = 'year', mjd: bool = False, database: peewee.Database = DATA_DB):
+        if period not in _PERIODS:
+            raise ValueError(f'period must be one of {list(_PERIODS)}')
+
+        self.time_column = time_column
+        self.period = period
+        self.mjd = mjd
+        self.database = database
+
+    @property
+    def location(self) -> str:
+        return f'{type(self).__name__}:{os.path.abspath(self.database.database)}'
+
+    def _model_database(self) -> peewee.Database:
+        # The view that combines the partitions can be queried directly (model.select().count(), for example)
+        return self.database
+
+    def _to_timestamps(self, values) -> pd.Series:
+        if self.mjd:
+            return pd.to_datetime(pd.Series(values), unit='D', origin=pd.Timestamp('1858-11-17'))
+
+        return pd.to_datetime(pd.Series(values))
+
+    def _partition_name(self, table_name: str, period: pd.Period) -> str:
+        if self.period == 'year':
+            return f'{table_name}_{period.year}'
+
+        return f'{table_name}_{period.year}_{period.month:02d}'
+
+    def partitions(self, table_name: str, start=None, end=None) -> List[str]:
+        """Return the names of the partitions of a table, in time order, that overlap the range [start, end]."""
+        pattern = re.compile(rf'{re.escape(table_name)}_(\d{{4}})(?:_(\d{{2}}))?')
+        start = self._to_timestamps([start])[0] if start is not None else None
+        end = self._to_timestamps([end])[0] if end is not None else None
+        found = []
+
+        for name in self.database.get_tables():
+            match = pattern.fullmatch(name)
+
+            if not match or bool(match.group(2)) != (self.period == 'month'):
+                continue
+
+            period = pd.Period(year=int(match.group(1)), month=int(match.group(2) or 1), freq=_PERIODS[self.period])
+
+            if (start is None or period.end_time >= start) and (end is None or period.start_time <= end):
+                found.append((period, name))
+
+        return [name for _, name in sorted(found)]
+
+    def table_exists(self, table_name: str) -> bool:
+        return table_name in [view.name for view in self.database.get_views()] or bool(self.partitions(table_name))
+
+    @staticmethod
+    def _columns(db: peewee.Database, table_name: str) -> List[Tuple[str, str]]:
+        return [row[1:3] for row in db.execute_sql(f'PRAGMA table_info({_quote(table_name)})').fetchall()]
+
+    def columns(self, table_name: str) -> List[Tuple[str, str]]:
+        with self.database as db:
+            return self._columns(db, table_name)
+
+    def _create_view(self, db: peewee.Database, table_name: str):
+        """(Re)create the view that combines the partitions of a table."""
+        db.execute_sql(f'DROP VIEW IF EXISTS {_quote(table_name)}')
+        partitions = self.partitions(table_name)
+
+        if not partitions:
+            return
+
+        # Select the columns by name so that partitions with a different column order can be combined
+        columns = ', '.join(_quote(name) for name, _ in self._columns(db, partitions[0]))
+        selects = ' UNION ALL '.join(f'SELECT {columns} FROM {_quote(name)}' for name in partitions)
+        db.execute_sql(f'CREATE VIEW {_quote(table_name)} AS {selects}')
+
+    def write(self, table_name: str, df: pd.DataFrame, primary_key: str = None):
+        periods = self._to_timestamps(df[self.time_column].values).dt.to_period(_PERIODS[self.period])
+        existing = set(self.partitions(table_name))
+        created = False
+
+        with self.database as db:
+            for period, partition in df.groupby(periods.values, sort=True):
+                name = self._partition_name(table_name, period)
+
+                if name not in existing:
+                    # noinspection PyUnresolvedReferences
+                    db.execute_sql(pd.io.sql.get_schema(partition, name, keys=primary_key))
+                    db.execute_sql(
+                        f'CREATE INDEX {_quote(f"{name}_{self.time_column}")} '
+                        f'ON {_quote(name)} ({_quote(self.time_column)})'
+                    )
+                    created = True
+
+                partition.to_sql(name, TransactionConnection(db), if_exists='append', index=False)
+
+            if created:
+                self._create_view(db, table_name)
+
+    def _bounds(self, node) -> _Range:
+        """Find the time range selected by a query's where clause. Only comparisons of the time column combined with
+        AND are used; anything else selects the full range.
+        """
+        if not isinstance(node, peewee.Expression):
+            return None, None
+
+        if node.op == peewee.OP.AND:
+            (left_start, left_end), (right_start, right_end) = self._bounds(node.lhs), self._bounds(node.rhs)
+            starts = [value for value in (left_start, right_start) if value is not None]
+            ends = [value for value in (left_end, right_end) if value is not None]
+
+            return max(starts, default=None), min(ends, default=None)
+
+        if not isinstance(node.lhs, peewee.Field) or node.lhs.column_name != self.time_column:
+            return None, None
+
+        if node.op == peewee.OP.BETWEEN and isinstance(node.rhs, peewee.NodeList):
+            low, _, high = node.rhs.nodes
+            return tuple(self._to_timestamps([low, high]))
+
+        if isinstance(node.rhs, peewee.Node):
+            return None, None
+
+        value = self._to_timestamps([node.rhs])[0]
+
+        if node.op in (peewee.OP.GT, peewee.OP.GTE):
+            return value, None
+
+        if node.op in (peewee.OP.LT, peewee.OP.LTE):
+            return None, value
+
+        if node.op == peewee.OP.EQ:
+            return value, value
+
+        return None, None
+
+    def _sql(self, query: peewee.ModelSelect) -> Tuple[str, list]:
+        """Compile a query, replacing the view with only the partitions that overlap the selected time range."""
+        sql, params = query.sql()
+        table_name = query.model._meta.table_name
+        start, end = self._bounds(query._where)
+
+        if start is None and end is None:
+            return sql, params
+
+        partitions = self.partitions(table_name, start, end)
+
+        if partitions:
+            columns = ', '.join(_quote(name) for name, _ in self._columns(self.database, table_name))
+            source = ' UNION ALL '.join(f'SELECT {columns} FROM {_quote(name)}' for name in partitions)
+
+        else:
+            source = f'SELECT * FROM {_quote(table_name)} WHERE 0'
+
+        return sql.replace(f'FROM {_quote(table_name)} AS', f'FROM ({source}) AS', 1), params
+
+    def read_frame(self, query: peewee.ModelSelect) -> pd.DataFrame:
+        with self.database as db:
+            cursor = db.execute_sql(*self._sql(query))
+            names = [description[0] for description in cursor.description]
+
+            return pd.DataFrame.from_records(cursor.fetchall(), columns=names)
+
+    def iter_frames(self, query: peewee.ModelSelect, chunksize: int) -> Iterator[pd.DataFrame]:
+        with self.database as db:
+            cursor = db.execute_sql(*self._sql(query))
+            names = [description[0] for description in cursor.description]
+
+            while True:
+                rows = cursor.fetchmany(chunksize)
+
+                if not rows:
+                    break
+
+                yield pd.DataFrame.from_records(rows, columns=names)
+
+    def archive(self, table_name: str, partition: str, path: str):
+        """Move a partition into a standalone SQLite database file, and remove it from the table."""
+        if partition not in self.partitions(table_name):
+            raise ValueError(f'{partition} is not a partition of {table_name}')
+
+        db = self.database
+        opened = db.connect(reuse_if_open=True)
+
+        try:
+            # ATTACH and DETACH can't be executed in a transaction
+            db.execute_sql('ATTACH DATABASE ? AS archive', (path,))
+
+            try:
+                with db.atomic():
+                    name = _quote(partition)
+                    schema = db.execute_sql(
+                        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (partition,)
+                    ).fetchone()[0]
+                    db.execute_sql(schema.replace(f'CREATE TABLE {name}', f'CREATE TABLE archive.{name}', 1))
+                    db.execute_sql(f'INSERT INTO archive.{name} SELECT * FROM main.{name}')
+
+            finally:
+                db.execute_sql('DETACH DATABASE archive')
+
+            with db.atomic():
+                db.execute_sql(f'DROP TABLE {_quote(partition)}')
+                self._create_view(db, table_name)
+                DataVersionModel.increment(table_name)
+
+        finally:
+            if opened:
+                db.close()
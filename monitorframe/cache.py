@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import pickle
+import re
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from typing import Any, Union
+
+from . import SETTINGS
+
+try:
+    import pyarrow.feather as feather
+
+except ImportError:  # pyarrow is an optional dependency; pickle is used without it
+    feather = None
+
+QUERY_CACHE_SETTINGS = SETTINGS.get('query_cache') or {}
+
+
+def _feather_compatible(df: pd.DataFrame) -> bool:
+    """Determine if a DataFrame can be written to Feather: default index, string column names and no object columns
+    holding arrays.
+    """
+    if feather is None or not isinstance(df.index, pd.RangeIndex) or df.index.start != 0 or df.index.step != 1:
+        return False
+
+    if not all(isinstance(name, str) for name in df.columns):
+        return False
+
+    return not any(
+        df[key].dtype == 'O' and not df.empty and isinstance(df[key].iloc[0], (np.ndarray, list, bytes))
+        for key in df.columns
+    )
+
+
+class QueryCache:
+    """On-disk cache of query results.
+
+    Results are stored in Feather (columnar) files when possible, or pickle files otherwise (for example, DataFrames
+    with array columns). The cache is keyed by the normalized SQL, its parameters, and the data version of the queried
+    table, so results are invalidated whenever new data is ingested. The least recently used results are evicted
+    when the cache grows beyond max_size bytes.
+    """
+    def __init__(self, directory: str, max_size: int = 1024 ** 3):
+        self.directory = directory
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(sql: str, params: Any, *extra: Any) -> str:
+        """Create a cache key from a SQL statement (normalized for whitespace), its parameters and anything else the
+        result depends on.
+        """
+        normalized = re.sub(r'\s+', ' ', sql.strip())
+
+        return hashlib.sha256(json.dumps([normalized, params, extra], default=repr).encode()).hexdigest()
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.directory, f'{key}.{extension}')
+
+    def get(self, key: str) -> Union[pd.DataFrame, None]:
+        """Return the cached result for key, or None if it isn't cached."""
+        readers = [('pkl', pd.read_pickle)]
+
+        if feather is not None:
+            readers.insert(0, ('feather', feather.read_feather))
+
+        for extension, read in readers:
+            path = self._path(key, extension)
+
+            try:
+                df = read(path)
+
+            except FileNotFoundError:
+                continue
+
+            try:
+                os.utime(path)  # Mark as recently used
+
+            except FileNotFoundError:  # Evicted in the meantime
+                pass
+
+            return df
+
+        return
+
+    def put(self, key: str, df: pd.DataFrame):
+        """Store a result, and evict the least recently used results if the cache is too large."""
+        extension = 'feather' if _feather_compatible(df) else 'pkl'
+
+        with tempfile.NamedTemporaryFile(dir=self.directory, delete=False, suffix='.tmp') as f:
+            temporary = f.name
+
+        if extension == 'feather':
+            feather.write_feather(df, temporary, compression='uncompressed')
+
+        else:
+            df.to_pickle(temporary, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temporary, self._path(key, extension))
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used results until the cache is no larger than max_size."""
+        with self._lock:
+            entries = []
+
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(('.feather', '.pkl')):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+
+            for _, size, path in sorted(entries):
+                if total <= self.max_size:
+                    break
+
+                try:
+                    os.remove(path)
+
+                except FileNotFoundError:
+                    pass
+
+                total -= size
+
+    def clear(self):
+        """Remove all cached results."""
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(('.feather', '.pkl')):
+                os.remove(entry.path)
+
+
+def default_cache() -> Union[QueryCache, None]:
+    """Return the query cache set in the configuration file, if any."""
+    if QUERY_CACHE_SETTINGS.get('directory'):
+        return QueryCache(QUERY_CACHE_SETTINGS['directory'], QUERY_CACHE_SETTINGS.get('max_size', 1024 ** 3))
+
+    return
@@ -0,0 +1,151 @@
+import argparse
+import importlib
+import inspect
+import os
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Type
+
+from . import SETTINGS, profiling
+from .database import RunStateModel
+from .datamodel import BaseDataModel
+from .monitor import BaseMonitor
+from .scheduler import Job, Scheduler, SUCCESS
+
+
+def discover(targets: List[str], base: type) -> list:
+    """Find the classes derived from base given by a list of targets. A target is either a module path, in which case
+    all non-abstract subclasses of base defined in that module are used, or a module path and class name given as
+    "module:ClassName".
+    """
+    found = []
+
+    for target in targets:
+        module_name, _, class_name = target.partition(':')
+        module = importlib.import_module(module_name)
+
+        if class_name:
+            cls = getattr(module, class_name)
+
+            if not (inspect.isclass(cls) and issubclass(cls, base)):
+                raise TypeError(f'{target} is not a {base.__name__}.')
+
+            found.append(cls)
+
+            continue
+
+        found.extend(
+            cls for _, cls in inspect.getmembers(module, inspect.isclass)
+            if issubclass(cls, base) and cls is not base and not inspect.isabstract(cls)
+            and cls.__module__ == module.__name__
+        )
+
+    return found
+
+
+def _changed(monitor: Type[BaseMonitor]) -> bool:
+    """Determine if a monitor's data model has been successfully ingested since the monitor's last successful run."""
+    ingested = Scheduler.last_success(Job(monitor.data_model))
+    last_run = Scheduler.last_success(Job(monitor))
+
+    return ingested is not None and (last_run is None or ingested > last_run)
+
+
+def _run(scheduler: Scheduler, job: Job) -> tuple:
+    """Run a job and return its status and duration."""
+    start = time.perf_counter()
+    status = scheduler.run_job(job)
+
+    return job, status, time.perf_counter() - start
+
+
+def execute(classes: list, jobs: int = 1, retries: int = 0, profile_dir: str = None, timings: bool = False) -> int:
+    """Execute data model ingests or monitors and return the number of failures."""
+    scheduler = Scheduler([cls for cls in classes if issubclass(cls, BaseMonitor)])
+    to_run = [Job(cls, retries=retries) for cls in classes]
+
+    if profile_dir:
+        profiling.enable(profile_dir)
+
+    try:
+        with ThreadPoolExecutor(jobs) as executor:
+            results = list(executor.map(lambda job: _run(scheduler, job), to_run))
+
+    finally:
+        if profile_dir:
+            profiling.disable()
+
+    if timings:
+        width = max([len(job.name) for job, _, _ in results] + [4])
+        print(f'{"name":<{width}}  {"kind":<7}  {"status":<7}  seconds')
+
+        for job, status, seconds in sorted(results, key=lambda result: result[2], reverse=True):
+            print(f'{job.name:<{width}}  {job.kind:<7}  {status:<7}  {seconds:.2f}')
+
+    for job, status, _ in results:
+        if status != SUCCESS:
+            error = RunStateModel.select().where(RunStateModel.job == job.name).order_by(RunStateModel.id.desc()).get()
+            print(f'{job.name} {status}:\n{error.error}', file=sys.stderr)
+
+    if profile_dir and os.path.isdir(profile_dir):
+        print(profiling.summarize(profile_dir))
+
+    return sum(status != SUCCESS for _, status, _ in results)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='monitorframe', description='Ingest data models and run monitors.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True  # The required keyword of add_subparsers is only available in Python 3.7+
+
+    run = subparsers.add_parser('run', help='Run monitors.')
+    ingest = subparsers.add_parser('ingest', help='Ingest new data for data models.')
+
+    for subparser, kind in ((run, 'monitors'), (ingest, 'data_models')):
+        subparser.add_argument(
+            'targets',
+            nargs='*',
+            help=f'Module paths ("package.module") or classes ("package.module:ClassName") of the {kind} to execute. '
+                 f'Defaults to the "{kind}" list in the configuration file.'
+        )
+        subparser.add_argument('-j', '--jobs', type=int, default=1, help='Number of jobs to execute in parallel.')
+        subparser.add_argument('--retries', type=int, default=0, help='Number of times to retry a failed job.')
+        subparser.add_argument(
+            '--profile', metavar='DIR', help='Profile each stage of each job and write the profiles to DIR.'
+        )
+        subparser.add_argument('--timings', action='store_true', help='Print the duration of each job.')
+
+    run.add_argument(
+        '--only-changed',
+        action='store_true',
+        help='Only run monitors whose data model has been ingested since their last successful run.'
+    )
+
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    """Entry point for the monitorframe command. The exit status is the number of failed jobs (capped at 255)."""
+    args = build_parser().parse_args(argv)
+
+    kind, base = ('monitors', BaseMonitor) if args.command == 'run' else ('data_models', BaseDataModel)
+    targets = args.targets or SETTINGS.get(kind, [])
+
+    if not targets:
+        print(f'No {kind} were given or configured.', file=sys.stderr)
+
+        return 2
+
+    RunStateModel.create_table(safe=True)
+    classes = discover(targets, base)
+
+    if args.command == 'run' and args.only_changed:
+        classes = [monitor for monitor in classes if _changed(monitor)]
+
+    return min(execute(classes, args.jobs, args.retries, args.profile, args.timings), 255)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
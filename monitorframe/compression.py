@@ -0,0 +1,212 @@
+import bz2
+import lzma
+import numpy as np
+import pandas as pd
+import struct
+import time
+import zlib
+
+from typing import Callable, Dict, Iterable, List, NamedTuple, Tuple, Union
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4
+except ImportError:
+    lz4 = None
+
+# Encoded arrays are self-describing blobs:
+#   magic (4 bytes) | flags (1 byte) | codec name length (1 byte) | codec name | level (signed byte)
+#   | dtype length (1 byte) | dtype (numpy dtype.str) | ndim (1 byte) | shape (ndim unsigned 64 bit integers) | payload
+MAGIC = b'MFA1'
+SHUFFLED = 0x01
+
+_HEADER = struct.Struct('<4sBB')
+
+
+class Codec(NamedTuple):
+    compress: Callable[[bytes, int], bytes]
+    decompress: Callable[[bytes], bytes]
+    default_level: int
+
+
+CODECS: Dict[str, Codec] = {
+    'none': Codec(lambda data, level: data, lambda data: data, 0),
+    'zlib': Codec(zlib.compress, zlib.decompress, 6),
+    'bz2': Codec(bz2.compress, bz2.decompress, 9),
+    'lzma': Codec(lambda data, level: lzma.compress(data, preset=level), lzma.decompress, 6),
+}
+
+if zstandard is not None:
+    CODECS['zstd'] = Codec(
+        lambda data, level: zstandard.ZstdCompressor(level=level).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data),
+        3
+    )
+
+if lz4 is not None:
+    CODECS['lz4'] = Codec(lambda data, level: lz4.compress(data, compression_level=level), lz4.decompress, 0)
+
+# Codec settings for a column: a codec name, or a (codec name, level) tuple
+CodecSpec = Union[str, Tuple[str, int]]
+
+
+def _codec(name: str) -> Codec:
+    try:
+        return CODECS[name]
+
+    except KeyError:
+        raise ValueError(f'Codec {name} is not available. Available codecs: {list(CODECS)}') from None
+
+
+def parse_spec(spec: CodecSpec) -> Tuple[str, int]:
+    """Return the codec name and level of a codec setting."""
+    if isinstance(spec, str):
+        return spec, _codec(spec).default_level
+
+    name, level = spec
+
+    return name, _codec(name).default_level if level is None else level
+
+
+def shuffle(data: bytes, itemsize: int) -> bytes:
+    """Group the bytes of each element by significance, which makes floating point data more compressible."""
+    if itemsize <= 1:
+        return data
+
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, itemsize).T.tobytes()
+
+
+def unshuffle(data: bytes, itemsize: int) -> np.ndarray:
+    """Reverse shuffle. Returns a new, writable byte array."""
+    buffer = np.frombuffer(data, dtype=np.uint8)
+
+    if itemsize <= 1:
+        return buffer.copy()
+
+    return buffer.reshape(itemsize, -1).T.copy().reshape(-1)
+
+
+def encode(array: np.ndarray, codec: CodecSpec = 'zlib', byte_shuffle: bool = None) -> bytes:
+    """Compress an array into a self-describing blob. By default, floating point arrays are byte-shuffled."""
+    array = np.asarray(array)
+    name, level = parse_spec(codec)
+
+    if array.dtype.hasobject:
+        raise TypeError('Arrays of Python objects cannot be encoded')
+
+    if byte_shuffle is None:
+        byte_shuffle = array.dtype.kind in 'fc'
+
+    data = array.tobytes()  # C order
+
+    if byte_shuffle:
+        data = shuffle(data, array.dtype.itemsize)
+
+    dtype = array.dtype.str.encode()
+
+    return b''.join([
+        _HEADER.pack(MAGIC, SHUFFLED if byte_shuffle else 0, len(name)),
+        name.encode(),
+        struct.pack('<bB', level, len(dtype)),
+        dtype,
+        struct.pack(f'<B{array.ndim}Q', array.ndim, *array.shape),
+        _codec(name).compress(data, level),
+    ])
+
+
+def is_encoded(value) -> bool:
+    """True if value is a blob created by encode."""
+    return isinstance(value, (bytes, memoryview)) and bytes(value[:len(MAGIC)]) == MAGIC
+
+
+def decode(blob: bytes) -> np.ndarray:
+    """Decompress a blob created by encode into an array."""
+    blob = memoryview(blob)
+    magic, flags, name_length = _HEADER.unpack_from(blob)
+
+    if magic != MAGIC:
+        raise ValueError('Not an encoded array')
+
+    offset = _HEADER.size
+    name = bytes(blob[offset:offset + name_length]).decode()
+    offset += name_length
+
+    _, dtype_length = struct.unpack_from('<bB', blob, offset)
+    offset += 2
+    dtype = np.dtype(bytes(blob[offset:offset + dtype_length]).decode())
+    offset += dtype_length
+
+    ndim = blob[offset]
+    shape = struct.unpack_from(f'<{ndim}Q', blob, offset + 1)
+    offset += 1 + 8 * ndim
+
+    data = _codec(name).decompress(bytes(blob[offset:]))
+    data = unshuffle(data, dtype.itemsize if flags & SHUFFLED else 1)  # Copied so that the array is writable
+
+    return data.view(dtype).reshape(shape)
+
+
+def example_spectra(count: int = 100, size: int = 16384, seed: int = 0) -> List[np.ndarray]:
+    """Create synthetic float32 spectra (a continuum with absorption lines and noise) for benchmarks."""
+    rng = np.random.default_rng(seed)
+    wavelength = np.linspace(1100, 1800, size)
+    spectra = []
+
+    for _ in range(count):
+        flux = 1e-14 * (1 + 0.2 * np.sin(wavelength / 100 + rng.uniform(0, np.pi)))
+
+        for center in rng.uniform(1100, 1800, 20):
+            flux *= 1 - 0.5 * np.exp(-0.5 * ((wavelength - center) / 0.5) ** 2)
+
+        spectra.append((flux + rng.normal(0, 1e-16, size)).astype(np.float32))
+
+    return spectra
+
+
+def benchmark(arrays: Iterable[np.ndarray] = None, codecs: Iterable[CodecSpec] = None,
+              shuffles: Iterable[bool] = (False, True), repeat: int = 3) -> pd.DataFrame:
+    """Report the compression ratio and encode/decode throughput (MB/s of raw data) of each codec setting.
+
+    arrays defaults to example_spectra. codecs defaults to every available codec at its default level. The
+    Python-literal text format used for uncompressed array columns is included for reference.
+    """
+    arrays = [np.ascontiguousarray(array) for array in (arrays if arrays is not None else example_spectra())]
+    codecs = list(codecs) if codecs is not None else [name for name in CODECS if name != 'none']
+    raw_size = sum(array.nbytes for array in arrays)
+    text_size = sum(len(repr(array.tolist())) for array in arrays)
+
+    results = [dict(codec='text', level=None, shuffle=False, ratio=raw_size / text_size, encode=None, decode=None)]
+
+    for spec in codecs:
+        name, level = parse_spec(spec)
+
+        for byte_shuffle in shuffles:
+            encode_time = decode_time = np.inf
+
+            for _ in range(repeat):
+                start = time.perf_counter()
+                blobs = [encode(array, (name, level), byte_shuffle) for array in arrays]
+                encode_time = min(encode_time, time.perf_counter() - start)
+
+                start = time.perf_counter()
+                for blob in blobs:
+                    decode(blob)
+
+                decode_time = min(decode_time, time.perf_counter() - start)
+
+            results.append(
+                dict(
+                    codec=name,
+                    level=level,
+                    shuffle=byte_shuffle,
+                    ratio=raw_size / sum(len(blob) for blob in blobs),
+                    encode=raw_size / encode_time / 1e6,
+                    decode=raw_size / decode_time / 1e6,
+                )
+            )
+
+    return pd.DataFrame(results).rename(columns={'encode': 'encode_MBps', 'decode': 'decode_MBps'})
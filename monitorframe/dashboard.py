@@ -0,0 +1,186 @@
+import contextlib
+import html
+import json
+import os
+import tempfile
+import threading
+
+from datetime import datetime
+from typing import Any, List
+
+from . import SETTINGS
+
+try:
+    import fcntl
+
+except ImportError:  # Not available on Windows; the index is then only locked between threads
+    fcntl = None
+
+DASHBOARD_SETTINGS = SETTINGS.get('dashboard') or {}
+
+# Number of characters of the results shown on the dashboard
+_RESULTS_LENGTH = 300
+
+_build_lock = threading.Lock()
+
+_INDEX_TEMPLATE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; width: 100%; }}
+th, td {{ border-bottom: 1px solid #ddd; padding: 0.5em; text-align: left; vertical-align: top; }}
+td.results {{ font-family: monospace; font-size: 0.85em; }}
+.success {{ color: #2e7d32; }}
+.failed {{ color: #c62828; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<p>Updated {updated}</p>
+<table>
+<tr><th>Monitor</th><th>Date</th><th>Status</th><th>Results</th></tr>
+{rows}
+</table>
+</body>
+</html>
+'''
+
+
+def _write_atomic(path: str, content: str):
+    """Write a file by replacing it, so that readers never see a partially written file."""
+    with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(path), delete=False, suffix='.tmp') as f:
+        f.write(content)
+
+    os.replace(f.name, path)
+
+
+@contextlib.contextmanager
+def _locked(path: str):
+    """Hold an exclusive lock on a lock file, between threads and (where fcntl is available) processes."""
+    with _build_lock, open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)  # Released when the file is closed
+
+        yield
+
+
+class Dashboard:
+    """Static HTML index of all monitors with their latest figure, results and run status.
+
+    Each monitor has an entry (a JSON file in <directory>/entries) that holds a signature of its latest output and the
+    rendered HTML for that monitor. An entry is only rendered again when its signature changes (the latest stored
+    results, the figure file or the status), and the index page is only rewritten when an entry has changed.
+    Monitors only write their own entry, and the index is read and rewritten while holding a lock, so monitors that run
+    concurrently don't overwrite each other's updates.
+    """
+    def __init__(self, directory: str = None, title: str = None):
+        self.directory = directory or DASHBOARD_SETTINGS.get('directory')
+        self.title = title or DASHBOARD_SETTINGS.get('title', 'Monitors')
+
+        if self.directory is None:
+            raise ValueError('A dashboard directory must be given or set in the configuration file.')
+
+        self.index = os.path.join(self.directory, 'index.html')
+        self._lock = os.path.join(self.directory, '.lock')
+        self._entries = os.path.join(self.directory, 'entries')
+
+        os.makedirs(self._entries, exist_ok=True)
+
+    def _entry_path(self, name: str) -> str:
+        return os.path.join(self._entries, f'{name}.json')
+
+    def entry(self, name: str) -> dict:
+        """Return the dashboard entry of a monitor, or None if it doesn't have one."""
+        try:
+            with open(self._entry_path(name)) as f:
+                return json.load(f)
+
+        except FileNotFoundError:
+            return
+
+    def entries(self) -> List[dict]:
+        """Return all dashboard entries, sorted by monitor name."""
+        entries = (self.entry(os.path.splitext(filename)[0]) for filename in sorted(os.listdir(self._entries)))
+
+        return [entry for entry in entries if entry is not None]
+
+    @staticmethod
+    def _signature(monitor: Any, status: str) -> dict:
+        """Describe the latest output of a monitor from its stored results and figure file."""
+        latest = None
+
+        if monitor.results_table is not None:
+            row = monitor.results_table.order_by(monitor.datetime_col.desc()).first()
+            latest = row.datetime if row is not None else None
+
+        figure = monitor.output if os.path.exists(monitor.output) else None
+
+        return {
+            'results': str(latest) if latest is not None else monitor.date.isoformat(),
+            'figure': figure,
+            'figure_mtime': os.path.getmtime(figure) if figure else None,
+            'status': status
+        }
+
+    def _render(self, monitor: Any, signature: dict) -> str:
+        """Render the table row of a monitor."""
+        name = html.escape(monitor.__class__.__name__)
+
+        if signature['figure']:
+            link = html.escape(os.path.relpath(signature['figure'], self.directory))
+            name = f'<a href="{link}">{name}</a>'
+
+        try:
+            results = json.dumps(monitor.format_results() or monitor.results, default=str)
+
+        except TypeError:
+            results = repr(monitor.results)
+
+        if len(results) > _RESULTS_LENGTH:
+            results = results[:_RESULTS_LENGTH] + '...'
+
+        status = html.escape(signature['status'])
+
+        return (
+            f'<tr><td>{name}</td><td>{html.escape(signature["results"])}</td>'
+            f'<td class="{status}">{status}</td><td class="results">{html.escape(results)}</td></tr>'
+        )
+
+    def update(self, monitor: Any, status: str = 'success') -> bool:
+        """Update the entry of a monitor (a BaseMonitor instance) if its output has changed, and rebuild the index if
+        needed. Returns True if the entry was updated.
+        """
+        name = monitor.__class__.__name__
+        signature = self._signature(monitor, status)
+        existing = self.entry(name)
+
+        if existing is not None and existing['signature'] == signature:
+            return False
+
+        entry = {'name': name, 'signature': signature, 'html': self._render(monitor, signature)}
+        _write_atomic(self._entry_path(name), json.dumps(entry))
+
+        self.build()
+
+        return True
+
+    def remove(self, name: str):
+        """Remove a monitor's entry from the dashboard."""
+        if os.path.exists(self._entry_path(name)):
+            os.remove(self._entry_path(name))
+            self.build()
+
+    def build(self):
+        """Write the index page from the rendered entries."""
+        with _locked(self._lock):
+            _write_atomic(
+                self.index,
+                _INDEX_TEMPLATE.format(
+                    title=html.escape(self.title),
+                    updated=datetime.now().isoformat(timespec='seconds'),
+                    rows='\n'.join(entry['html'] for entry in self.entries())
+                )
+            )
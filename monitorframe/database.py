@@ -1,7 +1,12 @@
-from peewee import Model, DateTimeField
+import json
+import numpy as np
+import threading
+
+from peewee import Model, DateTimeField, CharField, IntegerField, TextField, FloatField, CompositeKey, BlobField
 from playhouse.sqlite_ext import JSONField, SqliteExtDatabase
 
 from . import SETTINGS
+from .sqlfunctions import register_array_functions
 
 DATA_DB_SETTINGS = SETTINGS['data']['db_settings']
 RESULTS_DB_SETTINGS = SETTINGS['results']['db_settings']
@@ -9,18 +14,169 @@ RESULTS_DB_SETTINGS = SETTINGS['results']['db_settings']
 DATA_DB = SqliteExtDatabase(**DATA_DB_SETTINGS)
 RESULTS_DB = SqliteExtDatabase(**RESULTS_DB_SETTINGS)
 
+register_array_functions(DATA_DB)
+
+# Rows per statement when writing or reading in batches; keeps the number of SQL variables under SQLite's limit
+_BATCH_SIZE = 200
+
 # TODO: Add outliers table
 
 
+def _json_default(obj):
+    """Convert NumPy scalars and arrays for JSON serialization."""
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+
+    if isinstance(obj, bytes):
+        return obj.decode()
+
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def _json_dumps(obj) -> str:
+    return json.dumps(obj, default=_json_default)
+
+
+class TransactionConnection:
+    """Connection for DataFrame.to_sql that leaves commits and rollbacks to the enclosing peewee transaction, so that
+    writes made with pandas can be part of a larger transaction (or savepoint).
+    """
+    def __init__(self, database: SqliteExtDatabase):
+        self.database = database
+
+    def cursor(self):
+        return self.database.cursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
 class BaseResultsModel(Model):
 
     class Meta:
         database = RESULTS_DB
         table_name = None
 
+    _models = {}
+    _models_lock = threading.Lock()
+
     @classmethod
-    def define_table_name(cls, table_name):
-        cls._meta.table_name = table_name
+    def for_monitor(cls, table_name: str):
+        """Return the results model for a monitor's table. Models are created once and shared, so monitors running
+        concurrently never change each other's table name.
+        """
+        with cls._models_lock:
+            if table_name not in cls._models:
+                meta = type('Meta', (), {'table_name': table_name})
+                cls._models[table_name] = type(f'{table_name}Results', (cls,), {'Meta': meta})
+
+            return cls._models[table_name]
 
     datetime = DateTimeField(primary_key=True, verbose_name='Monitor execution date and time')
-    result = JSONField(verbose_name='Monitoring results')
+    result = JSONField(json_dumps=_json_dumps, verbose_name='Monitoring results')
+
+
+class RunStateModel(Model):
+    """Record of scheduled data model ingests and monitor runs."""
+
+    class Meta:
+        database = RESULTS_DB
+        table_name = 'RunState'
+
+    job = CharField(index=True, verbose_name='Data model or monitor class name')
+    kind = CharField(verbose_name='Job kind: ingest or monitor')
+    started = DateTimeField(verbose_name='Job start date and time')
+    finished = DateTimeField(null=True, verbose_name='Job end date and time')
+    status = CharField(verbose_name='Job status')
+    attempts = IntegerField(default=1, verbose_name='Number of attempts')
+    error = TextField(null=True, verbose_name='Traceback of the last failed attempt')
+
+
+class FileManifestModel(Model):
+    """Cache of the files that have been scanned for each data model, and the row that was extracted from each file."""
+
+    class Meta:
+        database = DATA_DB
+        table_name = 'FileManifest'
+        primary_key = CompositeKey('data_model', 'path')
+
+    data_model = CharField(verbose_name='Data model table name')
+    path = TextField(verbose_name='File path')
+    size = IntegerField(verbose_name='File size in bytes')
+    mtime = FloatField(verbose_name='File modification time')
+    row = JSONField(null=True, json_dumps=_json_dumps, verbose_name='Extracted row')
+
+
+class DataVersionModel(Model):
+    """Version of each data table, incremented whenever new data is ingested."""
+
+    class Meta:
+        database = DATA_DB
+        table_name = 'DataVersion'
+
+    table = CharField(primary_key=True, verbose_name='Data model table name')
+    version = IntegerField(default=0, verbose_name='Number of ingests')
+
+    @classmethod
+    def get_version(cls, table: str) -> int:
+        if not cls.table_exists():
+            return 0
+
+        row = cls.get_or_none(cls.table == table)
+
+        return row.version if row is not None else 0
+
+    @classmethod
+    def increment(cls, table: str):
+        cls.create_table(safe=True)
+        cls.insert(table=table, version=1).on_conflict(
+            conflict_target=[cls.table], update={cls.version: cls.version + 1}
+        ).execute()
+
+
+class ArrayStoreModel(Model):
+    """Distinct values of deduplicated array columns, keyed by a hash of their content."""
+
+    class Meta:
+        database = DATA_DB
+        table_name = 'ArrayStore'
+
+    digest = CharField(primary_key=True, verbose_name='Hash of the array dtype, shape and data')
+    dtype = CharField(verbose_name='Array dtype')
+    shape = JSONField(verbose_name='Array shape')
+    data = BlobField(verbose_name='Array data (C order)')
+
+    @classmethod
+    def store(cls, arrays: dict):
+        """Add arrays, given as a dictionary of digest to array, that aren't stored yet."""
+        if not arrays:
+            return
+
+        rows = [
+            dict(digest=digest, dtype=array.dtype.str, shape=list(array.shape), data=array.tobytes())
+            for digest, array in arrays.items()
+        ]
+
+        with cls._meta.database.atomic():
+            cls.create_table(safe=True)
+
+            for start in range(0, len(rows), _BATCH_SIZE):
+                cls.insert_many(rows[start:start + _BATCH_SIZE]).on_conflict_ignore().execute()
+
+    @classmethod
+    def load(cls, digests: list) -> dict:
+        """Return a dictionary of digest to read-only array for the given digests."""
+        digests = list(digests)
+        arrays = {}
+
+        with cls._meta.database:
+            for start in range(0, len(digests), _BATCH_SIZE):
+                query = cls.select().where(cls.digest.in_(digests[start:start + _BATCH_SIZE])).tuples()
+
+                for digest, dtype, shape, data in query:
+                    arrays[digest] = np.frombuffer(data, dtype=dtype).reshape(shape)  # Read-only view of the blob
+
+        return arrays
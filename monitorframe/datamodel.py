@@ -1,19 +1,158 @@
 import abc
 import ast
+import hashlib
 import numpy as np
+import os
 import pandas as pd
 import peewee
+import re
+import sqlite3
+import uuid
 
 from playhouse.reflection import generate_models
-from typing import List, Dict, Union
+from typing import Any, Callable, List, Dict, Union, Iterable, Iterator
 
-from .database import DATA_DB
+from .cache import QueryCache, default_cache
+from .compression import decode, encode, is_encoded
+from .database import DATA_DB, ArrayStoreModel, DataVersionModel, TransactionConnection
+from .filescan import FileScanner
+from .profiling import profile_stage
+from .sharedmem import SharedFrame
+from .sqlfunctions import register_array_functions
+
+# Row-wise or column-wise data, NumPy structured arrays, DataFrames, or Arrow tables (pyarrow.Table)
+NewData = Union[List[dict], Dict[str, Union[list, np.ndarray]], np.ndarray, pd.DataFrame, Any]
+
+# Tables named in the FROM and JOIN clauses of a query's SQL
+_QUERY_TABLES = re.compile(r'(?:FROM|JOIN) "([^"]+)"')
+
+# Rows fetched from the cursor at a time when reading a full query result
+_FETCH_ROWS = 10_000
+
+# numpy dtypes used when reading typed columns directly from the database cursor
+_FIELD_DTYPES = {
+    peewee.IntegerField: np.int64,
+    peewee.BigIntegerField: np.int64,
+    peewee.FloatField: np.float64,
+    peewee.DoubleField: np.float64,
+    peewee.BooleanField: np.bool_,
+}
+
+
+def _object_array(values: list) -> np.ndarray:
+    """Create a 1D object array from values without numpy attempting to broadcast nested sequences."""
+    array = np.empty(len(values), dtype=object)
+
+    for i, value in enumerate(values):
+        array[i] = value
+
+    return array
+
+
+def _column_array(values: tuple, field: peewee.Field = None) -> Union[np.ndarray, pd.Series]:
+    """Convert a column of values read from the database into a typed array. The dtype is taken from the model field
+    if possible, otherwise it's inferred.
+    """
+    dtype = _FIELD_DTYPES.get(type(field))
+
+    if dtype is not None:
+        try:
+            return np.fromiter(values, dtype=dtype, count=len(values))
+
+        except (TypeError, ValueError):  # NULL or non-numeric values present; fall back to inference
+            pass
+
+    return pd.Series(values, dtype=object).infer_objects().values
+
+
+class _ColumnBuffer:
+    """Growable array that a column is read into, block by block. Typed while the values fit the field's dtype, and an
+    object array otherwise.
+    """
+    def __init__(self, field: peewee.Field = None, capacity: int = _FETCH_ROWS):
+        self.dtype = _FIELD_DTYPES.get(type(field))
+        self.array = np.empty(capacity, dtype=self.dtype or object)
+        self.size = 0
+
+    def extend(self, values: tuple):
+        end = self.size + len(values)
+
+        if end > len(self.array):
+            self.array.resize(max(end, 2 * len(self.array)), refcheck=False)  # In place where the allocator can
+
+        if self.dtype is not None:
+            try:
+                self.array[self.size:end] = np.fromiter(values, dtype=self.dtype, count=len(values))
+                self.size = end
+
+                return
+
+            except (TypeError, ValueError):  # NULL or non-numeric values present; fall back to inference
+                self.dtype = None
+                self.array = self.array.astype(object)
+
+        self.array[self.size:end] = values
+        self.size = end
+
+    def finish(self) -> np.ndarray:
+        self.array.resize(self.size, refcheck=False)
+
+        if self.dtype is not None:
+            return self.array
+
+        return pd.Series(self.array, dtype=object, copy=False).infer_objects().values
+
+
+def _wrap_column(values: Any) -> Any:
+    """Return a column that can be used to build a DataFrame without copying. Multi-dimensional arrays become object
+    columns of row views.
+    """
+    if isinstance(values, np.ndarray) and values.ndim > 1:
+        return _object_array(list(values))
+
+    return values
+
+
+def _array_digest(array: np.ndarray) -> str:
+    """Hash the dtype, shape and content of an array."""
+    digest = hashlib.blake2b(f'{array.dtype.str}{array.shape}'.encode(), digest_size=20)
+    digest.update(np.ascontiguousarray(array).data)
+
+    return digest.hexdigest()
+
+
+def _numeric_time(values: pd.Series) -> np.ndarray:
+    """Convert numeric times, datetimes or datetime strings to floats that can be binned."""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=float)
+
+    return pd.to_datetime(values).to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(float)
+
+
+def _to_dataframe(data: NewData) -> pd.DataFrame:
+    """Create a DataFrame from new data. DataFrames are used as-is, and NumPy arrays (structured arrays or dictionaries
+    of arrays) and Arrow tables are wrapped without copying where possible.
+    """
+    if isinstance(data, pd.DataFrame):
+        return data
+
+    # Arrow tables and record batches; checked by module to avoid requiring pyarrow
+    if type(data).__module__.startswith('pyarrow') and hasattr(data, 'to_pandas'):
+        return data.to_pandas(split_blocks=True)
+
+    if isinstance(data, np.ndarray) and data.dtype.names:
+        return pd.DataFrame({name: _wrap_column(data[name]) for name in data.dtype.names}, copy=False)
+
+    if isinstance(data, dict) and any(isinstance(value, np.ndarray) for value in data.values()):
+        return pd.DataFrame({key: _wrap_column(value) for key, value in data.items()}, copy=False)
+
+    return pd.DataFrame(data)
 
 
 class DataInterface(abc.ABC):
 
     @abc.abstractmethod
-    def get_new_data(self) -> Union[List[dict], Dict[str, list]]:
+    def get_new_data(self) -> NewData:
         pass
 
     @abc.abstractmethod
@@ -23,7 +162,7 @@ class DataInterface(abc.ABC):
 
 class PandasMeta(abc.ABCMeta):
     """Meta class for BaseDataModel that wraps the get_new_data method to return a pandas dataframe created from the
-     get_new_data method.
+     get_new_data method. NumPy arrays, DataFrames and Arrow tables are wrapped without copying where possible.
      """
     def __new__(mcs, classnames, bases, class_dict):
         class_dict['get_new_data'] = mcs.wrap(class_dict['get_new_data'])
@@ -33,8 +172,9 @@ class PandasMeta(abc.ABCMeta):
     @staticmethod
     def wrap(get_new_data):
         def to_pandas(self):
-            data = get_new_data(self)
-            df = pd.DataFrame(data)
+            with profile_stage(self.__class__.__name__, 'get_new_data'):
+                data = get_new_data(self)
+                df = self._apply_dtype_policy(_to_dataframe(data))
 
             return df
 
@@ -48,14 +188,49 @@ class BaseDataModel(DataInterface, metaclass=PandasMeta):
 
     Intended to be subclassed with one required method: get_new_data. Results from get_data will be used to generate a
     pandas DataFrame which the monitors use for the data source.
+
+    Optionally, a dtype policy can be defined to reduce the memory used by new_data and query_to_pandas results:
+
+        dtypes: dictionary of column name to dtype. These columns are always converted to the given dtype.
+
+        categorical_threshold: string columns with a ratio of unique values to rows at or below this threshold are
+        converted to categoricals.
+
+        downcast: If True, numeric columns are downcast to the smallest dtype that represents the values exactly.
+
+    The data is stored in the SQLite data database by default. To store the data in a columnar engine instead, set
+    storage to a backend from monitorframe.backends (for example, DuckDBBackend or ParquetBackend).
+
+    If query_cache is set to a QueryCache (or a query cache is set in the configuration file), query_to_pandas
+    results are cached on disk until new data is ingested.
+
+    Array columns that repeat exactly across rows can be deduplicated by setting deduplicate_arrays to a list of column
+    names (or True for all array columns). Each distinct array is stored once in a side table and rows refer to it
+    by hash; query_to_pandas returns shared, read-only arrays for these columns.
+
+    Array columns can be stored compressed by setting compression to a dictionary of column name to codec (a codec name
+    from monitorframe.compression.CODECS, or a (codec name, level) tuple). Floating point arrays are byte-shuffled
+    before compression, and query_to_pandas decompresses them transparently.
     """
     _database = DATA_DB
     primary_key = None
+    storage = None
+    query_cache = default_cache()
+    deduplicate_arrays = None
+    compression = None
+
+    # DataFrame dtype policy
+    dtypes = None
+    categorical_threshold = None
+    downcast = False
 
     def __init__(self, find_new=True):
         self.new_data = None
         self.model = None
         self.table_name = self.__class__.__name__
+        self._manifest_entries = []
+        self._replaced_rows = []
+        self._prepared = None
 
         # Attempt to create a database table model
         self._generate_model()
@@ -64,8 +239,45 @@ class BaseDataModel(DataInterface, metaclass=PandasMeta):
         if find_new:
             self.new_data = self.get_new_data()
 
+    def _apply_dtype_policy(self, df: pd.DataFrame, categoricals: bool = True) -> pd.DataFrame:
+        """Convert the columns of a DataFrame according to the data model's dtype policy. String columns are only
+        converted to categoricals if categoricals is True.
+        """
+        if df.empty:
+            return df
+
+        explicit = {key: dtype for key, dtype in (self.dtypes or {}).items() if key in df}
+
+        if explicit:
+            df = df.astype(explicit, copy=False)
+
+        for key in df.columns.difference(list(explicit), sort=False):
+            column = df[key]
+
+            if categoricals and self.categorical_threshold is not None and column.dtype == 'O':
+                # Only string columns; array columns and other objects are left alone
+                if isinstance(column.iloc[0], str) and column.nunique() / len(column) <= self.categorical_threshold:
+                    df[key] = column.astype('category')
+
+            elif self.downcast and column.dtype.kind in 'iu':
+                df[key] = pd.to_numeric(column, downcast='integer' if column.dtype.kind == 'i' else 'unsigned')
+
+            elif self.downcast and column.dtype.kind == 'f' and column.dtype.itemsize > 4:
+                downcast = column.astype(np.float32)
+
+                if np.array_equal(downcast.values, column.values, equal_nan=True):  # Only if no precision is lost
+                    df[key] = downcast
+
+        return df
+
     def _generate_model(self):
         """Return the database table model object if the table exists in the database."""
+        if self.storage is not None:
+            if self.storage.table_exists(self.table_name):
+                self.model = self.storage.generate_model(self.table_name)
+
+            return
+
         if self._database.table_exists(self.table_name):
             with self._database as db:
                 self.model = generate_models(
@@ -90,38 +302,74 @@ class BaseDataModel(DataInterface, metaclass=PandasMeta):
 
         return
 
+    def _deduplicated(self, key: str) -> bool:
+        return self.deduplicate_arrays is True or key in (self.deduplicate_arrays or [])
+
     # noinspection PyUnresolvedReferences
     # self.new_data will be a pandas DataFrame object
-    @property
-    def _formatted_data(self):
-        """Format new data for ingest. Primarily, if there are arrays as elements in any column, convert those to
-        strings.
+    def _format(self) -> tuple:
+        """Format new data for ingest. Array elements are converted to strings, to the hashes of the arrays if the
+        column is deduplicated, or to compressed blobs if a codec is set for the column. Returns the formatted data and
+        a dictionary of hash to array for deduplicated columns.
         """
-        if self.new_data is not None and not self.new_data.empty:
-            # If there are array elements, convert those into byte-strings
-            if self._array_types:
-                ingestible = self.new_data.copy()
+        if self.new_data is None or self.new_data.empty:
+            return None, {}
 
-                for key in self._array_types:
-                    dtypes = []
+        if not self._array_types:
+            return self.new_data, {}
 
-                    for i, row in self.new_data.iterrows():
-                        dtypes.append(str(np.array(row[key]).dtype))
+        ingestible = self.new_data.copy()
+        arrays = {}
 
-                        ingestible.loc[i, key] = repr(list(row[key]))
+        for key in self._array_types:
+            if self._deduplicated(key):
+                digests, dtypes, seen = [], [], {}
 
-                    ingestible[f'{key}_dtype'] = dtypes
+                for value in self.new_data[key]:
+                    if id(value) not in seen:  # Rows often share the same array object
+                        array = np.asarray(value)
+                        digest = _array_digest(array)
+                        arrays.setdefault(digest, array)
+                        seen[id(value)] = (digest, str(array.dtype))
 
-                return ingestible
+                    digest, dtype = seen[id(value)]
+                    digests.append(digest)
+                    dtypes.append(dtype)
 
-            return self.new_data
+                ingestible[key] = digests
+                ingestible[f'{key}_dtype'] = dtypes
 
-        return
+                continue
+
+            if key in (self.compression or {}):
+                encoded = [encode(np.asarray(value), self.compression[key]) for value in self.new_data[key]]
+                ingestible[key] = encoded
+                ingestible[f'{key}_dtype'] = [str(np.asarray(value).dtype) for value in self.new_data[key]]
+
+                continue
+
+            dtypes = []
+
+            for i, row in self.new_data.iterrows():
+                dtypes.append(str(np.array(row[key]).dtype))
 
-    def _set_primary_key(self):
+                ingestible.loc[i, key] = repr(list(row[key]))
+
+            ingestible[f'{key}_dtype'] = dtypes
+
+        return ingestible, arrays
+
+    @property
+    def _formatted_data(self):
+        """Format new data for ingest. Primarily, if there are arrays as elements in any column, convert those to
+        strings.
+        """
+        return self._format()[0]
+
+    def _set_primary_key(self, formatted: pd.DataFrame):
         # Create SQL command based on dataframe
         # noinspection PyUnresolvedReferences
-        insert = pd.io.sql.get_schema(self._formatted_data, self.table_name)
+        insert = pd.io.sql.get_schema(formatted, self.table_name)
 
         # Find where the pimary key is in the sql string
         key_loc = insert.index(self.primary_key)  # Raise a ValueError if the key isn't found
@@ -135,38 +383,382 @@ class BaseDataModel(DataInterface, metaclass=PandasMeta):
             db.execute_sql(insert)
 
     @abc.abstractmethod
-    def get_new_data(self) -> Union[List[dict], Dict[str, list]]:
-        """Retrieve monitor data. Should return row-wise or column-wise data."""
+    def get_new_data(self) -> NewData:
+        """Retrieve monitor data. Should return row-wise or column-wise data, a NumPy structured array, a dictionary of
+        NumPy arrays, a DataFrame or an Arrow table.
+        """
         pass
 
+    def scan_files(self, files: Union[str, Iterable[str]], extractor: Callable[[str], Union[dict, None]],
+                   pattern: str = '*', workers: int = None, use_processes: bool = False) -> List[dict]:
+        """Helper for get_new_data that extracts a row of data from each new or changed file with a pool of threads
+        or processes.
+
+        files is either a directory that is searched recursively for files that match pattern, or an iterable of file
+        paths. extractor is called with each file path and should return a dictionary or None to skip the file.
+        Files that have been scanned are recorded in a manifest when the data is ingested, and are not opened again
+        unless their size or modification time changes. The rows of files that have changed replace the rows ingested
+        from them before (in the data database; storage backends append them).
+        """
+        scanner = FileScanner(self.table_name, extractor, workers, use_processes)
+        rows, self._manifest_entries = scanner.scan(files, pattern)
+        self._replaced_rows = scanner.previous_rows([entry['path'] for entry in self._manifest_entries])
+
+        return rows
+
+    def _delete_replaced_rows(self, db: peewee.Database) -> int:
+        """Delete the rows previously ingested from files that have changed. Rows are found by the primary key if there
+        is one, and otherwise by their scalar values (one row per file).
+        """
+        if not self._replaced_rows or not db.table_exists(self.table_name):
+            return 0
+
+        columns = {column.name for column in db.get_columns(self.table_name)}
+        deleted = 0
+
+        for row in self._replaced_rows:
+            if self.primary_key:
+                values = {self.primary_key: row.get(self.primary_key)}
+                sql = f'DELETE FROM "{self.table_name}" WHERE "{self.primary_key}" = ?'
+
+            else:
+                values = {
+                    key: value for key, value in row.items()
+                    if key in columns and isinstance(value, (bool, int, float, str)) and value == value  # Not NaN
+                }
+                condition = ' AND '.join(f'"{key}" = ?' for key in values)
+                sql = (
+                    f'DELETE FROM "{self.table_name}" WHERE rowid = '
+                    f'(SELECT rowid FROM "{self.table_name}" WHERE {condition} LIMIT 1)'
+                )
+
+            if values and None not in values.values():
+                deleted += db.execute_sql(sql, list(values.values())).rowcount
+
+        return deleted
+
+    def prepare_ingest(self):
+        """Format the new data for ingest ahead of time. Concurrent ingests (see monitorframe.ingestion) call this in
+        parallel before the data models are submitted to the writer, so that the writer only writes.
+        """
+        with profile_stage(self.__class__.__name__, 'prepare_ingest'):
+            self._prepared = (self.new_data, *self._format())
+
     # noinspection PyUnresolvedReferences
     # self._formatted_data will be a pandas DataFrame object
     def ingest(self):
         """Ingest new data into database."""
-        # If a primary key is specified and the table doesn't exist, create the table with the primary key
-        if self.primary_key and not self._database.table_exists(self.table_name):
-            self._set_primary_key()
+        with profile_stage(self.__class__.__name__, 'ingest'):
+            # Use the data formatted by prepare_ingest, unless the new data has been replaced since
+            if self._prepared is not None and self._prepared[0] is self.new_data:
+                _, formatted, arrays = self._prepared
 
-        # Insert the dataframe into the database
-        with self._database as db:
-            if self._formatted_data is not None:
-                self._formatted_data.to_sql(self.table_name, db, if_exists='append', index=False)
+            else:
+                formatted, arrays = self._format()
 
-        # If the model wasn't created due to the table not existing, create the model.
-        if self.model is None:
-            self._generate_model()
+            self._prepared = None
+
+            # Distinct arrays of deduplicated columns are stored before the rows that refer to them
+            ArrayStoreModel.store(arrays)
+
+            if self.storage is not None:
+                if formatted is not None:
+                    self.storage.write(self.table_name, formatted, self.primary_key)
+                    DataVersionModel.increment(self.table_name)
+
+            else:
+                # If a primary key is specified and the table doesn't exist, create the table with the primary key
+                if self.primary_key and not self._database.table_exists(self.table_name):
+                    self._set_primary_key(formatted)
+
+                # Replace the rows of changed files, insert the dataframe into the database and invalidate cached
+                # query results
+                with self._database as db:
+                    deleted = self._delete_replaced_rows(db)
+
+                    if formatted is not None:
+                        formatted.to_sql(self.table_name, TransactionConnection(db), if_exists='append', index=False)
+
+                    if formatted is not None or deleted:
+                        DataVersionModel.increment(self.table_name)
+
+            # Record the scanned files now that their data is in the database
+            FileScanner.record(self._manifest_entries)
+            self._manifest_entries = []
+            self._replaced_rows = []
+
+            # If the model wasn't created due to the table not existing, create the model.
+            if self.model is None:
+                self._generate_model()
+
+    def _project(self, query: peewee.ModelSelect, columns: list, array_cols: list) -> peewee.ModelSelect:
+        """Restrict the query selection to the given columns (and the dtype columns of any array columns)."""
+        model_columns = query.model._meta.columns
+        selection = list(columns) + [f'{key}_dtype' for key in array_cols if f'{key}_dtype' not in columns]
+
+        missing = [name for name in selection if name not in model_columns]
+        if missing:
+            raise ValueError(f'{missing} are not columns of {self.table_name}')
+
+        return query.select(*[model_columns[name] for name in selection])
+
+    def _decode_arrays(self, df: pd.DataFrame, array_cols: list):
+        """Convert stored array columns back into numpy arrays in place. Deduplicated columns are looked up by hash, and
+        rows with the same array share one read-only array. Compressed blobs are decompressed.
+        """
+        for key in array_cols:
+            if self._deduplicated(key):
+                arrays = ArrayStoreModel.load(df[key].unique())
+                df[key] = _object_array([arrays[digest] for digest in df[key]])
+
+            elif is_encoded(df[key].iloc[0]):
+                df[key] = _object_array([decode(value) for value in df[key]])
+
+            else:
+                df[key] = _object_array(
+                    [
+                        np.array(ast.literal_eval(value), dtype=dtype)
+                        for value, dtype in zip(df[key], df[f'{key}_dtype'])
+                    ]
+                )
+
+            df.drop(f'{key}_dtype', axis=1, inplace=True)
+
+    @staticmethod
+    def _rows_to_frame(rows: list, names: list, fields: list) -> pd.DataFrame:
+        """Build a DataFrame from a list of row tuples, one typed array per column."""
+        if rows:
+            columns = zip(*rows)
+
+        else:
+            columns = ((),) * len(names)
+
+        return pd.DataFrame(
+            {name: _column_array(values, field) for name, field, values in zip(names, fields, columns)},
+            columns=names
+        )
+
+    def _finalize_frame(self, df: pd.DataFrame, array_cols: list, categoricals: bool = True) -> pd.DataFrame:
+        """Decode array columns and apply the dtype policy to a DataFrame read from the database."""
+        array_cols = [key for key in array_cols if key in df and f'{key}_dtype' in df]  # Only those selected
+
+        if array_cols and not df.empty:
+            self._decode_arrays(df, array_cols)
+
+        return self._apply_dtype_policy(df, categoricals)
+
+    def _read_frame(self, query: peewee.ModelSelect) -> pd.DataFrame:
+        """Read the full result of a query into a DataFrame."""
+        if self.storage is not None:
+            return self.storage.read_frame(query)
+
+        # Rows are fetched in blocks and copied into one array per column, so that only one block of row tuples is held
+        # in memory at a time
+        with query.model._meta.database as db:
+            cursor = db.execute(query)
+            names = [description[0] for description in cursor.description]
+            columns = [_ColumnBuffer(query.model._meta.columns.get(name)) for name in names]
+
+            while True:
+                rows = cursor.fetchmany(_FETCH_ROWS)
+
+                if not rows:
+                    break
 
-    def query_to_pandas(self, query: peewee.ModelSelect, array_cols: list = None) -> pd.DataFrame:
-        """Convert a model query to a pandas dataframe."""
-        df = pd.DataFrame(query.dicts())
+                for column, values in zip(columns, zip(*rows)):
+                    column.extend(values)
 
+                del rows
+
+        return pd.DataFrame({name: column.finish() for name, column in zip(names, columns)}, columns=names)
+
+    def _iter_frames(self, query: peewee.ModelSelect, chunksize: int) -> Iterator[pd.DataFrame]:
+        """Yield DataFrames of at most chunksize rows, read from the query cursor."""
+        if self.storage is not None:
+            yield from self.storage.iter_frames(query, chunksize)
+
+            return
+
+        with query.model._meta.database as db:
+            cursor = db.execute(query)
+            names = [description[0] for description in cursor.description]
+            fields = [query.model._meta.columns.get(name) for name in names]
+
+            while True:
+                rows = cursor.fetchmany(chunksize)
+
+                if not rows:
+                    break
+
+                yield self._rows_to_frame(rows, names, fields)
+
+    def _cache_key(self, query: peewee.ModelSelect, array_cols: list) -> str:
+        """Create a query cache key from the databases and query, the versions of the tables it reads (including joined
+        tables and tables in subqueries) and the output options. The databases are included so that configurations
+        with different databases can share a cache directory.
+        """
+        sql, params = query.sql()
+        tables = sorted(set(_QUERY_TABLES.findall(sql)) | {query.model._meta.table_name})
+
+        if self.storage is not None:
+            location = self.storage.location
+
+        else:
+            location = os.path.abspath(query.model._meta.database.database)
+
+        return QueryCache.key(
+            sql,
+            params,
+            [os.path.abspath(DATA_DB.database), location],  # Table versions are kept in the data database
+            [(table, DataVersionModel.get_version(table)) for table in tables],
+            array_cols,
+            self.dtypes,
+            self.categorical_threshold,
+            self.downcast
+        )
+
+    def query_to_pandas(self, query: peewee.ModelSelect, array_cols: list = None, columns: list = None,
+                        chunksize: int = None, cache: bool = True) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+        """Convert a model query to a pandas dataframe.
+
+        Rows are read as tuples directly from the database cursor and converted into one typed array per column.
+        If columns is given, only those columns are selected. If chunksize is given, an iterator that yields DataFrames
+        of at most chunksize rows is returned instead. Chunks are not converted to categoricals, since each chunk would
+        get its own categories; use concat_chunks to combine chunks and convert them once.
+
+        If a query cache is set, the result is read from (or stored in) the cache unless cache is False. Chunked reads
+        are not cached.
+        """
         if not array_cols:
             array_cols = self._array_types  # Try to use the new data to infer what the format should be
 
-        # Convert array columns to numpy arrays. Leave as string if not specified
-        if array_cols:
-            for key in array_cols:
-                df[key] = df.apply(lambda x: np.array(ast.literal_eval(x[key]), dtype=x[f'{key}_dtype']), axis=1)
-                df.drop(f'{key}_dtype', axis=1, inplace=True)
+        array_cols = list(array_cols) if array_cols else []
+
+        if columns:
+            array_cols = [key for key in array_cols if key in columns]
+            query = self._project(query, columns, array_cols)
+
+        if chunksize:
+            chunks = self._iter_frames(query, chunksize)
+
+            return (self._finalize_frame(df, array_cols, categoricals=False) for df in chunks)
+
+        if self.query_cache is None or not cache:
+            return self._finalize_frame(self._read_frame(query), array_cols)
+
+        key = self._cache_key(query, array_cols)
+        df = self.query_cache.get(key)
+
+        if df is None:
+            df = self._finalize_frame(self._read_frame(query), array_cols)
+            self.query_cache.put(key, df)
+
+        else:
+            # Arrays shared between rows are still shared when unpickled, but writeable again
+            for column in array_cols:
+                if self._deduplicated(column) and column in df:
+                    for array in df[column]:
+                        array.flags.writeable = False
 
         return df
+
+    def concat_chunks(self, chunks: List[pd.DataFrame]) -> pd.DataFrame:
+        """Concatenate DataFrames read in chunks by query_to_pandas (or derived from them) and apply the dtype policy to
+        the result, so that string columns are converted to categoricals with one set of categories.
+        """
+        return self._apply_dtype_policy(pd.concat(chunks))
+
+    def share(self, query: peewee.ModelSelect = None, columns: list = None, array_cols: list = None) -> SharedFrame:
+        """Read the data model's table (or the results of query) once and place it in shared memory, so that monitors
+        running in other processes can use the data without a copy each. Close the returned SharedFrame when the
+        monitors are done.
+
+        Array columns are decoded into arrays first. By default, these are all of the table's array columns (those
+        stored with a dtype column), so the data model doesn't need its new data to find them.
+        """
+        if self.model is None:
+            raise ValueError(f'{self.table_name} has no data to share.')
+
+        if array_cols is None:
+            stored = self.model._meta.columns
+            array_cols = [name for name in stored if f'{name}_dtype' in stored]
+
+        if columns is not None:
+            array_cols = [key for key in array_cols if key in columns]
+
+        return SharedFrame(
+            self.query_to_pandas(
+                query if query is not None else self.model.select(), array_cols=array_cols, columns=columns
+            )
+        )
+
+    def preview(self, size: int = 1000, strata: List[str] = None, time_column: str = None, time_bins: int = 10,
+                seed: int = 0, chunksize: int = 100_000):
+        """Replace model with a model of a small, representative sample of the data model's table, held in an
+        in-memory database, and set new_data to the sample. Nothing is written to the data database afterwards.
+
+        Rows are grouped into strata by the strata columns and, if time_column is given, by time_bins equal-width bins
+        of time. Each stratum gets a share of the sample proportional to its size (at least one row). Within a stratum,
+        the rows with the lowest hash of their primary key (or of the whole row) are selected, so the same data always
+        gives the same sample. The table is read once, in chunks.
+        """
+        if self.model is None:
+            raise ValueError(f'{self.table_name} has no data to preview.')
+
+        keys = list(strata or [])
+        hash_key = f'{seed:016d}'[-16:]
+
+        if time_column:
+            column = self.model._meta.columns[time_column]
+            bounds = self._read_frame(self.model.select(peewee.fn.MIN(column), peewee.fn.MAX(column)))
+            start, end = _numeric_time(pd.Series(bounds.iloc[0].values))
+            width = (end - start) / time_bins or 1
+            keys.append('__bin')
+
+        kept, counts = None, pd.Series(dtype=float)
+
+        for chunk in self._iter_frames(self.model.select(), chunksize):
+            if time_column:
+                chunk['__bin'] = np.clip((_numeric_time(chunk[time_column]) - start) // width, 0, time_bins - 1)
+
+            if self.primary_key in chunk:
+                identity = chunk[[self.primary_key]]
+
+            else:
+                identity = chunk.drop(columns='__bin', errors='ignore')
+
+            priority = pd.util.hash_pandas_object(identity.astype(str), index=False, hash_key=hash_key)
+            chunk['__priority'] = priority.values
+            chunk['__stratum'] = pd.util.hash_pandas_object(chunk[keys], index=False).values if keys else 0
+
+            counts = counts.add(chunk.groupby('__stratum').size(), fill_value=0)
+
+            # Keep at most size rows per stratum; the final share of each stratum is always smaller
+            kept = pd.concat([kept, chunk]).sort_values('__priority', kind='mergesort')
+            kept = kept.groupby('__stratum').head(size)
+
+        if kept is None:
+            raise ValueError(f'{self.table_name} has no data to preview.')
+
+        shares = np.maximum(1, np.round(size * counts / counts.sum())).astype(int)
+        sample = kept[kept.groupby('__stratum').cumcount().values < kept['__stratum'].map(shares).values]
+        sample = sample.drop(columns=['__priority', '__stratum', '__bin'], errors='ignore')
+
+        if time_column:
+            sample = sample.sort_values(time_column, kind='mergesort')
+
+        # A shared-cache in-memory database lives as long as one connection to it is open
+        uri = f'file:preview-{uuid.uuid4().hex}?mode=memory&cache=shared'
+        self._preview_connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        sample.to_sql(self.table_name, self._preview_connection, index=False)
+
+        self._database = peewee.SqliteDatabase(uri, uri=True)
+        register_array_functions(self._database)
+        self.model = generate_models(
+            self._database, literal_column_names=True, table_names=[self.table_name]
+        )[self.table_name]
+        self.storage = None
+        self.query_cache = None
+
+        array_cols = [name for name in sample if f'{name}_dtype' in sample]
+        self.new_data = self.query_to_pandas(self.model.select(), array_cols=array_cols)
@@ -0,0 +1,158 @@
+import fnmatch
+import os
+import warnings
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Tuple, Union
+
+from .database import FileManifestModel
+
+# Number of manifest entries written per insert statement
+_BATCH_SIZE = 500
+
+
+def find_files(directory: str, pattern: str = '*') -> Dict[str, Tuple[int, float]]:
+    """Walk a directory tree and return the size and modification time of each file that matches pattern."""
+    found = {}
+    directories = [directory]
+
+    while directories:
+        with os.scandir(directories.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.path)
+
+                elif fnmatch.fnmatch(entry.name, pattern):
+                    stat = entry.stat()
+                    found[entry.path] = (stat.st_size, stat.st_mtime)
+
+    return found
+
+
+class FileScanner:
+    """Scan files with a pool of threads or processes, only opening files that are new or have changed since they were
+    last scanned.
+
+    extractor is called with the path of each new or changed file and should return a dictionary (a row of data) or
+    None if the file should be skipped. When processes are used, they're started from a fork server (or spawned, see
+    isolation), so the extractor must be importable by them (defined at the module level of an importable module).
+
+    A manifest of the path, size, modification time and extracted row of each file is kept in the FileManifest table
+    of the data database.
+    """
+    def __init__(self, name: str, extractor: Callable[[str], Union[dict, None]], workers: int = None,
+                 use_processes: bool = False):
+        self.name = name
+        self.extractor = extractor
+        self.workers = workers
+        self.use_processes = use_processes
+
+    def manifest(self) -> Dict[str, Tuple[int, float]]:
+        """Return the size and modification time of each file in the manifest."""
+        if not FileManifestModel.table_exists():
+            return {}
+
+        query = (
+            FileManifestModel
+            .select(FileManifestModel.path, FileManifestModel.size, FileManifestModel.mtime)
+            .where(FileManifestModel.data_model == self.name)
+            .tuples()
+        )
+
+        return {path: (size, mtime) for path, size, mtime in query}
+
+    def cached_rows(self) -> List[dict]:
+        """Return the extracted rows of all files in the manifest."""
+        if not FileManifestModel.table_exists():
+            return []
+
+        query = FileManifestModel.select(FileManifestModel.row).where(
+            (FileManifestModel.data_model == self.name) & FileManifestModel.row.is_null(False)
+        )
+
+        return [entry.row for entry in query]
+
+    def previous_rows(self, paths: List[str]) -> List[dict]:
+        """Return the rows extracted the last time the given files were scanned, for those that are in the manifest."""
+        if not paths or not FileManifestModel.table_exists():
+            return []
+
+        rows = []
+
+        for start in range(0, len(paths), _BATCH_SIZE):
+            query = FileManifestModel.select(FileManifestModel.row).where(
+                (FileManifestModel.data_model == self.name)
+                & FileManifestModel.path.in_(paths[start:start + _BATCH_SIZE])
+                & FileManifestModel.row.is_null(False)
+            )
+            rows.extend(entry.row for entry in query)
+
+        return rows
+
+    def _extract(self, paths: List[str]) -> list:
+        if not paths:
+            return []
+
+        if self.use_processes:
+            from .isolation import _context  # Imported here; isolation depends on this module through the data model
+
+            with ProcessPoolExecutor(self.workers, mp_context=_context()) as executor:
+                return list(executor.map(self._safe_extract, paths, chunksize=max(1, len(paths) // 100)))
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            return list(executor.map(self._safe_extract, paths))
+
+    def _safe_extract(self, path: str) -> tuple:
+        try:
+            return self.extractor(path), None
+
+        except Exception as error:
+            return None, repr(error)
+
+    def scan(self, files: Union[str, Iterable[str]], pattern: str = '*') -> Tuple[List[dict], List[dict]]:
+        """Extract rows from the new or changed files. files is either a directory that is searched recursively for
+        files that match pattern, or an iterable of file paths.
+
+        Returns the extracted rows and the manifest entries for those files. The entries should be recorded with record
+        once the rows have been ingested.
+        """
+        if isinstance(files, str):
+            found = find_files(files, pattern)
+
+        else:
+            found = {}
+
+            for path in files:
+                stat = os.stat(path)
+                found[path] = (stat.st_size, stat.st_mtime)
+
+        known = self.manifest()
+        changed = [path for path, signature in found.items() if known.get(path) != signature]
+
+        rows, entries = [], []
+
+        for path, (row, error) in zip(changed, self._extract(changed)):
+            if error is not None:  # Not recorded, so the file is tried again next time
+                warnings.warn(f'Could not extract data from {path}: {error}')
+
+                continue
+
+            size, mtime = found[path]
+            entries.append(dict(data_model=self.name, path=path, size=size, mtime=mtime, row=row))
+
+            if row is not None:
+                rows.append(row)
+
+        return rows, entries
+
+    @staticmethod
+    def record(entries: List[dict]):
+        """Add or update manifest entries."""
+        if not entries:
+            return
+
+        with FileManifestModel._meta.database.atomic():
+            FileManifestModel.create_table(safe=True)
+
+            for start in range(0, len(entries), _BATCH_SIZE):
+                FileManifestModel.replace_many(entries[start:start + _BATCH_SIZE]).execute()
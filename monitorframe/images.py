@@ -0,0 +1,123 @@
+import json
+import os
+import warnings
+
+import numpy as np
+
+from numpy.lib.stride_tricks import as_strided
+from typing import Tuple, Union
+
+REDUCTIONS = {
+    'mean': np.nanmean,
+    'max': np.nanmax,
+    'min': np.nanmin,
+    'sum': np.nansum,
+}
+
+
+def _max_shape(max_size: Union[int, Tuple[int, int]]) -> Tuple[int, int]:
+    return (max_size, max_size) if isinstance(max_size, int) else tuple(max_size)
+
+
+def _reduce_blocks(image: np.ndarray, block: Tuple[int, int], reduction: str) -> np.ndarray:
+    """Reduce each (block[0] x block[1]) block of a 2D image whose shape is a whole number of blocks."""
+    by, bx = block
+    sy, sx = image.strides
+    blocks = as_strided(
+        image, (image.shape[0] // by, by, image.shape[1] // bx, bx), (sy * by, sy, sx * bx, sx), writeable=False
+    )
+
+    return REDUCTIONS[reduction](blocks, axis=(1, 3))
+
+
+def block_reduce(image: np.ndarray, factors: Tuple[int, int], reduction: str = 'mean') -> np.ndarray:
+    """Reduce each (factors[0] x factors[1]) block of a 2D image to a single pixel. Edge blocks that are not full are
+    reduced over the pixels that are available.
+    """
+    if reduction not in REDUCTIONS:
+        raise ValueError(f'reduction must be one of {list(REDUCTIONS)}, not {reduction!r}')
+
+    if factors == (1, 1):
+        return image
+
+    fy, fx = factors
+    height, width = image.shape
+    reduced = np.empty((-(-height // fy), -(-width // fx)), dtype=np.result_type(image.dtype, np.float32))
+
+    # The full blocks, and the smaller blocks of the ragged bottom and right edges, are each reduced from views of the
+    # image: (first reduced pixel, first image pixel, last image pixel, block size) along each axis
+    split_y, split_x = height // fy * fy, width // fx * fx
+    rows = ((0, 0, split_y, fy), (split_y // fy, split_y, height, height - split_y))
+    cols = ((0, 0, split_x, fx), (split_x // fx, split_x, width, width - split_x))
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # All-NaN blocks
+
+        for row, start_y, stop_y, by in rows:
+            for col, start_x, stop_x, bx in cols:
+                if stop_y > start_y and stop_x > start_x:
+                    part = _reduce_blocks(image[start_y:stop_y, start_x:stop_x], (by, bx), reduction)
+                    reduced[row:row + part.shape[0], col:col + part.shape[1]] = part
+
+    return reduced
+
+
+def downsample(image: np.ndarray, max_size: Union[int, Tuple[int, int]] = 512,
+               reduction: str = 'mean') -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Downsample a 2D image so that it's at most max_size (rows, columns) pixels. Returns the downsampled image and
+    the x and y coordinates of the center of each block in the original pixel units.
+    """
+    image = np.asarray(image)
+
+    if image.ndim != 2:
+        raise ValueError(f'image must be 2D; received an array with shape {image.shape}')
+
+    max_rows, max_cols = _max_shape(max_size)
+    factors = (max(1, -(-image.shape[0] // max_rows)), max(1, -(-image.shape[1] // max_cols)))
+    reduced = block_reduce(image, factors, reduction)
+
+    y = np.arange(reduced.shape[0]) * factors[0] + (factors[0] - 1) / 2
+    x = np.arange(reduced.shape[1]) * factors[1] + (factors[1] - 1) / 2
+
+    return reduced, x, y
+
+
+def write_tiles(image: np.ndarray, directory: str, tile_size: int = 512, reduction: str = 'mean') -> dict:
+    """Write a multi-resolution tile pyramid of a 2D image.
+
+    Level 0 is the full resolution image, and each following level is reduced from the previous one by a factor of 2
+    until the whole image fits in a single tile (so with a "mean" reduction, ragged edges and NaN pixels are weighted
+    by block rather than by pixel). Each tile is written to <directory>/<level>/<row>_<column>.npy, and the layout of
+    the pyramid is written to <directory>/tiles.json and returned.
+    """
+    image = np.asarray(image)
+    reduced = image
+    levels = []
+    level = 0
+
+    while True:
+        factor = 2 ** level
+        rows, cols = -(-reduced.shape[0] // tile_size), -(-reduced.shape[1] // tile_size)
+
+        output = os.path.join(directory, str(level))
+        os.makedirs(output, exist_ok=True)
+
+        for row in range(rows):
+            for col in range(cols):
+                tile = reduced[row * tile_size:(row + 1) * tile_size, col * tile_size:(col + 1) * tile_size]
+                np.save(os.path.join(output, f'{row}_{col}.npy'), tile.astype(np.float32))
+
+        levels.append({'level': level, 'factor': factor, 'shape': list(reduced.shape), 'tiles': [rows, cols]})
+
+        if rows == 1 and cols == 1:
+            break
+
+        reduced = block_reduce(reduced, (2, 2), reduction)
+        level += 1
+
+    layout = {'shape': list(image.shape), 'tile_size': tile_size, 'reduction': reduction, 'levels': levels}
+
+    with open(os.path.join(directory, 'tiles.json'), 'w') as f:
+        json.dump(layout, f, indent=2)
+
+    return layout
@@ -0,0 +1,159 @@
+import queue
+import threading
+
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+
+from .database import DATA_DB
+from .datamodel import BaseDataModel
+
+_default_writer = None
+_default_writer_lock = threading.Lock()
+
+
+class IngestWriter:
+    """Single writer for concurrent data model ingests.
+
+    Data models whose new data has been retrieved and formatted for ingest (in parallel, by any number of threads; see
+    BaseDataModel.prepare_ingest) are submitted to the writer, and the writer thread calls their ingest methods one at
+    a time, so writes to the data database are serialized while data retrieval and formatting aren't. Each data model
+    is ingested by its own ingest method, including any override.
+
+    The data models that are waiting when the writer is ready are ingested together (up to max_group at a time) in one
+    transaction of the data database, each in its own savepoint, so a failed ingest is rolled back on its own.
+    """
+    def __init__(self, max_pending: int = 16, max_group: int = 16):
+        self._queue = queue.Queue(max_pending)  # Producers wait when the writer falls behind
+        self._thread = None
+        self.max_group = max_group
+
+    def __enter__(self):
+        self.start()
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='IngestWriter', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Ingest the remaining data models and stop the writer."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, data_model: BaseDataModel) -> Future:
+        """Queue a data model (an instance with its new data) for ingest. The future's result is set to the number of
+        rows ingested once its ingest has been committed.
+        """
+        if self._thread is None:
+            raise RuntimeError('The writer has not been started.')
+
+        future = Future()
+        self._queue.put((data_model, future))
+
+        return future
+
+    def _run(self):
+        while True:
+            group = [self._queue.get()]
+
+            while group[-1] is not None and len(group) < self.max_group:
+                try:
+                    group.append(self._queue.get_nowait())
+
+                except queue.Empty:
+                    break
+
+            stopping = group[-1] is None
+
+            if stopping:
+                group.pop()
+
+            if group:
+                self._ingest(group)
+
+            if stopping:
+                break
+
+    @staticmethod
+    def _ingest(group: List[Tuple[BaseDataModel, Future]]):
+        """Ingest a group of data models in a single transaction."""
+        ingested = []
+
+        try:
+            with DATA_DB:
+                for data_model, future in group:
+                    try:
+                        with DATA_DB.atomic():
+                            data_model.ingest()
+
+                    except Exception as error:
+                        future.set_exception(error)
+
+                    else:
+                        ingested.append((data_model, future))
+
+        except Exception as error:  # The transaction couldn't be committed
+            for _, future in ingested:
+                future.set_exception(error)
+
+            return
+
+        for data_model, future in ingested:
+            future.set_result(0 if data_model.new_data is None else len(data_model.new_data))
+
+
+def default_writer() -> IngestWriter:
+    """Return the writer shared by all ingests of this process (including those of the Scheduler and the monitorframe
+    command), starting it on first use.
+    """
+    global _default_writer
+
+    with _default_writer_lock:
+        if _default_writer is None:
+            _default_writer = IngestWriter()
+            _default_writer.start()
+
+    return _default_writer
+
+
+def prepare(data_model: Type[BaseDataModel]) -> BaseDataModel:
+    """Retrieve the new data of a data model and format it for ingest."""
+    instance = data_model()
+    instance.prepare_ingest()
+
+    return instance
+
+
+def ingest_all(data_models: Iterable[Type[BaseDataModel]], workers: int = None) -> Dict[str, Optional[BaseException]]:
+    """Retrieve and format the new data of several data models in parallel threads, and ingest it with the process'
+    single writer.
+
+    Returns the error raised by each data model's data retrieval or ingest, or None if it succeeded.
+    """
+    data_models = list(data_models)
+    writer = default_writer()
+    errors = {}
+
+    with ThreadPoolExecutor(workers) as executor:
+        tasks = {executor.submit(prepare, data_model): data_model for data_model in data_models}
+        written = {}
+
+        for task in as_completed(tasks):
+            data_model = tasks[task]
+
+            try:
+                written[writer.submit(task.result())] = data_model
+
+            except Exception as error:
+                errors[data_model.__name__] = error
+
+    for future, data_model in written.items():
+        errors[data_model.__name__] = future.exception()
+
+    return errors
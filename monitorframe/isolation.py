@@ -0,0 +1,157 @@
+import multiprocessing
+import os
+import time
+import traceback
+import warnings
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Type
+
+from .monitor import BaseMonitor, BudgetExceeded
+from .sharedmem import SharedFrame
+
+# Seconds between checks of an isolated monitor's time and memory use
+_POLL_INTERVAL = 0.1
+
+# Seconds to wait for a worker to exit after it's asked to terminate
+_TERMINATE_GRACE = 5
+
+
+def _context() -> multiprocessing.context.BaseContext:
+    # Workers are often started from the threads of a pool, and forking a process that runs other threads can deadlock
+    # the child. A fork server (or spawning) starts workers from a single-threaded process instead, so monitor classes
+    # must be importable by the worker.
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+
+    return multiprocessing.get_context('spawn')
+
+
+def _rss(pid: int) -> int:
+    """Return the resident set size of a process in bytes, or None if it can't be determined."""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+    except (OSError, ValueError, IndexError):
+        return
+
+
+def _worker(monitor: Type[BaseMonitor], find_new_data: bool, shared_data: Optional[SharedFrame], connection):
+    """Run a monitor in a worker process and send the outcome back to the parent."""
+    try:
+        monitor(find_new_data=find_new_data, shared_data=shared_data).monitor()
+        connection.send(('success', None))
+
+    except BudgetExceeded as error:
+        connection.send(('budget_exceeded', (error.budget, error.limit, str(error))))
+
+    except BaseException:
+        connection.send(('failed', traceback.format_exc()))
+
+    finally:
+        connection.close()
+
+
+def _stop(process: multiprocessing.Process):
+    process.terminate()
+    process.join(_TERMINATE_GRACE)
+
+    if process.is_alive():
+        process.kill()
+        process.join()
+
+
+def run_isolated(monitor: Type[BaseMonitor], find_new_data: bool = False, shared_data: SharedFrame = None):
+    """Run a monitor in a separate worker process, enforcing its timeout and memory_limit budgets (max_rows is enforced
+    by the monitor itself). If shared_data is given, the monitor's shared_data is set to views of it (see BaseMonitor).
+
+    The worker imports the monitor class, so it must be defined at the top level of an importable module, and changes
+    made to the class at runtime are not seen by the worker.
+
+    If a budget is exceeded, the worker is stopped, the budget-exceeded status is stored in the monitor's results table
+    and BudgetExceeded is raised. If the monitor fails, RuntimeError is raised with the worker's traceback.
+
+    memory_limit is measured from /proc, so on platforms without it a RuntimeWarning is issued and the limit isn't
+    enforced.
+    """
+    if monitor.memory_limit is not None and _rss(os.getpid()) is None:
+        warnings.warn(
+            f'The memory use of processes can\'t be measured on this platform, so the memory_limit of '
+            f'{monitor.__name__} is not enforced.',
+            RuntimeWarning
+        )
+
+    receiver, sender = _context().Pipe(duplex=False)
+    process = _context().Process(target=_worker, args=(monitor, find_new_data, shared_data, sender), daemon=True)
+
+    start = time.monotonic()
+    process.start()
+    sender.close()
+
+    exceeded = None
+
+    while process.is_alive():
+        process.join(_POLL_INTERVAL)
+
+        if receiver.poll():
+            break
+
+        if monitor.timeout is not None and time.monotonic() - start > monitor.timeout:
+            exceeded = BudgetExceeded(
+                'timeout', monitor.timeout, f'{monitor.__name__} exceeded its timeout of {monitor.timeout} s'
+            )
+
+        elif monitor.memory_limit is not None and (_rss(process.pid) or 0) > monitor.memory_limit:
+            exceeded = BudgetExceeded(
+                'memory_limit',
+                monitor.memory_limit,
+                f'{monitor.__name__} exceeded its memory limit of {monitor.memory_limit} bytes'
+            )
+
+        if exceeded is not None:
+            _stop(process)
+            monitor.store_budget_exceeded(exceeded)
+
+            raise exceeded
+
+    status, detail = receiver.recv() if receiver.poll() else ('failed', f'Worker exited with code {process.exitcode}')
+    process.join()
+
+    if status == 'budget_exceeded':
+        raise BudgetExceeded(*detail)
+
+    if status == 'failed':
+        raise RuntimeError(f'{monitor.__name__} failed in an isolated worker:\n{detail}')
+
+
+def run_isolated_all(monitors: Iterable[Type[BaseMonitor]], workers: int = None) -> Dict[str, Optional[BaseException]]:
+    """Run monitors in parallel, each in its own worker process (see run_isolated). The table of each data model is read
+    once and shared with the workers of all the monitors that use it, and get_data should return (or select from) the
+    monitor's shared_data.
+
+    Returns the error raised by each monitor, or None if it succeeded.
+    """
+    monitors = list(monitors)
+    shared = {}
+    errors = {}
+
+    try:
+        for monitor in monitors:
+            if monitor.data_model not in shared:
+                shared[monitor.data_model] = monitor.data_model(find_new=False).share()
+
+        with ThreadPoolExecutor(workers) as executor:
+            tasks = {
+                monitor.__name__: executor.submit(run_isolated, monitor, shared_data=shared[monitor.data_model])
+                for monitor in monitors
+            }
+
+        for name, task in tasks.items():
+            errors[name] = task.exception()
+
+    finally:
+        for frame in shared.values():
+            frame.close()
+
+    return errors
@@ -1,16 +1,31 @@
 import abc
+import collections
+import numpy as np
 import os
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 import warnings
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from plotly.subplots import make_subplots
-from typing import Iterable, Any
+from typing import Iterable, Iterator, Any, List
 
+from .dashboard import Dashboard, DASHBOARD_SETTINGS
 from .database import BaseResultsModel
+from .images import downsample, write_tiles
 from .notifications import Email
+from .profiling import profile_stage
+from .sharedmem import SharedFrame
+
+
+class BudgetExceeded(Exception):
+    """Raised when a monitor exceeds one of its resource budgets (timeout, memory_limit or max_rows)."""
+    def __init__(self, budget: str, limit: Any, message: str):
+        super().__init__(message)
+        self.budget = budget
+        self.limit = limit
 
 
 class MonitorInterface(abc.ABC):
@@ -48,6 +63,13 @@ class BaseMonitor(MonitorInterface):
 
         define_plot - method for setting arguments to be used with the basic plotting methods
 
+        track_chunk, reduce_results - per-chunk (map) and combining (reduce) steps that replace track when get_data
+        yields DataFrame chunks instead of returning a single DataFrame
+
+        find_outliers_chunk, reduce_outliers - per-chunk and combining steps that replace find_outliers for chunked data
+
+        plot_data_chunk - returns the (reduced) part of a chunk that should be kept for plotting
+
 
     Built-in methods:
     -----------------
@@ -56,6 +78,8 @@ class BaseMonitor(MonitorInterface):
 
         monitor - Plots figure attribute and sends notification
 
+        update_dashboard - Updates the monitor's entry on the dashboard (if configured) after monitor is executed
+
         basic_scatter - Using arguments defined in define_plot, update figure attribute with a basic scatter plot
 
         basic_line - Using arguments defined in define_plot, update figure attribute with a basic line plot
@@ -88,6 +112,27 @@ class BaseMonitor(MonitorInterface):
         subplot_layout: Optional. (rows, cols) configuration for subplots
 
         labels: Optional.  List of keywords that should be used as hover tool labels.
+
+        max_image_size: Optional. Maximum size (pixels per side, or (rows, columns)) of images plotted by basic_image.
+        Larger images are downsampled.
+
+        image_reduction: Optional. Either 'mean', 'max', 'min' or 'sum'. How pixels are combined when an image is
+        downsampled.
+
+        image_tiles: Optional. Directory to write a multi-resolution tile pyramid of the full resolution image to.
+
+        chunk_workers: Optional. Number of threads used to process data chunks when get_data yields chunks.
+
+        timeout: Optional. Wall-clock time limit in seconds. Enforced when the monitor runs in an isolated worker.
+
+        memory_limit: Optional. Memory (resident set size) limit in bytes. Enforced when the monitor runs in an isolated
+        worker.
+
+        max_rows: Optional. Maximum number of rows of data the monitor may retrieve.
+
+        preview_size, preview_strata, preview_time_column, preview_time_bins: Optional. Sample used when the monitor is
+        created with preview=True: approximate number of rows, columns to stratify by, and a time column and number of
+        time bins to stratify by. See BaseDataModel.preview.
     """
     data_model = None
     notification_settings = None
@@ -103,19 +148,56 @@ class BaseMonitor(MonitorInterface):
     y = None
     z = None
 
-    def __init__(self, find_new_data: bool = True):
-        """Initialization of the Monitor."""
+    # Image plots
+    max_image_size = 1024
+    image_reduction = 'mean'
+    image_tiles = None
+
+    # Chunked execution
+    chunk_workers = None
+
+    # Resource budgets
+    timeout = None
+    memory_limit = None
+    max_rows = None
+
+    # Preview sample
+    preview_size = 1000
+    preview_strata = None
+    preview_time_column = None
+    preview_time_bins = 10
+
+    def __init__(self, find_new_data: bool = True, preview: bool = False, shared_data: SharedFrame = None):
+        """Initialization of the Monitor.
+
+        If preview is True, the monitor runs on a small, deterministic sample of the data model's table instead of new
+        data. The figure is written to a separate "_preview" file, and results, notifications and the dashboard are
+        skipped.
+
+        If shared_data is given (see BaseDataModel.share), new data isn't retrieved, and the shared_data attribute is
+        set to a DataFrame of read-only views of the shared data for get_data to use.
+        """
         self.mailer = None
         self.results = None
         self.outliers = None
         self.notification = None
         self.data = None
+        self._chunks = None
         self._table = None
         self.datetimecol = None
         self.resultcol = None
 
-        self.model = self.data_model(find_new=find_new_data)
+        self.preview = preview
+        self.model = self.data_model(find_new=find_new_data and not preview and shared_data is None)
         self.date = datetime.today()
+
+        self.shared_data = shared_data.to_pandas() if shared_data is not None else None
+
+        if preview:
+            self.model.preview(
+                self.preview_size, self.preview_strata, self.preview_time_column, self.preview_time_bins
+            )
+
         self._define_results_table()
 
         # Create figure; If a subplot is required, create a subplot figure
@@ -134,6 +216,9 @@ class BaseMonitor(MonitorInterface):
         # For the filename, replace the colon with an underscore and remove any spaces
         self._filename = '_'.join(self.name.split(': ')).replace(' ', '')
 
+        if preview:
+            self._filename += '_preview'
+
         # Set output file path
         if not self.output:
             self.output = f'{os.path.join(os.getcwd(), f"{self._filename}.html")}'
@@ -141,6 +226,10 @@ class BaseMonitor(MonitorInterface):
         elif os.path.isdir(self.output):
             self.output = os.path.join(self.output, f"{self._filename}.html")
 
+        elif preview:  # Don't overwrite the figure given by a specific output file
+            root, extension = os.path.splitext(self.output)
+            self.output = f'{root}_preview{extension}'
+
         # Execute tracking, outlier identification, notifications and set plot arguments
         if self.data_model is None:
             raise NotImplementedError('"data_model" must be defined in a monitor.')
@@ -161,8 +250,7 @@ class BaseMonitor(MonitorInterface):
             )
 
     def _define_results_table(self):
-        self._table = BaseResultsModel
-        self._table.define_table_name(self.__class__.__name__)
+        self._table = BaseResultsModel.for_monitor(self.__class__.__name__)
         self.datetime_col = self._table.datetime
         self.result_col = self._table.result
 
@@ -173,15 +261,110 @@ class BaseMonitor(MonitorInterface):
 
         return self._table.select()
 
+    @property
+    def chunked(self) -> bool:
+        """True if get_data yielded chunks of data that have not been processed yet."""
+        return self._chunks is not None
+
     def initialize_data(self):
-        """Retrieve monitor data and prepare figure options."""
-        self.data = self.get_data()
+        """Retrieve monitor data and prepare figure options. If get_data yields chunks, the chunks are consumed in
+        run_analysis instead.
+        """
+        data = self.get_data()
+
+        if data is None:
+            raise ValueError(
+                f'{self.__class__.__name__}.get_data returned no data. The data model\'s new_data is only set when the '
+                f'monitor is created with find_new_data=True (the Scheduler and the monitorframe command create '
+                f'monitors with find_new_data=False); query the data model\'s table to use the ingested data instead, '
+                f'or use shared_data when the monitor is given shared data.'
+            )
+
+        if isinstance(data, Iterator):
+            self._chunks = data
+
+            return
+
+        self._check_rows(len(data))
+
+        self.data = data
         self.define_hover_labels()
 
+    def _check_rows(self, rows: int):
+        if self.max_rows is not None and rows > self.max_rows:
+            raise BudgetExceeded(
+                'max_rows', self.max_rows, f'{self.__class__.__name__} retrieved {rows} rows (limit: {self.max_rows})'
+            )
+
+    def _count_rows(self, chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """Check the number of rows retrieved against max_rows as chunks are consumed."""
+        rows = 0
+
+        for chunk in chunks:
+            rows += len(chunk)
+            self._check_rows(rows)
+
+            yield chunk
+
+    def _map_chunk(self, chunk: pd.DataFrame) -> tuple:
+        """Apply the per-chunk steps to a single chunk of data. The outlier mask is aligned with the rows of the chunk
+        that are kept for plotting.
+        """
+        outliers, plot_data = self.find_outliers_chunk(chunk), self.plot_data_chunk(chunk)
+
+        if outliers is not None and not isinstance(outliers, pd.Series):  # Carry the chunk's index with the mask
+            outliers = pd.Series(np.asarray(outliers), index=chunk.index)
+
+        if outliers is not None and plot_data is not None:
+            outliers = outliers.reindex(plot_data.index, fill_value=False)
+
+        return self.track_chunk(chunk), outliers, plot_data
+
+    def _map_chunks(self) -> List[tuple]:
+        """Apply the per-chunk steps to each chunk yielded by get_data. With chunk_workers set, chunks are processed in
+        a thread pool with a limited number of chunks in flight so that memory use stays bounded.
+        """
+        chunks, self._chunks = self._count_rows(self._chunks), None
+
+        if not self.chunk_workers or self.chunk_workers < 2:
+            return [self._map_chunk(chunk) for chunk in chunks]
+
+        mapped = []
+        pending = collections.deque()
+
+        with ThreadPoolExecutor(self.chunk_workers) as executor:
+            for chunk in chunks:
+                pending.append(executor.submit(self._map_chunk, chunk))
+
+                if len(pending) >= 2 * self.chunk_workers:
+                    mapped.append(pending.popleft().result())
+
+            mapped.extend(future.result() for future in pending)
+
+        return mapped
+
+    def run_chunked_analysis(self):
+        """Execute the per-chunk tracking and outlier detection steps over each chunk of data and reduce the results."""
+        mapped = self._map_chunks()
+        tracked, outliers, plot_data = zip(*mapped) if mapped else ((), (), ())
+
+        self.results = self.reduce_results(list(tracked))
+        self.outliers = self.reduce_outliers([outlier for outlier in outliers if outlier is not None])
+
+        plot_data = [data for data in plot_data if data is not None]
+        if plot_data:
+            self.data = self.model.concat_chunks(plot_data)
+            self.define_hover_labels()
+
     def run_analysis(self):
         """Execute tracking, outlier detection, and prepare notification."""
-        self.results = self.track()
-        self.outliers = self.find_outliers()
+        if self.chunked:
+            self.run_chunked_analysis()
+
+        else:
+            self.results = self.track()
+            self.outliers = self.find_outliers()
+
         self.notification = self.set_notification()
         self._set_mailer()
 
@@ -206,18 +389,65 @@ class BaseMonitor(MonitorInterface):
         """Send notification email."""
         self.mailer.send()
 
+    def _stage(self, stage: str):
+        """Context manager that profiles a monitoring stage if profiling is turned on."""
+        return profile_stage(self.__class__.__name__, stage)
+
+    def update_dashboard(self, status: str = 'success'):
+        """Update the monitor's dashboard entry if a dashboard directory is set in the configuration file."""
+        if DASHBOARD_SETTINGS.get('directory') and not self.preview:
+            Dashboard().update(self, status)
+
+    def _report_failure(self, status: str):
+        """Update the dashboard after a failed run. A dashboard error is only warned about, so that the run's error is
+        the one raised.
+        """
+        try:
+            self.update_dashboard(status)
+
+        except Exception as error:
+            warnings.warn(f'The dashboard could not be updated: {error!r}')
+
     def monitor(self):
         """Build plots, add to figure, notify based on notification settings."""
-        if self.data is None:
-            self.initialize_data()
+        try:
+            if self.data is None:
+                with self._stage('initialize_data'):
+                    self.initialize_data()
 
-        self.run_analysis()
-        self.plot()
-        self.write_figure()
-        self.store_results()
+            with self._stage('run_analysis'):
+                self.run_analysis()
 
-        if self.notification_settings and self.notification_settings['active'] is True:
-            self.notify()
+            with self._stage('plot'):
+                self.plot()
+
+            with self._stage('write_figure'):
+                self.write_figure()
+
+            if self.preview:  # Nothing is stored or sent for previews
+                return
+
+            with self._stage('store_results'):
+                self.store_results()
+
+            if self.notification_settings and self.notification_settings['active'] is True:
+                with self._stage('notify'):
+                    self.notify()
+
+        except BudgetExceeded as error:
+            if not self.preview:
+                self.store_budget_exceeded(error, self.date)
+
+            self._report_failure('budget_exceeded')
+
+            raise
+
+        except Exception:
+            self._report_failure('failed')
+
+            raise
+
+        self.update_dashboard()
 
     @abc.abstractmethod
     def track(self) -> Any:
@@ -237,6 +467,34 @@ class BaseMonitor(MonitorInterface):
         """Returns mask that defines outliers. Sets the outliers attribute."""
         pass
 
+    def track_chunk(self, chunk: pd.DataFrame) -> Any:
+        """Returns the partial monitoring results of a single chunk of data. Required if get_data yields chunks."""
+        raise NotImplementedError('If get_data yields chunks of data, track_chunk must be implemented.')
+
+    def reduce_results(self, partials: list) -> Any:
+        """Combine the partial results from track_chunk. By default, pandas objects are concatenated and anything else
+        is returned as a list.
+        """
+        if partials and all(isinstance(partial, (pd.Series, pd.DataFrame)) for partial in partials):
+            return pd.concat(partials)
+
+        return partials
+
+    def find_outliers_chunk(self, chunk: pd.DataFrame) -> Any:
+        """Returns the outlier mask for a single chunk of data."""
+        pass
+
+    def reduce_outliers(self, partials: list) -> Any:
+        """Combine the partial outlier masks from find_outliers_chunk."""
+        if not partials:
+            return
+
+        return pd.concat(partials)
+
+    def plot_data_chunk(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Returns the part of a chunk that is kept in the data attribute for plotting."""
+        pass
+
     def define_hover_labels(self):
         # Create hover tool text
         if self.labels:
@@ -291,10 +549,42 @@ class BaseMonitor(MonitorInterface):
             hover_data=self.labels,
         )
 
+    def _image(self) -> np.ndarray:
+        """Return the 2D image to plot: either the data attribute itself, the 2D array in the first row of the z
+        column, or the rows of the z column stacked if they are 1D arrays.
+        """
+        if isinstance(self.data, np.ndarray):
+            return self.data if self.data.ndim == 2 else None
+
+        if self.z is None or self.z not in self.data or self.data[self.z].dtype != 'O' or self.data.empty:
+            return
+
+        first = self.data[self.z].iloc[0]
+
+        if not isinstance(first, np.ndarray):
+            return
+
+        return first if first.ndim == 2 else np.vstack(self.data[self.z].values)
+
     def basic_image(self):
-        """Create a heat-map plot and update the figure attribute. Requires that x, y and z attributes are set.
-        z must be a 2D image.
+        """Create a heat-map plot and update the figure attribute.
+
+        If the data is a 2D array, or z is a column of arrays, the image is downsampled to at most max_image_size
+        pixels with image_reduction and plotted directly (and optionally written as tiles to image_tiles).
+        Otherwise, a density heat-map is created from the x, y and z columns.
         """
+        image = self._image()
+
+        if image is not None:
+            reduced, x, y = downsample(image, self.max_image_size, self.image_reduction)
+
+            self.figure = go.Figure(go.Heatmap(z=reduced, x=x, y=y, colorscale='Viridis'))
+
+            if self.image_tiles:
+                write_tiles(image, self.image_tiles, reduction=self.image_reduction)
+
+            return
+
         self.figure = px.density_heatmap(
             self.data,
             x=self.x,
@@ -305,11 +595,15 @@ class BaseMonitor(MonitorInterface):
         )
 
     def _store_in_db(self, results):
-        if isinstance(results, Iterable):
+        if isinstance(results, pd.DataFrame):  # One record per row, with missing values stored as null
+            results = results.astype(object).where(results.notna(), None).to_dict('records')
+
+        elif isinstance(results, Iterable):
             results = list(results)
 
         # noinspection PyProtectedMember
-        with self._table._meta.database.atomic():
+        # Take the write lock up front so that monitors storing results concurrently wait for each other
+        with self._table._meta.database.atomic('IMMEDIATE'):
             if not self._table.table_exists():
                 self._table.create_table()
 
@@ -323,6 +617,21 @@ class BaseMonitor(MonitorInterface):
                     'method'
                 )
 
+    @classmethod
+    def store_budget_exceeded(cls, error: BudgetExceeded, date: datetime = None):
+        """Record in the monitor's results table that a budget was exceeded."""
+        table = BaseResultsModel.for_monitor(cls.__name__)
+
+        # noinspection PyProtectedMember
+        with table._meta.database.atomic('IMMEDIATE'):
+            table.create_table(safe=True)
+            table.create(
+                datetime=(date or datetime.today()).isoformat(),
+                result={
+                    'status': 'budget_exceeded', 'budget': error.budget, 'limit': error.limit, 'message': str(error)
+                }
+            )
+
     def format_results(self):
         """Format results for storage."""
         pass
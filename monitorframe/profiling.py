@@ -0,0 +1,140 @@
+import cProfile
+import contextlib
+import os
+import pstats
+import threading
+import tracemalloc
+
+from typing import Union
+
+from . import SETTINGS
+
+PROFILING_SETTINGS = SETTINGS.get('profiling') or {}
+
+_state = threading.local()
+_profile_lock = threading.Lock()
+_directory = None
+
+
+def enable(directory: str):
+    """Turn on profiling for all monitors and data models, writing profiles to directory."""
+    global _directory
+    _directory = directory
+
+
+def disable():
+    """Turn off profiling that was turned on with enable. Profiling set by the configuration or environment is kept."""
+    global _directory
+    _directory = None
+
+
+def profiling_directory() -> Union[str, None]:
+    """Return the profiles directory if profiling is turned on. Profiling is turned on by enable, by setting the
+    MONITOR_PROFILE environment variable to a directory, or by the profiling section of the configuration file.
+    """
+    if _directory:
+        return _directory
+
+    if os.environ.get('MONITOR_PROFILE'):
+        return os.environ['MONITOR_PROFILE']
+
+    if PROFILING_SETTINGS.get('active'):
+        return PROFILING_SETTINGS.get('directory', 'profiles')
+
+    return
+
+
+@contextlib.contextmanager
+def profile_stage(owner: str, stage: str):
+    """Profile the enclosed block with cProfile and tracemalloc if profiling is turned on. The pstats file and the
+    allocation snapshot are written to <profiles directory>/<owner>/<stage>.pstats and <stage>.tracemalloc.
+
+    cProfile and tracemalloc trace the whole process, so stages are profiled one at a time: a stage waits for the stage
+    being profiled in another thread to finish. Stages that are nested in another profiled stage in the same thread are
+    included in the outer stage's profile.
+    """
+    directory = profiling_directory()
+
+    if directory is None or getattr(_state, 'active', False):
+        yield
+
+        return
+
+    output = os.path.join(directory, owner)
+    os.makedirs(output, exist_ok=True)
+
+    with _profile_lock:
+        _state.active = True
+        started_tracemalloc = False
+
+        try:
+            if not tracemalloc.is_tracing():  # Leave tracing started by someone else alone
+                tracemalloc.start(PROFILING_SETTINGS.get('frames', 1))
+                started_tracemalloc = True
+
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+            try:
+                yield
+
+            finally:
+                profiler.disable()
+                profiler.dump_stats(os.path.join(output, f'{stage}.pstats'))
+                tracemalloc.take_snapshot().dump(os.path.join(output, f'{stage}.tracemalloc'))
+
+        finally:
+            if started_tracemalloc:
+                tracemalloc.stop()
+
+            _state.active = False
+
+
+def _format_function(function: tuple) -> str:
+    filename, line, name = function
+
+    return f'{name} ({os.path.basename(filename)}:{line})'
+
+
+def summarize(directory: str = None, top: int = None) -> str:
+    """Summarize the profiles in directory: the total time, top hotspots (by internal time) and top allocation sites
+    of each profiled stage.
+    """
+    directory = directory or profiling_directory()
+    top = top or PROFILING_SETTINGS.get('top', 10)
+    lines = []
+
+    for owner in sorted(os.listdir(directory)):
+        path = os.path.join(directory, owner)
+
+        if not os.path.isdir(path):
+            continue
+
+        for filename in sorted(os.listdir(path)):
+            stage, extension = os.path.splitext(filename)
+
+            if extension != '.pstats':
+                continue
+
+            stats = pstats.Stats(os.path.join(path, filename))
+            lines.append(f'{owner}.{stage}: {stats.total_tt:.3f} s')
+
+            lines.append('  hotspots (internal time, cumulative time, calls):')
+            hotspots = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+
+            for function, (_, calls, internal, cumulative, _) in hotspots:
+                lines.append(f'    {internal:9.3f} s {cumulative:9.3f} s {calls:9d}  {_format_function(function)}')
+
+            snapshot_file = os.path.join(path, f'{stage}.tracemalloc')
+
+            if os.path.exists(snapshot_file):
+                lines.append('  allocation sites (size, count):')
+
+                for statistic in tracemalloc.Snapshot.load(snapshot_file).statistics('lineno')[:top]:
+                    frame = statistic.traceback[0]
+                    lines.append(
+                        f'    {statistic.size / 1024:9.1f} KiB {statistic.count:9d}  '
+                        f'{os.path.basename(frame.filename)}:{frame.lineno}'
+                    )
+
+    return '\n'.join(lines)
@@ -0,0 +1,211 @@
+import threading
+import time
+import traceback
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Type, Union
+
+from .database import RunStateModel
+from .datamodel import BaseDataModel
+from .ingestion import default_writer, prepare
+from .isolation import run_isolated
+from .monitor import BaseMonitor, BudgetExceeded
+
+SUCCESS = 'success'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+BUDGET_EXCEEDED = 'budget_exceeded'
+
+
+class Job:
+    """A scheduled data model ingest or monitor run."""
+    def __init__(self, target: Union[Type[BaseDataModel], Type[BaseMonitor]], interval: timedelta = None,
+                 retries: int = 0, retry_delay: float = 0):
+        self.target = target
+        self.name = target.__name__
+        self.kind = 'ingest' if issubclass(target, BaseDataModel) else 'monitor'
+        self.interval = interval
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+    def __repr__(self):
+        return f'<{self.kind} Job: {self.name}>'
+
+    def execute(self):
+        """Ingest new data for a data model, or run a monitor against data that has already been ingested. New data is
+        retrieved and formatted in the calling thread and ingested by the process' single ingest writer. Monitors with
+        a timeout or memory_limit are run in an isolated worker process.
+        """
+        if self.kind == 'ingest':
+            default_writer().submit(prepare(self.target)).result()
+
+        elif self.target.timeout is not None or self.target.memory_limit is not None:
+            run_isolated(self.target)
+
+        else:
+            self.target(find_new_data=False).monitor()
+
+
+class Scheduler:
+    """Dependency-aware scheduler for data models and monitors.
+
+    The dependency graph is built from the data_model attribute of each monitor. Each data model is ingested at most
+    once per cycle, and as soon as an ingest finishes, the monitors that depend on that data model are run in parallel.
+    New data is retrieved and formatted in parallel, and written by the process' single ingest writer (see
+    monitorframe.ingestion) to avoid write contention on the data database.
+
+    A data model is due when its interval has elapsed since its last successful ingest (or every cycle if no interval
+    is set). A monitor runs when its data model has been ingested in the current cycle, or when its own interval has
+    elapsed. Every attempt is recorded in the RunState table of the results database.
+    """
+    def __init__(self, monitors: Iterable[Type[BaseMonitor]], data_models: Iterable[Type[BaseDataModel]] = None,
+                 intervals: Dict[Union[type, str], Union[timedelta, float]] = None, retries: int = 0,
+                 retry_delay: float = 0, workers: int = None):
+        self.workers = workers
+        self.graph = {}  # data model Job -> list of monitor Jobs
+
+        intervals = intervals or {}
+        jobs = {}
+
+        def get_job(target):
+            if target not in jobs:
+                interval = intervals.get(target, intervals.get(target.__name__))
+
+                if interval is not None and not isinstance(interval, timedelta):
+                    interval = timedelta(seconds=interval)
+
+                jobs[target] = Job(target, interval, retries, retry_delay)
+
+            return jobs[target]
+
+        for data_model in data_models or []:
+            self.graph.setdefault(get_job(data_model), [])
+
+        for monitor in monitors:
+            if monitor.data_model is None:
+                raise ValueError(f'{monitor.__name__} does not define a data_model.')
+
+            self.graph.setdefault(get_job(monitor.data_model), []).append(get_job(monitor))
+
+        self._stop = threading.Event()
+
+        RunStateModel.create_table(safe=True)
+
+    @property
+    def jobs(self) -> List[Job]:
+        """All data model and monitor jobs."""
+        return [job for data_model in self.graph for job in [data_model] + self.graph[data_model]]
+
+    @staticmethod
+    def last_success(job: Job) -> Union[datetime, None]:
+        """Return the start time of the last successful run of a job."""
+        last = (
+            RunStateModel
+            .select(RunStateModel.started)
+            .where((RunStateModel.job == job.name) & (RunStateModel.status == SUCCESS))
+            .order_by(RunStateModel.started.desc())
+            .first()
+        )
+
+        return last.started if last else None
+
+    def is_due(self, job: Job, now: datetime = None) -> bool:
+        """Determine if a job's interval has elapsed since its last successful run."""
+        if job.interval is None:
+            return job.kind == 'ingest'  # Monitors without an interval only run after their data is ingested
+
+        last = self.last_success(job)
+
+        return last is None or (now or datetime.now()) - last >= job.interval
+
+    @staticmethod
+    def _record(job: Job, started: datetime, status: str, attempts: int = 0, error: str = None):
+        with RunStateModel._meta.database.atomic():
+            RunStateModel.create(
+                job=job.name,
+                kind=job.kind,
+                started=started,
+                finished=datetime.now(),
+                status=status,
+                attempts=attempts,
+                error=error
+            )
+
+    def run_job(self, job: Job) -> str:
+        """Execute a job, retrying on failure, and record the outcome. Jobs that exceed a budget are not retried."""
+        started = datetime.now()
+        error = None
+
+        for attempt in range(1, job.retries + 2):
+            try:
+                job.execute()
+
+            except BudgetExceeded as exceeded:
+                self._record(job, started, BUDGET_EXCEEDED, attempt, str(exceeded))
+
+                return BUDGET_EXCEEDED
+
+            except Exception:
+                error = traceback.format_exc()
+
+                if attempt <= job.retries:
+                    time.sleep(job.retry_delay)
+
+                continue
+
+            self._record(job, started, SUCCESS, attempt)
+
+            return SUCCESS
+
+        self._record(job, started, FAILED, job.retries + 1, error)
+
+        return FAILED
+
+    def run_pending(self, now: datetime = None) -> Dict[str, str]:
+        """Run a single scheduling cycle and return the status of each job that was considered."""
+        now = now or datetime.now()
+        statuses = {}
+
+        with ThreadPoolExecutor(self.workers) as ingest_pool, ThreadPoolExecutor(self.workers) as monitor_pool:
+            ingests = {
+                ingest_pool.submit(self.run_job, data_model): data_model
+                for data_model in self.graph if self.is_due(data_model, now)
+            }
+
+            # Monitors that are due on their own schedule, independent of an ingest
+            runs = {
+                monitor_pool.submit(self.run_job, monitor): monitor
+                for data_model, monitors in self.graph.items() if data_model not in ingests.values()
+                for monitor in monitors if self.is_due(monitor, now)
+            }
+
+            # Fan out to the monitors of each data model as soon as its ingest finishes
+            for future in as_completed(ingests):
+                data_model = ingests[future]
+                statuses[data_model.name] = future.result()
+
+                for monitor in self.graph[data_model]:
+                    if statuses[data_model.name] == SUCCESS:
+                        runs[monitor_pool.submit(self.run_job, monitor)] = monitor
+
+                    else:
+                        self._record(monitor, datetime.now(), SKIPPED, error=f'{data_model.name} ingest failed')
+                        statuses[monitor.name] = SKIPPED
+
+            for future in as_completed(runs):
+                statuses[runs[future].name] = future.result()
+
+        return statuses
+
+    def run_forever(self, poll_interval: float = 60):
+        """Run scheduling cycles every poll_interval seconds until stop is called."""
+        self._stop.clear()
+
+        while not self._stop.is_set():
+            self.run_pending()
+            self._stop.wait(poll_interval)
+
+    def stop(self):
+        """Stop a scheduler that was started with run_forever."""
+        self._stop.set()
@@ -0,0 +1,213 @@
+import numpy as np
+import os
+import pandas as pd
+import pickle
+
+from typing import List, NamedTuple, Optional
+
+try:
+    from multiprocessing.shared_memory import SharedMemory
+
+except ImportError:  # Python < 3.8
+    SharedMemory = None
+
+# Offsets of the arrays in a segment are aligned for any dtype
+_ALIGNMENT = 64
+
+# Segments attached by this process, by name. Attached views refer to the segment's memory, so segments stay open for
+# the life of the process unless SharedFrame.close is called.
+_attached = {}
+
+
+class _Block(NamedTuple):
+    offset: int
+    dtype: str
+    shape: tuple
+
+
+class _Layout:
+    """Offsets of the arrays to copy into a segment."""
+    def __init__(self):
+        self.size = 0
+        self.arrays = []
+
+    def add(self, array: np.ndarray) -> _Block:
+        offset = -(-self.size // _ALIGNMENT) * _ALIGNMENT
+        self.arrays.append((offset, array))
+        self.size = offset + array.nbytes
+
+        return _Block(offset, array.dtype.str, array.shape)
+
+    def add_pickle(self, obj) -> _Block:
+        return self.add(np.frombuffer(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL), dtype=np.uint8))
+
+
+def _array_column(column: pd.Series) -> Optional[List[np.ndarray]]:
+    """Return the values of a column of arrays with the same (non-object) dtype and number of dimensions, or None."""
+    values = column.tolist()
+
+    if not values or not all(isinstance(value, np.ndarray) for value in values):
+        return
+
+    first = values[0]
+
+    if first.dtype.hasobject or any(value.dtype != first.dtype or value.ndim != first.ndim for value in values):
+        return
+
+    return values
+
+
+class SharedFrame:
+    """A DataFrame placed in shared memory once, which any process can turn back into a DataFrame of read-only views of
+    the shared memory without copying the data.
+
+    Columns with a NumPy dtype are shared as one array each. pandas may copy them when it consolidates columns of the
+    same dtype, which some operations on the whole DataFrame (such as filtering rows) do; select the columns first to
+    keep working on the shared memory. Columns of NumPy arrays (as read from array columns) are shared too; arrays that
+    are the same object in several rows (such as deduplicated arrays) are stored once and stay shared between those
+    rows. Other columns, such as strings, and the index are pickled into the shared memory and unpickled when attached.
+
+    Shared memory requires Python 3.8 or later.
+
+    A SharedFrame can be sent to other processes; only the name and layout of the shared memory are pickled. The process
+    that created it removes the shared memory when it's closed.
+    """
+    def __init__(self, df: pd.DataFrame):
+        if SharedMemory is None:
+            raise RuntimeError('Shared memory requires Python 3.8 or later.')
+
+        layout = _Layout()
+
+        self._columns = list(df.columns)
+        self._length = len(df)
+        self._numeric = []  # (position, block) of each column with a NumPy dtype
+        self._arrays = []  # (position, blocks) of each column of arrays
+        self._pickled = []  # (position, block) of each other column
+
+        for position, (_, column) in enumerate(df.items()):
+            if isinstance(column.dtype, np.dtype) and not column.dtype.hasobject:
+                self._numeric.append((position, layout.add(column.values)))
+
+                continue
+
+            arrays = _array_column(column) if column.dtype == object else None
+
+            if arrays is None:
+                self._pickled.append((position, layout.add_pickle(column.values)))
+
+                continue
+
+            unique, rows, seen = [], [], {}
+
+            for array in arrays:
+                if id(array) not in seen:
+                    seen[id(array)] = len(unique)
+                    unique.append(array)
+
+                rows.append(seen[id(array)])
+
+            blocks = {
+                'data': layout.add(np.concatenate([array.ravel() for array in unique])),
+                'offsets': layout.add(np.cumsum([0] + [array.size for array in unique], dtype=np.int64)),
+                'shapes': layout.add(np.array([array.shape for array in unique], dtype=np.int64)),
+                'rows': layout.add(np.array(rows, dtype=np.int64)),
+            }
+            self._arrays.append((position, blocks))
+
+        self._index = layout.add_pickle(df.index)
+
+        self._segment = SharedMemory(create=True, size=max(layout.size, 1))
+        self._owner = os.getpid()
+        self.name = self._segment.name
+        self.nbytes = layout.size
+
+        for offset, array in layout.arrays:
+            destination = np.ndarray(array.shape, array.dtype, buffer=self._segment.buf, offset=offset)
+            destination[...] = array
+
+            del destination  # Views must be released before the segment can be closed
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_segment'] = None
+
+        return state
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self._length
+
+    def _attach(self) -> SharedMemory:
+        if self._segment is None:
+            if self.name not in _attached:
+                _attached[self.name] = SharedMemory(self.name)
+
+            self._segment = _attached[self.name]
+
+        return self._segment
+
+    def _view(self, block: _Block) -> np.ndarray:
+        array = np.ndarray(block.shape, np.dtype(block.dtype), buffer=self._attach().buf, offset=block.offset)
+        array.flags.writeable = False
+
+        return array
+
+    def _unpickle(self, block: _Block):
+        return pickle.loads(self._view(block).tobytes())
+
+    def to_pandas(self) -> pd.DataFrame:
+        """Return the DataFrame. Columns with a NumPy dtype and columns of arrays are read-only views of the shared
+        memory.
+        """
+        columns = {position: self._view(block) for position, block in self._numeric}
+
+        for position, parts in self._arrays:
+            data = self._view(parts['data'])
+            offsets = self._view(parts['offsets'])
+            shapes = self._view(parts['shapes'])
+            unique = [data[start:end].reshape(shape) for start, end, shape in zip(offsets, offsets[1:], shapes)]
+
+            values = np.empty(self._length, dtype=object)
+
+            for i, row in enumerate(self._view(parts['rows'])):
+                values[i] = unique[row]
+
+            columns[position] = values
+
+        for position, block in self._pickled:
+            columns[position] = self._unpickle(block)
+
+        # Keyed by position, since column names may repeat
+        df = pd.DataFrame(
+            {position: columns[position] for position in range(len(self._columns))},
+            index=self._unpickle(self._index),
+            copy=False
+        )
+        df.columns = pd.Index(self._columns)
+
+        return df
+
+    def close(self):
+        """Release this process' handle on the shared memory, and remove the shared memory if this process created it.
+        DataFrames returned by to_pandas must not be used afterwards.
+        """
+        segment = self._segment if self._segment is not None else _attached.get(self.name)
+        self._segment = None
+
+        if segment is None:
+            return
+
+        try:
+            segment.close()
+            _attached.pop(self.name, None)
+
+        except BufferError:  # Views are still in use; the memory is released when the process exits
+            _attached[self.name] = segment
+
+        if os.getpid() == self._owner:
+            segment.unlink()
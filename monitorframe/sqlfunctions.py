@@ -0,0 +1,168 @@
+import ast
+import numpy as np
+import peewee
+
+from .compression import decode, encode, is_encoded
+
+# Characters of flat lists of numbers (including nan and inf), which can be parsed without building Python objects
+_NUMBER_CHARACTERS = set('0123456789+-.eE, nainf')
+
+
+def to_array(value, dtype: str = None) -> np.ndarray:
+    """Convert an array value as stored in the data database into an array.
+
+    value can be the text written for plain array columns, a blob created by compression.encode (compressed columns
+    and the results of the array SQL functions), or the raw data of an ArrayStore row, in which case its dtype must be
+    given.
+    """
+    if is_encoded(value):
+        return decode(value)
+
+    if isinstance(value, bytes):
+        if dtype is None:
+            raise ValueError('The dtype of raw array data must be given')
+
+        return np.frombuffer(value, dtype=dtype)
+
+    text = value.strip()
+
+    if text[1:-1].strip() and set(text[1:-1]) <= _NUMBER_CHARACTERS:
+        array = np.fromstring(text[1:-1], dtype=dtype or float, sep=',')
+
+        if array.size == text.count(',') + 1:
+            return array
+
+    return np.array(ast.literal_eval(text), dtype=dtype)
+
+
+def _result(array: np.ndarray) -> bytes:
+    # Uncompressed, so that nested calls decode quickly
+    return encode(array, 'none', byte_shuffle=False)
+
+
+def _scalar(value):
+    """Convert a NumPy scalar into a value that SQLite can store."""
+    value = value.item()
+
+    return None if isinstance(value, float) and np.isnan(value) else value
+
+
+def _reduction(reduce):
+    def function(value, dtype=None):
+        if value is None:
+            return None
+
+        array = to_array(value, dtype)
+
+        return _scalar(reduce(array)) if array.size else None
+
+    return function
+
+
+def array_length(value, dtype=None):
+    return None if value is None else to_array(value, dtype).size
+
+
+def array_norm(value, order=2, dtype=None):
+    if value is None:
+        return None
+
+    return _scalar(np.linalg.norm(to_array(value, dtype).ravel().astype(float), ord=order))
+
+
+def array_element(value, index, dtype=None):
+    if value is None:
+        return None
+
+    array = to_array(value, dtype).ravel()
+
+    return _scalar(array[index]) if -array.size <= index < array.size else None
+
+
+def array_slice(value, start=None, stop=None, step=None, dtype=None):
+    if value is None:
+        return None
+
+    return _result(to_array(value, dtype).ravel()[start:stop:step])
+
+
+def array_from_buffer(data, dtype, shape=None):
+    if data is None:
+        return None
+
+    array = np.frombuffer(data, dtype=dtype)
+
+    return _result(array.reshape(ast.literal_eval(shape)) if shape else array)
+
+
+class _ElementwiseAggregate:
+    """Element-wise reduction of the arrays of several rows, which must have the same shape."""
+    ufunc = None
+
+    def __init__(self):
+        self.total = None
+        self.count = 0
+
+    def step(self, value, dtype=None):
+        if value is None:
+            return
+
+        array = to_array(value, dtype)
+
+        if self.total is None:
+            self.total = array.astype(np.result_type(array, np.float64) if self.ufunc is np.add else array.dtype)
+
+        else:
+            self.ufunc(self.total, array, out=self.total)
+
+        self.count += 1
+
+    def finalize(self):
+        return None if self.total is None else _result(self.total)
+
+
+class ElementwiseSum(_ElementwiseAggregate):
+    ufunc = np.add
+
+
+class ElementwiseMean(ElementwiseSum):
+    def finalize(self):
+        return None if self.total is None else _result(self.total / self.count)
+
+
+class ElementwiseMin(_ElementwiseAggregate):
+    ufunc = np.minimum
+
+
+class ElementwiseMax(_ElementwiseAggregate):
+    ufunc = np.maximum
+
+
+FUNCTIONS = {
+    'array_length': array_length,
+    'array_sum': _reduction(np.sum),
+    'array_mean': _reduction(np.mean),
+    'array_std': _reduction(np.std),
+    'array_min': _reduction(np.min),
+    'array_max': _reduction(np.max),
+    'array_norm': array_norm,
+    'array_element': array_element,
+    'array_slice': array_slice,
+    'array_from_buffer': array_from_buffer,
+}
+
+AGGREGATES = {
+    'elementwise_sum': ElementwiseSum,
+    'elementwise_mean': ElementwiseMean,
+    'elementwise_min': ElementwiseMin,
+    'elementwise_max': ElementwiseMax,
+}
+
+
+def register_array_functions(database: peewee.SqliteDatabase):
+    """Register the array functions and aggregates on a SQLite database. They're added to every connection."""
+    for name, function in FUNCTIONS.items():
+        database.register_function(function, name)
+
+    for name, aggregate in AGGREGATES.items():
+        database.register_aggregate(aggregate, name)
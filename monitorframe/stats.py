@@ -0,0 +1,279 @@
+import math
+import numpy as np
+import pandas as pd
+
+from typing import List, NamedTuple, Union
+
+Columns = Union[str, List[str], None]
+
+# Scale factor that makes the median absolute deviation a consistent estimator of the standard deviation
+MAD_SCALE = 1.4826
+
+
+class _Groups(NamedTuple):
+    order: np.ndarray  # Indices that sort the data by group (and by the sort column)
+    starts: np.ndarray  # Start of each group in the sorted data
+    counts: np.ndarray  # Number of rows in each group
+    keys: pd.DataFrame  # Group column values of each group
+
+
+def _as_list(columns: Columns) -> list:
+    if columns is None:
+        return []
+
+    return [columns] if isinstance(columns, str) else list(columns)
+
+
+def _groups(df: pd.DataFrame, by: Columns, sort_by: np.ndarray = None) -> _Groups:
+    """Sort the rows of df by group, and by sort_by within each group."""
+    by = _as_list(by)
+
+    if by:
+        grouped = df.groupby(by, sort=True, dropna=False)
+        codes = grouped.ngroup().to_numpy()
+        keys = grouped.size().index.to_frame(index=False)
+
+    else:
+        codes = np.zeros(len(df), dtype=np.int64)
+        keys = pd.DataFrame(index=range(1 if len(df) else 0))
+
+    order = np.lexsort((sort_by, codes)) if sort_by is not None else np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if len(df) else np.array([], int)
+    counts = np.diff(np.r_[starts, len(df)])
+
+    return _Groups(order, starts, counts, keys)
+
+
+def _binomial(n: int, k: int) -> int:
+    """Number of ways to choose k of n items. math.comb is only available from Python 3.8."""
+    return math.factorial(n) // (math.factorial(k) * math.factorial(n - k))
+
+
+def _segment_sums(values: np.ndarray, groups: _Groups) -> np.ndarray:
+    if not len(values):
+        return np.zeros((0,) + values.shape[1:])
+
+    return np.add.reduceat(values, groups.starts, axis=0)
+
+
+def _drop_missing(df: pd.DataFrame, columns: list) -> pd.DataFrame:
+    return df[df[columns].notna().all(axis=1)] if len(df) else df
+
+
+def fit_trends(df: pd.DataFrame, x: str, y: str, by: Columns = None, degree: int = 1,
+               weights: str = None) -> pd.DataFrame:
+    """Fit a polynomial of the given degree to y(x) for each group by (weighted) least squares.
+
+    Returns one row per group with the number of points n, the coefficients coef_0 ... coef_<degree> (ascending powers
+    of x), the RMS of the residuals, and the range of x. For linear fits, intercept and slope are also included.
+    Groups with too few distinct x values for the fit have NaN coefficients.
+    """
+    columns = [x, y] + ([weights] if weights else [])
+    df = _drop_missing(df, columns)
+    groups = _groups(df, by)
+
+    xs = df[x].to_numpy(dtype=float)[groups.order]
+    ys = df[y].to_numpy(dtype=float)[groups.order]
+    ws = df[weights].to_numpy(dtype=float)[groups.order] if weights else np.ones_like(xs)
+
+    # Center x on each group's weighted mean, and scale it by the group's largest distance from the center, so that the
+    # fit is well-conditioned for any range and degree (MJDs with a cubic, for example)
+    total_weight = _segment_sums(ws, groups)
+    center = _segment_sums(ws * xs, groups) / total_weight
+    dx = xs - np.repeat(center, groups.counts)
+    scale = np.maximum.reduceat(np.abs(dx), groups.starts) if len(dx) else np.zeros(0)
+    scale[scale == 0] = 1  # A single distinct x; the fit is singular for any degree above 0
+    u = dx / np.repeat(scale, groups.counts)
+
+    powers = u[:, None] ** np.arange(2 * degree + 1)
+    moments = _segment_sums(ws[:, None] * powers, groups)  # sum(w u^k), k = 0 ... 2 * degree
+    projections = _segment_sums((ws * ys)[:, None] * powers[:, :degree + 1], groups)  # sum(w u^k y)
+
+    index = np.arange(degree + 1)
+    normal = moments[:, index[:, None] + index[None, :]]
+    singular = np.linalg.matrix_rank(normal) < degree + 1 if len(normal) else np.zeros(0, bool)
+    normal[singular] = np.eye(degree + 1)  # Replaced so that the batch can be solved; results are masked below
+    centered = np.linalg.solve(normal, projections[..., None])[..., 0]
+    centered[singular] = np.nan
+
+    # Residual sum of squares: sum(w y^2) - 2 c.b + c.A.c
+    residuals = (
+        _segment_sums(ws * ys ** 2, groups)
+        - 2 * np.einsum('gi,gi->g', centered, projections)
+        + np.einsum('gi,gij,gj->g', centered, normal, centered)
+    )
+
+    # Undo the scaling, and expand the centered polynomial into powers of x
+    centered = centered / scale[:, None] ** np.arange(degree + 1)
+    coefficients = np.zeros_like(centered)
+    for k in range(degree + 1):
+        for j in range(k + 1):
+            coefficients[:, j] += centered[:, k] * _binomial(k, j) * (-center) ** (k - j)
+
+    result = groups.keys.copy()
+    result['n'] = groups.counts
+
+    for j in range(degree + 1):
+        result[f'coef_{j}'] = coefficients[:, j]
+
+    if degree == 1:
+        result['intercept'] = coefficients[:, 0]
+        result['slope'] = coefficients[:, 1]
+
+    result['rms'] = np.sqrt(np.clip(residuals, 0, None) / total_weight)
+    result['x_min'] = np.minimum.reduceat(xs, groups.starts) if len(xs) else []
+    result['x_max'] = np.maximum.reduceat(xs, groups.starts) if len(xs) else []
+
+    return result
+
+
+def evaluate_trends(fits: pd.DataFrame, df: pd.DataFrame, x: str, by: Columns = None) -> pd.Series:
+    """Evaluate the fitted trends at the x values of df, using the fit of each row's group."""
+    by = _as_list(by)
+    coefficients = sorted((column for column in fits if column.startswith('coef_')), key=lambda c: int(c[5:]))
+
+    if by:
+        matched = df[by].merge(fits[by + coefficients], how='left', on=by)[coefficients].to_numpy()
+
+    else:
+        matched = np.broadcast_to(fits[coefficients].to_numpy(), (len(df), len(coefficients)))
+
+    xs = df[x].to_numpy(dtype=float)
+
+    return pd.Series(np.polynomial.polynomial.polyval(xs, matched.T, tensor=False), index=df.index)
+
+
+def trend_lines(fits: pd.DataFrame, x: str = 'x', y: str = 'y', points: int = 50) -> pd.DataFrame:
+    """Sample each fitted trend over its x range, for plotting (one line per group)."""
+    coefficients = sorted((column for column in fits if column.startswith('coef_')), key=lambda c: int(c[5:]))
+    keys = fits.columns[:list(fits.columns).index('n')]
+
+    steps = np.linspace(0, 1, points)
+    xs = fits.x_min.to_numpy()[:, None] + (fits.x_max - fits.x_min).to_numpy()[:, None] * steps
+    ys = np.polynomial.polynomial.polyval(xs.T, fits[coefficients].to_numpy().T, tensor=False).T
+
+    lines = fits[keys].loc[fits.index.repeat(points)].reset_index(drop=True)
+    lines[x] = xs.ravel()
+    lines[y] = ys.ravel()
+
+    return lines
+
+
+def _segment_medians(values: np.ndarray, groups: _Groups) -> np.ndarray:
+    """Median of each group of values that are sorted within each group."""
+    low = values[groups.starts + (groups.counts - 1) // 2]
+    high = values[groups.starts + groups.counts // 2]
+
+    return (low + high) / 2
+
+
+def robust_stats(df: pd.DataFrame, value: str, by: Columns = None) -> pd.DataFrame:
+    """Compute the number of values, median, median absolute deviation (scaled to be comparable to the standard
+    deviation), mean, standard deviation, minimum and maximum of value for each group. Missing values are ignored.
+    """
+    df = _drop_missing(df, [value])
+    values = df[value].to_numpy(dtype=float)
+    groups = _groups(df, by, sort_by=values)
+    ordered = values[groups.order]
+
+    median = _segment_medians(ordered, groups)
+
+    # Sort the absolute deviations within each group to find their median
+    deviations = np.abs(ordered - np.repeat(median, groups.counts))
+    sorted_deviations = deviations[np.lexsort((deviations, np.repeat(np.arange(len(groups.counts)), groups.counts)))]
+
+    mean = _segment_sums(ordered, groups) / groups.counts
+    variance = _segment_sums((ordered - np.repeat(mean, groups.counts)) ** 2, groups) / np.maximum(groups.counts - 1, 1)
+
+    result = groups.keys.copy()
+    result['n'] = groups.counts
+    result['median'] = median
+    result['mad'] = MAD_SCALE * _segment_medians(sorted_deviations, groups)
+    result['mean'] = mean
+    result['std'] = np.where(groups.counts > 1, np.sqrt(variance), np.nan)
+    result['min'] = ordered[groups.starts] if len(ordered) else []
+    result['max'] = ordered[groups.starts + groups.counts - 1] if len(ordered) else []
+
+    return result
+
+
+def robust_outliers(df: pd.DataFrame, value: str, by: Columns = None, threshold: float = 5) -> pd.Series:
+    """Return a mask of the rows whose value is more than threshold scaled MADs from the median of their group. Can be
+    returned by find_outliers.
+    """
+    by = _as_list(by)
+    stats = robust_stats(df, value, by)
+
+    if by:
+        matched = df[by].merge(stats[by + ['median', 'mad']], how='left', on=by)
+
+    else:
+        matched = pd.DataFrame({'median': stats['median'].iloc[0], 'mad': stats['mad'].iloc[0]}, index=range(len(df)))
+
+    deviation = np.abs(df[value].to_numpy(dtype=float) - matched['median'].to_numpy())
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        outliers = deviation > threshold * matched['mad'].to_numpy()
+
+    return pd.Series(outliers, index=df.index)
+
+
+def breakpoints(df: pd.DataFrame, x: str, y: str, by: Columns = None, min_size: int = 5) -> pd.DataFrame:
+    """Find the most likely step change in the mean of y(x) for each group.
+
+    Each split of a group's data (sorted by x) into two parts of at least min_size points is considered, and the split
+    that minimizes the total squared deviation from the means of the two parts is selected. Returns one row per group
+    with the number of points n, the x value where the change occurs (the first x after the split), the means before
+    and after, the shift between them, and a t statistic of the shift. Groups with fewer than 2 * min_size points have
+    NaN results.
+    """
+    df = _drop_missing(df, [x, y])
+    xs_all = df[x].to_numpy(dtype=float)
+    groups = _groups(df, by, sort_by=xs_all)
+
+    xs = xs_all[groups.order]
+    ys = df[y].to_numpy(dtype=float)[groups.order]
+    group_index = np.repeat(np.arange(len(groups.counts)), groups.counts)
+
+    # Cumulative sums within each group: left part = rows [start, i], right part = the rest of the group
+    offsets = np.repeat(groups.starts, groups.counts)
+    cumulative = np.cumsum(ys)
+    cumulative_squares = np.cumsum(ys ** 2)
+    before = np.r_[0, cumulative][offsets]
+    before_squares = np.r_[0, cumulative_squares][offsets]
+
+    left_n = np.arange(len(ys)) - offsets + 1
+    right_n = np.repeat(groups.counts, groups.counts) - left_n
+    left_sum = cumulative - before
+    left_squares = cumulative_squares - before_squares
+    right_sum = np.repeat(_segment_sums(ys, groups), groups.counts) - left_sum
+    right_squares = np.repeat(_segment_sums(ys ** 2, groups), groups.counts) - left_squares
+
+    valid = (left_n >= min_size) & (right_n >= min_size)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cost = (left_squares - left_sum ** 2 / left_n) + (right_squares - right_sum ** 2 / right_n)
+
+    cost = np.where(valid, cost, np.inf)
+
+    # Best split of each group: the first row of each group after sorting by (group, cost)
+    ranked = np.lexsort((cost, group_index))
+    best = ranked[groups.starts] if len(ranked) else np.array([], int)
+    found = np.isfinite(cost[best]) if len(best) else np.array([], bool)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_before = left_sum[best] / left_n[best]
+        mean_after = right_sum[best] / right_n[best]
+        sigma = np.sqrt(cost[best] / (groups.counts - 2))
+        t = (mean_after - mean_before) / (sigma * np.sqrt(1 / left_n[best] + 1 / right_n[best]))
+
+    result = groups.keys.copy()
+    result['n'] = groups.counts
+    result['break_x'] = np.where(found, xs[np.minimum(best + 1, len(xs) - 1)] if len(xs) else [], np.nan)
+    result['mean_before'] = np.where(found, mean_before, np.nan)
+    result['mean_after'] = np.where(found, mean_after, np.nan)
+    result['shift'] = result.mean_after - result.mean_before
+    result['t'] = np.where(found, t, np.nan)
+
+    return result
@@ -27,5 +27,12 @@ setup(
     
     python_requires='~=3.6',
     install_requires=['pandas', 'plotly', 'peewee', 'numpy', 'pyyaml', 'pytest'],
+    extras_require={
+        'duckdb': ['duckdb'],
+        'compression': ['zstandard', 'lz4'],
+    },
+    entry_points={
+        'console_scripts': ['monitorframe=monitorframe.cli:main'],
+    },
     **setup_parameters
 )
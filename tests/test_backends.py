@@ -0,0 +1,140 @@
+import numpy as np
+import os
+import pytest
+import tempfile
+
+from peewee import fn
+
+from monitorframe.backends import DuckDBBackend, ParquetBackend
+from monitorframe.datamodel import BaseDataModel
+from monitorframe.isolation import run_isolated
+from monitorframe.monitor import BaseMonitor
+
+duckdb = pytest.importorskip('duckdb')
+
+NEW_DATA = {
+    'a': [1, 2, 3],
+    'segment': ['FUVA', 'FUVB', 'FUVA'],
+    'value': [0.5, 1.5, 2.5],
+    'arr': [[7, 8, 9], [10, 11, 12], [13, 14, 15]]
+}
+
+# Isolated monitors are imported by their worker processes, so they're defined at the module level
+OUTPUT = tempfile.gettempdir()
+
+
+class IsolatedStorageTestObject(BaseDataModel):
+    primary_key = 'a'
+    storage = DuckDBBackend(os.path.join(OUTPUT, 'isolated_storage_test.duckdb'))
+
+    def get_new_data(self):
+        return NEW_DATA
+
+
+class IsolatedStorageMonitor(BaseMonitor):
+    data_model = IsolatedStorageTestObject
+    output = OUTPUT
+
+    def get_data(self):
+        return self.model.query_to_pandas(self.model.model.select(), cache=False)
+
+    def track(self):
+        return float(self.data.value.sum())
+
+
+
+@pytest.fixture(params=['duckdb', 'parquet', 'partitioned'])
+def storage_test_instance(request, tmpdir):
+    """Test fixture that creates a datamodel object for each storage backend."""
+    backends = {
+        'duckdb': lambda: DuckDBBackend(str(tmpdir.join('data.duckdb'))),
+        'parquet': lambda: ParquetBackend(str(tmpdir)),
+        'partitioned': lambda: ParquetBackend(str(tmpdir), partition_by=['segment']),
+    }
+
+    class StorageTestObject(BaseDataModel):
+        primary_key = 'a'
+        storage = backends[request.param]()
+
+        def get_new_data(self):
+            return NEW_DATA
+
+    return StorageTestObject()
+
+
+class TestStorageBackends:
+    """Test class for the columnar storage backends."""
+    def test_model_creation(self, storage_test_instance):
+        """Test that the model is created from the stored table after ingest."""
+        assert storage_test_instance.model is None
+
+        storage_test_instance.ingest()
+
+        assert sorted(storage_test_instance.model._meta.columns) == ['a', 'arr', 'arr_dtype', 'segment', 'value']
+
+    def test_query_to_pandas(self, storage_test_instance):
+        """Test that peewee queries are executed by the backend and that array columns are decoded."""
+        storage_test_instance.ingest()
+        model = storage_test_instance.model
+
+        df = storage_test_instance.query_to_pandas(model.select().where(model.segment == 'FUVA').order_by(model.a))
+
+        assert df.a.tolist() == [1, 3]
+        assert np.array_equal(df.arr[1], [13, 14, 15])
+
+        df = storage_test_instance.query_to_pandas(model.select(), columns=['value'])
+        assert sorted(df.value) == [0.5, 1.5, 2.5]
+
+    def test_query_to_pandas_chunks(self, storage_test_instance):
+        """Test that queries can be read in chunks."""
+        storage_test_instance.ingest()
+        chunks = list(storage_test_instance.query_to_pandas(storage_test_instance.model.select(), chunksize=2))
+
+        assert [len(chunk) for chunk in chunks] == [2, 1]
+
+    def test_aggregate(self, storage_test_instance):
+        """Test that aggregates can be executed by the backend."""
+        storage_test_instance.ingest()
+        model = storage_test_instance.model
+
+        query = model.select(model.segment, fn.SUM(model.value).alias('total')).group_by(model.segment)
+        df = storage_test_instance.query_to_pandas(query).sort_values('segment')
+
+        assert df.total.tolist() == [3.0, 1.5]
+
+    def test_ingest_fails(self, storage_test_instance):
+        """Test that the table does not accept duplicates when a primary key is defined."""
+        storage_test_instance.ingest()
+
+        with pytest.raises(duckdb.ConstraintException):
+            storage_test_instance.ingest()
+
+
+@pytest.fixture
+def isolated_storage():
+    """Test fixture that ingests the isolated storage test data model, and removes its database file and the monitor's
+    results table and figures.
+    """
+    IsolatedStorageTestObject().ingest()
+
+    yield IsolatedStorageMonitor
+
+    monitor = IsolatedStorageMonitor(find_new_data=False)
+
+    if monitor._table.table_exists():
+        monitor._table.drop_table()
+
+    os.remove(IsolatedStorageTestObject.storage.database)
+
+    for filename in os.listdir(OUTPUT):
+        if filename.startswith('IsolatedStorageMonitor_') and filename.endswith('.html'):
+            os.remove(os.path.join(OUTPUT, filename))
+
+
+def test_query_from_isolated_worker(isolated_storage):
+    """Test that data ingested in this process can be queried by a monitor in an isolated worker process."""
+    run_isolated(isolated_storage)
+
+    monitor = isolated_storage(find_new_data=False)
+
+    assert monitor.results_table.order_by(monitor.datetime_col.desc()).first().result == {'results': 4.5}
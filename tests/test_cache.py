@@ -0,0 +1,121 @@
+import numpy as np
+import os
+import pandas as pd
+import peewee
+import pytest
+
+from monitorframe.cache import QueryCache, feather
+from monitorframe.database import ArrayStoreModel, DataVersionModel
+from monitorframe.datamodel import BaseDataModel
+
+NEW_DATA = {
+    'a': [1, 2, 3],
+    'b': [4.0, 5.0, 6.0],
+    'arr': [[7, 8, 9], [10, 11, 12], [13, 14, 15]]
+}
+
+
+@pytest.fixture
+def cached_test_instance(tmpdir):
+    """Test fixture that creates a datamodel object with a query cache, and cleans up the tables created."""
+    class CachedTestObject(BaseDataModel):
+        query_cache = QueryCache(str(tmpdir.join('cache')))
+        rows = NEW_DATA
+
+        def get_new_data(self):
+            return self.rows
+
+    datamodel_test_instance = CachedTestObject()
+
+    yield datamodel_test_instance
+
+    if datamodel_test_instance.model:
+        datamodel_test_instance.model.drop_table()
+
+    DataVersionModel.drop_table(safe=True)
+
+
+class TestQueryCache:
+    """Test class for the on-disk query cache."""
+    def test_key(self):
+        """Test that keys are independent of whitespace, but depend on parameters and versions."""
+        assert QueryCache.key('SELECT  *\n FROM t', [1], 0) == QueryCache.key('SELECT * FROM t', [1], 0)
+        assert QueryCache.key('SELECT * FROM t', [1], 0) != QueryCache.key('SELECT * FROM t', [2], 0)
+        assert QueryCache.key('SELECT * FROM t', [1], 0) != QueryCache.key('SELECT * FROM t', [1], 1)
+
+    def test_put_get(self, tmpdir):
+        """Test that results are returned unchanged, in a columnar format where possible."""
+        cache = QueryCache(str(tmpdir))
+        scalars = pd.DataFrame({'a': [1, 2], 'b': pd.Categorical(['x', 'y'])})
+        arrays = pd.DataFrame({'a': [1, 2], 'arr': [np.arange(3), np.arange(3)]})
+
+        cache.put('scalars', scalars)
+        cache.put('arrays', arrays)
+
+        assert cache.get('scalars').equals(scalars)
+        assert np.array_equal(cache.get('arrays').arr[1], np.arange(3))
+        assert cache.get('missing') is None
+
+        if feather is not None:
+            assert tmpdir.join('scalars.feather').exists()
+
+        assert tmpdir.join('arrays.pkl').exists()
+
+    def test_eviction(self, tmpdir):
+        """Test that the least recently used results are evicted."""
+        cache = QueryCache(str(tmpdir))
+        df = pd.DataFrame({'a': np.arange(1000)})
+
+        cache.put('first', df)
+        size = os.path.getsize(next(str(path) for path in tmpdir.listdir()))
+        cache.max_size = 2 * size
+
+        cache.put('second', df)
+        os.utime(str(tmpdir.listdir(lambda path: path.basename.startswith('first'))[0]), (0, 0))  # Least recent
+        cache.put('third', df)
+
+        assert cache.get('first') is None
+        assert cache.get('second') is not None and cache.get('third') is not None
+
+    def test_data_model_cache(self, cached_test_instance, monkeypatch):
+        """Test that repeated queries are read from the cache until new data is ingested."""
+        cached_test_instance.ingest()
+        query = cached_test_instance.model.select()
+
+        first = cached_test_instance.query_to_pandas(query)
+        monkeypatch.setattr(cached_test_instance, '_read_frame', lambda query: pytest.fail('Cache was not used'))
+        cached = cached_test_instance.query_to_pandas(query)
+
+        assert cached.a.tolist() == first.a.tolist() == [1, 2, 3]
+        assert np.array_equal(cached.arr[2], [13, 14, 15])
+
+        monkeypatch.undo()
+
+        cached_test_instance.new_data = pd.DataFrame({'a': [4], 'b': [7.0], 'arr': [[16, 17, 18]]})
+        cached_test_instance.ingest()
+
+        assert DataVersionModel.get_version(cached_test_instance.table_name) == 2
+        assert cached_test_instance.query_to_pandas(query).a.tolist() == [1, 2, 3, 4]
+
+    def test_joined_table_versions(self, cached_test_instance):
+        """Test that the cache key of a query changes when a table joined in the query gets new data."""
+        cached_test_instance.ingest()
+        model = cached_test_instance.model
+        query = model.select(model.a).join(
+            ArrayStoreModel, peewee.JOIN.LEFT_OUTER, on=(model.a == ArrayStoreModel.digest)
+        )
+
+        key = cached_test_instance._cache_key(query, [])
+        DataVersionModel.increment(ArrayStoreModel._meta.table_name)
+
+        assert cached_test_instance._cache_key(query, []) != key
+
+    def test_database_in_key(self, cached_test_instance, monkeypatch, tmpdir):
+        """Test that the same query of a table in a different database has a different cache key."""
+        cached_test_instance.ingest()
+        model = cached_test_instance.model
+        key = cached_test_instance._cache_key(model.select(), [])
+
+        monkeypatch.setattr(model._meta, 'database', peewee.SqliteDatabase(str(tmpdir.join('other.db'))))
+
+        assert cached_test_instance._cache_key(model.select(), []) != key
@@ -0,0 +1,101 @@
+import pytest
+import sys
+
+from monitorframe.cli import discover, main
+from monitorframe.database import RunStateModel
+from monitorframe.datamodel import BaseDataModel
+from monitorframe.monitor import BaseMonitor
+
+TEST_MODULE = '''
+from monitorframe.datamodel import BaseDataModel
+from monitorframe.monitor import BaseMonitor
+
+
+class CliDataModel(BaseDataModel):
+    def get_new_data(self):
+        return {'a': [1, 2, 3]}
+
+
+class CliMonitor(BaseMonitor):
+    data_model = CliDataModel
+    output = OUTPUT
+
+    def get_data(self):
+        return self.model.query_to_pandas(self.model.model.select())
+
+    def track(self):
+        return int(self.data.a.sum())
+
+
+class CliFailingMonitor(CliMonitor):
+    def track(self):
+        raise RuntimeError('Monitor failed')
+'''
+
+
+@pytest.fixture
+def cli_test_module(tmpdir, monkeypatch):
+    """Test fixture that writes an importable module of data models and monitors, and cleans up any tables created."""
+    tmpdir.join('cli_test_module.py').write(TEST_MODULE.replace('OUTPUT', repr(str(tmpdir))))
+    monkeypatch.syspath_prepend(str(tmpdir))
+
+    yield 'cli_test_module'
+
+    module = sys.modules.pop('cli_test_module')
+
+    if BaseDataModel._database.table_exists('CliDataModel'):
+        module.CliDataModel(find_new=False).model.drop_table()
+
+    for monitor in (module.CliMonitor, module.CliFailingMonitor):
+        instance = monitor(find_new_data=False)
+
+        if instance.results_table is not None:
+            instance._table.drop_table()
+
+    RunStateModel.drop_table(safe=True)
+
+
+class TestCli:
+    """Test class for the monitorframe command line interface."""
+    def test_discover(self, cli_test_module):
+        """Test that classes are discovered by module path and by class name."""
+        assert [cls.__name__ for cls in discover([cli_test_module], BaseMonitor)] == ['CliFailingMonitor', 'CliMonitor']
+        found = discover([f'{cli_test_module}:CliDataModel'], BaseDataModel)
+        assert [cls.__name__ for cls in found] == ['CliDataModel']
+
+        with pytest.raises(TypeError):
+            discover([f'{cli_test_module}:CliDataModel'], BaseMonitor)
+
+    def test_command_required(self, capsys):
+        """Test that a command must be given."""
+        with pytest.raises(SystemExit):
+            main([])
+
+        assert 'required' in capsys.readouterr().err
+
+    def test_exit_status(self, cli_test_module, capsys):
+        """Test that the exit status reflects the number of failed jobs."""
+        assert main(['ingest', cli_test_module]) == 0
+        assert main(['run', '--jobs', '2', '--timings', cli_test_module]) == 1
+
+        out, err = capsys.readouterr()
+
+        assert 'CliMonitor' in out and 'CliFailingMonitor' in out
+        assert 'Monitor failed' in err
+
+    def test_only_changed(self, cli_test_module):
+        """Test that monitors are skipped if their data model hasn't been ingested since their last run."""
+        main(['ingest', cli_test_module])
+
+        assert main(['run', f'{cli_test_module}:CliMonitor', '--only-changed']) == 0
+        assert main(['run', f'{cli_test_module}:CliFailingMonitor', '--only-changed']) == 1
+
+        main(['run', cli_test_module, '--only-changed'])
+        assert RunStateModel.select().where(RunStateModel.job == 'CliMonitor').count() == 1
+
+    def test_profile(self, cli_test_module, tmpdir, capsys):
+        """Test that profiles are written for each job and summarized."""
+        main(['ingest', cli_test_module, '--profile', str(tmpdir.join('profiles'))])
+
+        assert tmpdir.join('profiles', 'CliDataModel', 'ingest.pstats').exists()
+        assert 'CliDataModel.ingest' in capsys.readouterr().out
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from monitorframe.compression import CODECS, benchmark, decode, encode, example_spectra, is_encoded, shuffle, unshuffle
+from monitorframe.datamodel import BaseDataModel
+
+SPECTRA = example_spectra(count=3, size=1024)
+
+ARRAYS = [
+    SPECTRA[0],
+    np.arange(12).reshape(3, 4),
+    np.random.default_rng(0).random((4, 5)).astype('>f8').T,  # Non-native byte order, not C-contiguous
+    np.array([], dtype=float),
+    np.array(3.0),
+    np.eye(3, dtype=bool),
+    np.array([b'a', b'bc']),
+]
+
+
+@pytest.fixture
+def compressed_test_instance():
+    """Test fixture that creates a datamodel object with compressed array columns."""
+    class CompressedTestObject(BaseDataModel):
+        primary_key = 'a'
+        compression = {'flux': ('lzma', 9), 'dq': 'zlib'}
+
+        def get_new_data(self):
+            return {
+                'a': [1, 2, 3],
+                'flux': SPECTRA,
+                'dq': [np.zeros(1024, dtype=np.int16)] * 3,
+                'wavelength': [[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]]
+            }
+
+    datamodel_test_instance = CompressedTestObject()
+
+    yield datamodel_test_instance
+
+    if datamodel_test_instance.model:
+        datamodel_test_instance.model.drop_table()
+
+
+class TestCompression:
+    """Test class for array compression."""
+    @pytest.mark.parametrize('codec', list(CODECS))
+    @pytest.mark.parametrize('byte_shuffle', [None, False, True])
+    def test_round_trip(self, codec, byte_shuffle):
+        """Test that arrays are decoded with the same dtype, shape and values, and are writable."""
+        for array in ARRAYS:
+            decoded = decode(encode(array, codec, byte_shuffle))
+
+            assert decoded.dtype == array.dtype and decoded.shape == array.shape
+            assert np.array_equal(decoded, array)
+            assert decoded.flags.writeable
+
+    def test_shuffle(self):
+        """Test that shuffling groups bytes by significance and can be reversed."""
+        data = np.array([1, 2], dtype='<u2').tobytes()
+
+        assert shuffle(data, 2) == b'\x01\x02\x00\x00'
+        assert unshuffle(shuffle(data, 2), 2).tobytes() == data
+
+    def test_shuffle_improves_ratio(self):
+        """Test that byte-shuffling makes spectra more compressible."""
+        assert len(encode(SPECTRA[0], 'zlib', True)) < len(encode(SPECTRA[0], 'zlib', False))
+
+    def test_errors(self):
+        """Test that unknown codecs, object arrays and other blobs are rejected."""
+        with pytest.raises(ValueError):
+            encode(SPECTRA[0], 'unknown')
+
+        with pytest.raises(TypeError):
+            encode(np.array([None, 1]))
+
+        with pytest.raises(ValueError):
+            decode(b'not an encoded array')
+
+        assert is_encoded(encode(SPECTRA[0])) and not is_encoded('[1, 2]')
+
+    def test_benchmark(self):
+        """Test that the benchmark reports each codec with and without shuffling, and the text format."""
+        results = benchmark(SPECTRA, codecs=['zlib', ('lzma', 1)], repeat=1)
+
+        assert results.codec.tolist() == ['text', 'zlib', 'zlib', 'lzma', 'lzma']
+        assert results.shuffle.tolist() == [False, False, True, False, True]
+        assert (results.ratio[1:] > results.ratio[0]).all()
+        assert (results.encode_MBps[1:] > 0).all() and (results.decode_MBps[1:] > 0).all()
+
+    def test_ingest(self, compressed_test_instance):
+        """Test that compressed columns are stored as blobs and decompressed by query_to_pandas."""
+        formatted, _ = compressed_test_instance._format()
+
+        assert all(is_encoded(value) for value in formatted.flux)
+        assert isinstance(formatted.wavelength[0], str)  # Not compressed
+
+        compressed_test_instance.ingest()
+        df = compressed_test_instance.query_to_pandas(compressed_test_instance.model.select(), cache=False)
+
+        assert all(np.array_equal(flux, spectrum) for flux, spectrum in zip(df.flux, SPECTRA))
+        assert df.flux[0].dtype == np.float32 and df.dq[0].dtype == np.int16
+        assert df.wavelength[2].tolist() == [5.0, 6.0]
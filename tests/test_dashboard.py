@@ -0,0 +1,125 @@
+import json
+import os
+import pytest
+import threading
+import time
+
+from datetime import datetime
+
+from monitorframe.dashboard import Dashboard
+from monitorframe.datamodel import BaseDataModel
+from monitorframe.monitor import BaseMonitor
+
+
+@pytest.fixture
+def dashboard_monitor(tmpdir):
+    """Test fixture for a monitor that has been executed, and a dashboard in a temporary directory."""
+    class DashboardDataModel(BaseDataModel):
+        def get_new_data(self):
+            return {'a': [1, 2, 3], 'b': [4, 5, 6]}
+
+    class DashboardMonitor(BaseMonitor):
+        data_model = DashboardDataModel
+        output = str(tmpdir)
+        plottype = 'scatter'
+        x = 'a'
+        y = 'b'
+
+        def get_data(self):
+            return self.model.new_data
+
+        def track(self):
+            return self.data.b.tolist()
+
+    monitor = DashboardMonitor()
+    monitor.monitor()
+
+    yield monitor, Dashboard(str(tmpdir.join('dashboard')), title='Test Monitors')
+
+    monitor._table.drop_table()
+
+
+class TestDashboard:
+    """Test class for the monitor dashboard."""
+    def test_update(self, dashboard_monitor):
+        """Test that an entry is added and the index is written."""
+        monitor, dashboard = dashboard_monitor
+
+        assert dashboard.update(monitor)
+
+        with open(dashboard.index) as f:
+            index = f.read()
+
+        assert 'Test Monitors' in index
+        assert 'DashboardMonitor' in index and '[4, 5, 6]' in index
+        assert os.path.basename(monitor.output) in index
+
+    def test_unchanged_entries_are_not_rendered(self, dashboard_monitor):
+        """Test that an entry is only rendered again if the monitor produced new output."""
+        monitor, dashboard = dashboard_monitor
+        dashboard.update(monitor)
+
+        assert not dashboard.update(monitor)
+
+        monitor.date = datetime.now()  # New results
+        monitor.store_results()
+
+        assert dashboard.update(monitor)
+        assert dashboard.update(monitor, status='failed')
+        assert dashboard.entry('DashboardMonitor')['signature']['status'] == 'failed'
+
+    def test_remove(self, dashboard_monitor):
+        """Test that entries can be removed."""
+        monitor, dashboard = dashboard_monitor
+        dashboard.update(monitor)
+        dashboard.remove('DashboardMonitor')
+
+        assert dashboard.entries() == []
+
+        with open(dashboard.index) as f:
+            assert 'DashboardMonitor' not in f.read()
+
+    def test_entry_is_json(self, dashboard_monitor, tmpdir):
+        """Test that entries are stored as JSON files."""
+        monitor, dashboard = dashboard_monitor
+        dashboard.update(monitor)
+
+        with open(tmpdir.join('dashboard', 'entries', 'DashboardMonitor.json')) as f:
+            assert json.load(f)['name'] == 'DashboardMonitor'
+
+    def test_concurrent_builds(self, dashboard_monitor):
+        """Test that a build that read the entries earlier doesn't overwrite the index written by a later build."""
+        monitor, dashboard = dashboard_monitor
+        dashboard.update(monitor)
+        reading = threading.Event()
+
+        class SlowDashboard(Dashboard):
+            def entries(self):
+                found = super().entries()
+                reading.set()
+                time.sleep(0.2)
+
+                return found
+
+        build = threading.Thread(target=SlowDashboard(dashboard.directory).build)
+        build.start()
+        reading.wait()
+
+        dashboard.remove('DashboardMonitor')
+        build.join()
+
+        with open(dashboard.index) as f:
+            assert 'DashboardMonitor' not in f.read()
+
+    def test_failed_update(self, dashboard_monitor, monkeypatch):
+        """Test that a dashboard error during a failed run doesn't replace the run's error."""
+        monitor, _ = dashboard_monitor
+
+        def fail(*args):
+            raise OSError('dashboard')
+
+        monkeypatch.setattr(monitor, 'plot', lambda: 1 / 0)
+        monkeypatch.setattr(monitor, 'update_dashboard', fail)
+
+        with pytest.warns(UserWarning, match='dashboard'), pytest.raises(ZeroDivisionError):
+            monitor.monitor()
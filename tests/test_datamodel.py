@@ -1,10 +1,15 @@
 import numpy as np
 import pandas as pd
+import peewee
+import pickle
 import pytest
+import tracemalloc
 
 from sqlite3 import IntegrityError
 
-from monitorframe.datamodel import BaseDataModel
+from monitorframe.cache import QueryCache
+from monitorframe.database import ArrayStoreModel
+from monitorframe.datamodel import _FETCH_ROWS, BaseDataModel, _column_array
 
 NEW_DATA = {
     'a': [1, 2, 3],
@@ -152,3 +157,387 @@ class TestDataModel:
             # Check that the query is converted without array elements
             query_df = datamodel_test_instance.query_to_pandas(query)
             assert query_df.equals(datamodel_test_instance.new_data)
+
+    def test_query_to_pandas_columns(self, datamodel_test_instance):
+        """Test that query_to_pandas only returns the projected columns."""
+        datamodel_test_instance.ingest()
+        query = datamodel_test_instance.model.select()
+
+        if datamodel_test_instance._array_types:
+            df = datamodel_test_instance.query_to_pandas(query, TEST_ARRAY_KEYS, columns=['a', 'floats'])
+
+            assert list(df.columns) == ['a', 'floats']
+            assert np.array_equal(df.loc[0, 'floats'], np.array(NEW_DATA_WITH_ARRAYS['floats'][0]))
+
+        else:
+            df = datamodel_test_instance.query_to_pandas(query, columns=['a', 'c'])
+
+            assert list(df.columns) == ['a', 'c']
+            assert df.a.dtype == np.int64
+
+        with pytest.raises(ValueError):
+            datamodel_test_instance.query_to_pandas(query, columns=['not_a_column'])
+
+    def test_query_to_pandas_chunks(self, datamodel_test_instance):
+        """Test that query_to_pandas yields DataFrames of at most chunksize rows that add up to the full query."""
+        datamodel_test_instance.ingest()
+        query = datamodel_test_instance.model.select()
+
+        chunks = list(datamodel_test_instance.query_to_pandas(query, chunksize=2))
+
+        assert [len(chunk) for chunk in chunks] == [2, 1]
+        assert pd.concat(chunks, ignore_index=True).a.tolist() == [1, 2, 3]
+        assert datamodel_test_instance._database.is_closed() is True
+
+
+def test_column_array_fallback():
+    """Test that columns with values that can't be converted to their field's dtype are inferred instead."""
+    array = _column_array((1.5, 'not a number'), peewee.FloatField())
+
+    assert array.dtype == object and array.tolist() == [1.5, 'not a number']
+
+
+@pytest.fixture
+def large_test_instance():
+    """Test fixture that creates and ingests a datamodel object with several blocks of rows, and cleans up its table."""
+    rows = 5 * _FETCH_ROWS + 1
+
+    class LargeTestObject(BaseDataModel):
+        def get_new_data(self):
+            return {
+                'a': np.arange(rows),
+                'b': np.random.rand(rows),
+                'c': np.random.rand(rows),
+                'name': np.array(['x', 'y'] * (rows // 2) + ['z'])
+            }
+
+    datamodel_test_instance = LargeTestObject()
+    datamodel_test_instance.ingest()
+
+    yield datamodel_test_instance
+
+    datamodel_test_instance.model.drop_table()
+
+
+class TestReadFrame:
+    """Test class for reading full query results in blocks."""
+    def test_read_in_blocks(self, large_test_instance):
+        """Test that a result spanning several blocks is read completely and with typed columns."""
+        df = large_test_instance.query_to_pandas(large_test_instance.model.select(), cache=False)
+
+        assert len(df) == 5 * _FETCH_ROWS + 1
+        assert df.a.tolist() == list(range(len(df)))
+        assert df.a.dtype == np.int64 and df.b.dtype == np.float64
+        assert df.name.iloc[-1] == 'z'
+
+    def test_fallback_after_first_block(self, large_test_instance):
+        """Test that a typed column falls back to inference when a later block has values that don't fit its dtype."""
+        model = large_test_instance.model
+        model.update(b='not a number').where(model.a == 3 * _FETCH_ROWS).execute()
+
+        df = large_test_instance.query_to_pandas(model.select(), cache=False)
+
+        assert df.b.dtype == object
+        assert df.b.iloc[3 * _FETCH_ROWS] == 'not a number'
+        assert len(df) == 5 * _FETCH_ROWS + 1
+
+    def test_memory(self, large_test_instance):
+        """Test that reading a result doesn't hold all of its rows as tuples: the peak memory stays within a small
+        multiple of the resulting frame's size.
+        """
+        query = large_test_instance.model.select()
+
+        tracemalloc.start()
+
+        try:
+            df = large_test_instance.query_to_pandas(query, cache=False)
+            _, peak = tracemalloc.get_traced_memory()
+
+        finally:
+            tracemalloc.stop()
+
+        assert peak < 4 * df.memory_usage(index=False).sum()
+
+
+@pytest.fixture
+def dtype_policy_test_instance():
+    """Test fixture that creates a datamodel object with a dtype policy, and cleans up any table created."""
+    class DtypePolicyTestObject(BaseDataModel):
+        dtypes = {'c': 'float32'}
+        categorical_threshold = 0.5
+        downcast = True
+
+        def get_new_data(self):
+            return {
+                'a': [1, 2, 3, 4],
+                'b': [0.5, 1.5, 2.5, 3.5],
+                'c': [7, 8, 9, 10],
+                'detector': ['FUV', 'FUV', 'NUV', 'FUV'],
+                'rootname': ['a', 'b', 'c', 'd'],
+                'exact': [0.1, 0.2, 0.3, 0.4]
+            }
+
+    datamodel_test_instance = DtypePolicyTestObject()
+
+    yield datamodel_test_instance
+
+    if datamodel_test_instance.model:
+        datamodel_test_instance.model.drop_table()
+
+
+class TestDtypePolicy:
+    """Test class for the BaseDataModel dtype policy."""
+    def test_new_data_dtypes(self, dtype_policy_test_instance):
+        """Test that the policy is applied to new_data."""
+        dtypes = dtype_policy_test_instance.new_data.dtypes
+
+        assert dtypes['a'] == np.int8
+        assert dtypes['b'] == np.float32
+        assert dtypes['c'] == np.float32
+        assert dtypes['detector'] == 'category'
+        assert dtypes['rootname'] == 'O'  # Unique strings are not converted
+        assert dtypes['exact'] == np.float64  # Converting to float32 would lose precision
+
+    def test_query_to_pandas_dtypes(self, dtype_policy_test_instance):
+        """Test that the policy is kept through ingest and query_to_pandas."""
+        dtype_policy_test_instance.ingest()
+        df = dtype_policy_test_instance.query_to_pandas(dtype_policy_test_instance.model.select())
+
+        assert df.dtypes.equals(dtype_policy_test_instance.new_data.dtypes)
+        assert df.detector.tolist() == ['FUV', 'FUV', 'NUV', 'FUV']
+
+    def test_concat_chunks(self, dtype_policy_test_instance):
+        """Test that categoricals are created once for chunked reads rather than with different categories per chunk."""
+        dtype_policy_test_instance.ingest()
+        query = dtype_policy_test_instance.model.select()
+        chunks = list(dtype_policy_test_instance.query_to_pandas(query, chunksize=3))
+
+        assert all(chunk.detector.dtype == 'O' for chunk in chunks)
+
+        df = dtype_policy_test_instance.concat_chunks(chunks)
+
+        assert df.detector.dtype == 'category'
+        assert df.detector.tolist() == ['FUV', 'FUV', 'NUV', 'FUV']
+
+
+STRUCTURED_DATA = np.array(
+    [(1, 4.0, [7, 8, 9]), (2, 5.0, [10, 11, 12]), (3, 6.0, [13, 14, 15])],
+    dtype=[('a', 'i8'), ('b', 'f8'), ('arr', 'i8', (3,))]
+)
+
+ARRAY_DICT_DATA = {
+    'a': np.array([1, 2, 3]),
+    'b': np.array([4.0, 5.0, 6.0]),
+    'arr': np.arange(7, 16).reshape(3, 3)
+}
+
+
+@pytest.fixture(params=[STRUCTURED_DATA, ARRAY_DICT_DATA, pd.DataFrame(NEW_DATA)])
+def array_data_test_instance(request):
+    """Test fixture that creates datamodel objects from NumPy structured arrays, dictionaries of arrays and
+    DataFrames.
+    """
+    class ArrayDataTestObject(BaseDataModel):
+        def get_new_data(self):
+            return request.param
+
+    datamodel_test_instance = ArrayDataTestObject()
+
+    yield datamodel_test_instance, request.param
+
+    if datamodel_test_instance.model:
+        datamodel_test_instance.model.drop_table()
+
+
+class TestArrayData:
+    """Test class for new data given as arrays, DataFrames or Arrow tables."""
+    def test_no_copy(self, array_data_test_instance):
+        """Test that the new data DataFrame shares memory with the original data."""
+        datamodel_test_instance, data = array_data_test_instance
+
+        if isinstance(data, pd.DataFrame):
+            assert datamodel_test_instance.new_data is data
+
+        else:
+            assert np.shares_memory(datamodel_test_instance.new_data.a.values, data['a'])
+            assert np.shares_memory(datamodel_test_instance.new_data.arr[0], data['arr'])
+            assert datamodel_test_instance._array_types == ['arr']
+
+    def test_ingest(self, array_data_test_instance):
+        """Test that the array data can be ingested and queried."""
+        datamodel_test_instance, data = array_data_test_instance
+        datamodel_test_instance.ingest()
+
+        df = datamodel_test_instance.query_to_pandas(datamodel_test_instance.model.select())
+
+        assert df.a.tolist() == [1, 2, 3]
+
+        if 'arr' in df:
+            assert np.array_equal(df.arr[1], [10, 11, 12])
+
+    def test_arrow_table(self):
+        """Test that Arrow tables are converted."""
+        pa = pytest.importorskip('pyarrow')
+
+        class ArrowTestObject(BaseDataModel):
+            def get_new_data(self):
+                return pa.table(NEW_DATA)
+
+        assert ArrowTestObject().new_data.equals(pd.DataFrame(NEW_DATA))
+
+
+GRID = np.linspace(1000, 2000, 5)
+MASK = np.eye(3, dtype=bool)
+
+DUPLICATED_DATA = {
+    'a': [1, 2, 3, 4],
+    'grid': [GRID, GRID, GRID.copy(), GRID * 2],
+    'mask': [MASK, MASK, MASK, ~MASK],
+    'c': [[1, 2], [1, 2], [3, 4], [1, 2]]
+}
+
+
+@pytest.fixture
+def dedup_test_instance():
+    """Test fixture that creates a datamodel object with deduplicated array columns."""
+    class DedupTestObject(BaseDataModel):
+        primary_key = 'a'
+        deduplicate_arrays = ['grid', 'mask']
+
+        def get_new_data(self):
+            return DUPLICATED_DATA
+
+    datamodel_test_instance = DedupTestObject()
+
+    yield datamodel_test_instance
+
+    if datamodel_test_instance.model:
+        datamodel_test_instance.model.drop_table()
+
+    ArrayStoreModel.drop_table(safe=True)
+
+
+class TestDeduplicatedArrays:
+    """Test class for deduplicated array columns."""
+    def test_formatted_data(self, dedup_test_instance):
+        """Test that deduplicated columns are stored as hashes of each distinct array."""
+        formatted, arrays = dedup_test_instance._format()
+
+        assert len(set(formatted.grid)) == 2 and len(set(formatted['mask'])) == 2
+        assert len(arrays) == 4
+        assert formatted.grid[0] == formatted.grid[2]  # Equal content, different objects
+        assert formatted.c[0] == '[1, 2]'  # Not deduplicated
+
+    def test_ingest(self, dedup_test_instance):
+        """Test that arrays are stored once and returned as shared read-only arrays."""
+        dedup_test_instance.ingest()
+        dedup_test_instance.new_data = dedup_test_instance.new_data.assign(a=[5, 6, 7, 8])
+        dedup_test_instance.ingest()
+
+        assert ArrayStoreModel.select().count() == 4
+
+        df = dedup_test_instance.query_to_pandas(dedup_test_instance.model.select(), cache=False)
+
+        assert df.a.tolist() == [1, 2, 3, 4, 5, 6, 7, 8]
+        assert all(np.array_equal(array, GRID) for array in df.grid[:3])
+        assert np.array_equal(df['mask'][3], ~MASK) and df['mask'][3].dtype == bool
+        assert df.grid[0] is df.grid[2] is df.grid[4]
+        assert not df.grid[0].flags.writeable
+        assert df.c[1].tolist() == [1, 2]
+
+    def test_cached(self, dedup_test_instance, tmpdir, monkeypatch):
+        """Test that shared arrays read from the query cache are read-only, even if unpickling made them writeable."""
+        cache = QueryCache(str(tmpdir))
+        dedup_test_instance.query_cache = cache
+        dedup_test_instance.ingest()
+        query = dedup_test_instance.model.select()
+
+        dedup_test_instance.query_to_pandas(query)
+
+        read = cache.get
+        monkeypatch.setattr(cache, 'get', lambda key: pickle.loads(pickle.dumps(read(key), protocol=4)))
+        df = dedup_test_instance.query_to_pandas(query)
+
+        assert df.grid[0] is df.grid[2]
+        assert not df.grid[0].flags.writeable and not df['mask'][3].flags.writeable
+
+
+def _preview_data():
+    rng = np.random.default_rng(1)
+    segments = np.array(['FUVA'] * 1200 + ['FUVB'] * 780 + ['NUV'] * 20)
+
+    return {
+        'rootname': [f'root{i:05d}' for i in range(2000)],
+        'segment': segments,
+        'mjd': np.sort(rng.uniform(55000, 60000, 2000)),
+        'counts': [[i, i + 1] for i in range(2000)],
+    }
+
+
+@pytest.fixture
+def preview_test_instance():
+    """Test fixture that creates a datamodel object with ingested data to preview."""
+    class PreviewTestObject(BaseDataModel):
+        primary_key = 'rootname'
+
+        def get_new_data(self):
+            return _preview_data()
+
+    datamodel_test_instance = PreviewTestObject()
+    datamodel_test_instance.ingest()
+
+    yield PreviewTestObject
+
+    datamodel_test_instance.model.drop_table()
+
+
+class TestPreview:
+    """Test class for previewing a sample of a data model's table."""
+    def test_sample(self, preview_test_instance):
+        """Test that the sample is stratified, has about the requested size, and decodes arrays."""
+        datamodel_test_instance = preview_test_instance(find_new=False)
+        datamodel_test_instance.preview(100, strata=['segment'], time_column='mjd', time_bins=5, chunksize=300)
+        sample = datamodel_test_instance.new_data
+
+        assert 95 <= len(sample) <= 110
+        assert set(sample.segment) == {'FUVA', 'FUVB', 'NUV'}  # The rare segment is represented
+        assert sample.mjd.is_monotonic_increasing
+        assert isinstance(sample.counts.iloc[0], np.ndarray)
+
+        # Every time bin is represented
+        bins = np.linspace(55000, 60000, 6)
+        assert len(np.unique(np.digitize(sample.mjd, bins[1:-1]))) == 5
+
+        # Queries use the sample
+        model = datamodel_test_instance.model
+        assert datamodel_test_instance.query_to_pandas(model.select(model.rootname)).shape == (len(sample), 1)
+
+    def test_deterministic(self, preview_test_instance):
+        """Test that the same data and seed give the same sample, regardless of the chunk size."""
+        samples = []
+
+        for chunksize, seed in ((2000, 0), (128, 0), (2000, 1)):
+            datamodel_test_instance = preview_test_instance(find_new=False)
+            datamodel_test_instance.preview(50, strata=['segment'], seed=seed, chunksize=chunksize)
+            samples.append(sorted(datamodel_test_instance.new_data.rootname))
+
+        assert samples[0] == samples[1]
+        assert samples[0] != samples[2]
+
+    def test_data_is_unchanged(self, preview_test_instance):
+        """Test that ingesting into a previewed data model doesn't write to the data database."""
+        datamodel_test_instance = preview_test_instance()
+        datamodel_test_instance.preview(10)
+        datamodel_test_instance.ingest()
+
+        full = preview_test_instance(find_new=False)
+        assert full.query_to_pandas(full.model.select()).shape[0] == 2000
+
+    def test_no_data(self):
+        """Test that a data model without a table can't be previewed."""
+        class EmptyPreviewTestObject(BaseDataModel):
+            def get_new_data(self):
+                return NEW_DATA
+
+        with pytest.raises(ValueError):
+            EmptyPreviewTestObject(find_new=False).preview()
@@ -0,0 +1,132 @@
+import os
+import pytest
+
+from monitorframe import filescan
+from monitorframe.database import FileManifestModel
+from monitorframe.datamodel import BaseDataModel
+from monitorframe.filescan import FileScanner, find_files
+
+OPENED = []
+
+
+def extract(path):
+    """Test extractor that reads a single integer from a file."""
+    OPENED.append(os.path.basename(path))
+
+    with open(path) as f:
+        value = f.read()
+
+    if value == 'skip':
+        return
+
+    return {'filename': os.path.basename(path), 'value': int(value)}
+
+
+@pytest.fixture
+def file_tree(tmpdir):
+    """Test fixture that creates a directory tree of files, and cleans up the manifest and data tables."""
+    tmpdir.join('a.txt').write('1')
+    tmpdir.mkdir('sub').join('b.txt').write('2')
+    tmpdir.join('sub', 'c.txt').write('skip')
+    tmpdir.join('ignored.dat').write('3')
+
+    OPENED.clear()
+
+    yield tmpdir
+
+    FileManifestModel.drop_table(safe=True)
+
+    if BaseDataModel._database.table_exists('ScanTestModel'):
+        BaseDataModel._database.execute_sql('DROP TABLE "ScanTestModel"')
+
+
+class TestFileScanner:
+    """Test class for the FileScanner and the manifest cache."""
+    def test_find_files(self, file_tree):
+        """Test that files are found recursively and filtered by pattern."""
+        assert sorted(os.path.basename(path) for path in find_files(str(file_tree), '*.txt')) == [
+            'a.txt', 'b.txt', 'c.txt'
+        ]
+
+    @pytest.mark.parametrize('use_processes', [False, True])
+    def test_scan(self, file_tree, use_processes):
+        """Test that rows are extracted from new files and that skipped files don't produce rows."""
+        rows, entries = FileScanner('Test', extract, workers=2, use_processes=use_processes).scan(
+            str(file_tree), '*.txt'
+        )
+
+        assert sorted(row['value'] for row in rows) == [1, 2]
+        assert len(entries) == 3
+
+    def test_process_start_method(self, file_tree, monkeypatch):
+        """Test that extraction processes aren't forked from the (possibly multi-threaded) scanning process."""
+        start_methods = []
+
+        class RecordingExecutor(filescan.ProcessPoolExecutor):
+            def __init__(self, *args, mp_context=None, **kwargs):
+                start_methods.append(mp_context.get_start_method())
+                super().__init__(*args, mp_context=mp_context, **kwargs)
+
+        monkeypatch.setattr(filescan, 'ProcessPoolExecutor', RecordingExecutor)
+        FileScanner('Test', extract, workers=2, use_processes=True).scan(str(file_tree), '*.txt')
+
+        assert start_methods and start_methods[0] != 'fork'
+
+    def test_manifest(self, file_tree):
+        """Test that only new or changed files are opened after the manifest is recorded."""
+        scanner = FileScanner('Test', extract)
+        FileScanner.record(scanner.scan(str(file_tree), '*.txt')[1])
+
+        OPENED.clear()
+        file_tree.join('a.txt').write('10')  # Size changes
+        file_tree.join('d.txt').write('4')
+
+        rows, _ = scanner.scan(str(file_tree), '*.txt')
+
+        assert sorted(OPENED) == ['a.txt', 'd.txt']
+        assert sorted(row['value'] for row in rows) == [4, 10]
+        assert sorted(row['value'] for row in scanner.cached_rows()) == [1, 2]
+
+    def test_extraction_errors(self, file_tree):
+        """Test that files that can't be read are warned about and not recorded."""
+        file_tree.join('bad.txt').write('not a number')
+
+        with pytest.warns(UserWarning):
+            _, entries = FileScanner('Test', extract).scan(str(file_tree), '*.txt')
+
+        assert 'bad.txt' not in [os.path.basename(entry['path']) for entry in entries]
+
+    def test_data_model_scan_files(self, file_tree):
+        """Test that a data model only records the manifest once its data has been ingested."""
+        class ScanTestModel(BaseDataModel):
+            def get_new_data(self):
+                return self.scan_files(str(file_tree), extract, '*.txt', workers=2)
+
+        model = ScanTestModel()
+
+        assert sorted(model.new_data.value) == [1, 2]
+        assert not FileManifestModel.table_exists()
+
+        model.ingest()
+
+        assert FileManifestModel.select().count() == 3
+        assert ScanTestModel().new_data.empty
+
+    @pytest.mark.parametrize('primary_key', [None, 'filename'])
+    def test_reingest_changed_files(self, file_tree, primary_key):
+        """Test that the rows of files that change replace the rows ingested from them before."""
+        class ScanTestModel(BaseDataModel):
+            def get_new_data(self):
+                return self.scan_files(str(file_tree), extract, '*.txt')
+
+        ScanTestModel.primary_key = primary_key
+        ScanTestModel().ingest()
+
+        file_tree.join('a.txt').write('10')
+        file_tree.join('sub', 'b.txt').write('skip')
+        ScanTestModel().ingest()
+
+        model = ScanTestModel(find_new=False)
+
+        assert model.query_to_pandas(model.model.select()).value.tolist() == [10]
+        assert ScanTestModel().new_data.empty  # The manifest is recorded
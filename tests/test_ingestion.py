@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+import pytest
+import threading
+
+from monitorframe.database import DATA_DB, ArrayStoreModel, DataVersionModel
+from monitorframe.datamodel import BaseDataModel
+from monitorframe.ingestion import IngestWriter, ingest_all
+from monitorframe.scheduler import Job
+
+GRID = np.linspace(0, 1, 4)
+
+
+@pytest.fixture
+def ingestion_test_classes():
+    """Test fixture that creates data models with different kinds of columns, and one that fails to retrieve data.
+    This fixture also includes a clean-up of the tables that are created.
+    """
+    class FirstIngestModel(BaseDataModel):
+        primary_key = 'a'
+
+        def get_new_data(self):
+            return {
+                'a': [1, 2, 3],
+                'b': [0.5, np.nan, 2.5],
+                'date': pd.to_datetime(['2020-01-01', '2020-01-02 12:00', None]),
+                'flag': [True, False, True],
+                'arr': [[1, 2], [3, 4], [5, 6]],
+            }
+
+    class SecondIngestModel(BaseDataModel):
+        deduplicate_arrays = True
+
+        def get_new_data(self):
+            return {'name': [f'row{i}' for i in range(500)], 'grid': [GRID] * 500}
+
+    class FailingIngestModel(BaseDataModel):
+        def get_new_data(self):
+            raise ValueError('No data')
+
+    yield FirstIngestModel, SecondIngestModel, FailingIngestModel
+
+    for model in (FirstIngestModel, SecondIngestModel):
+        if model._database.table_exists(model.__name__):
+            model(find_new=False).model.drop_table()
+
+    ArrayStoreModel.drop_table(safe=True)
+    DataVersionModel.drop_table(safe=True)
+
+
+class TestIngestion:
+    """Test class for concurrent ingests with a single writer."""
+    def test_ingest_all(self, ingestion_test_classes):
+        """Test that the data is written as it would be by ingest, and that failures are reported per data model."""
+        first, second, failing = ingestion_test_classes
+        errors = ingest_all(ingestion_test_classes, workers=3)
+
+        assert errors['FirstIngestModel'] is None and errors['SecondIngestModel'] is None
+        assert isinstance(errors['FailingIngestModel'], ValueError)
+
+        model = first(find_new=False)
+        df = model.query_to_pandas(model.model.select(), array_cols=['arr'])
+
+        assert df.a.tolist() == [1, 2, 3]
+        assert np.isnan(df.b[1]) and df.flag.tolist() == [1, 0, 1]
+        assert df.date.tolist() == ['2020-01-01 00:00:00', '2020-01-02 12:00:00', None]
+        assert np.array_equal(df.arr[2], [5, 6])
+        assert model.model._meta.primary_key.name == 'a'
+
+        model = second(find_new=False)
+        df = model.query_to_pandas(model.model.select(), array_cols=['grid'])
+
+        assert len(df) == 500 and df.grid[0] is df.grid[499]
+        assert DataVersionModel.get_version('SecondIngestModel') == 1
+
+    def test_failed_ingest(self, ingestion_test_classes):
+        """Test that a failing ingest only fails its own future."""
+        first, second, _ = ingestion_test_classes
+
+        with IngestWriter() as writer:
+            futures = [writer.submit(first()), writer.submit(second()), writer.submit(first())]  # Duplicate keys
+
+        assert futures[0].result() == 3 and futures[1].result() == 500
+        assert futures[2].exception() is not None
+        assert first._database.execute_sql('SELECT count(*) FROM "FirstIngestModel"').fetchone()[0] == 3
+
+    def test_scheduler_uses_writer(self, ingestion_test_classes, monkeypatch):
+        """Test that scheduled ingests call the data model's own ingest method on the writer thread."""
+        first, _, _ = ingestion_test_classes
+        threads = []
+        ingest = first.ingest
+
+        def record_thread(self):
+            threads.append(threading.current_thread().name)
+            ingest(self)
+
+        monkeypatch.setattr(first, 'ingest', record_thread)
+        Job(first).execute()
+
+        assert threads == ['IngestWriter']
+        assert first._database.execute_sql('SELECT count(*) FROM "FirstIngestModel"').fetchone()[0] == 3
+
+    def test_format_off_writer(self, ingestion_test_classes, monkeypatch):
+        """Test that new data is formatted by the retrieving threads, so that the writer thread only writes."""
+        first, second, _ = ingestion_test_classes
+        threads = []
+        format_data = BaseDataModel._format
+
+        def record_thread(self):
+            threads.append(threading.current_thread().name)
+
+            return format_data(self)
+
+        monkeypatch.setattr(BaseDataModel, '_format', record_thread)
+        errors = ingest_all([first, second], workers=2)
+
+        assert errors == {'FirstIngestModel': None, 'SecondIngestModel': None}
+        assert len(threads) == 2 and 'IngestWriter' not in threads
+
+    def test_grouped_transactions(self, ingestion_test_classes, monkeypatch):
+        """Test that data models that are waiting for the writer are committed together."""
+        first, second, _ = ingestion_test_classes
+        release = threading.Event()
+        commits = []
+        ingest, commit = first.ingest, DATA_DB.commit
+
+        def wait_then_ingest(self):
+            release.wait()
+            ingest(self)
+
+        def record_commit():
+            commits.append(threading.current_thread().name)
+            commit()
+
+        monkeypatch.setattr(first, 'ingest', wait_then_ingest)
+        monkeypatch.setattr(DATA_DB, 'commit', record_commit)
+
+        with IngestWriter() as writer:
+            futures = [writer.submit(first())] + [writer.submit(second()) for _ in range(3)]
+            release.set()
+
+        assert [future.result() for future in futures] == [3, 500, 500, 500]
+        assert 1 <= commits.count('IngestWriter') <= 2  # The second ingests wait together while the first is blocked
+        assert second._database.execute_sql('SELECT count(*) FROM "SecondIngestModel"').fetchone()[0] == 1500
+
+    def test_not_started(self, ingestion_test_classes):
+        """Test that data models can't be submitted before the writer is started."""
+        with pytest.raises(RuntimeError):
+            IngestWriter().submit(ingestion_test_classes[0]())
@@ -0,0 +1,199 @@
+import numpy as np
+import os
+import pytest
+import tempfile
+import time
+
+from monitorframe import isolation
+from monitorframe.datamodel import BaseDataModel
+from monitorframe.isolation import run_isolated, run_isolated_all
+from monitorframe.monitor import BaseMonitor, BudgetExceeded
+
+# Isolated monitors are imported by their worker processes, so they're defined at the module level
+OUTPUT = tempfile.gettempdir()
+
+
+class BudgetDataModel(BaseDataModel):
+    def get_new_data(self):
+        return {'a': [1, 2, 3]}
+
+
+class BudgetMonitor(BaseMonitor):
+    data_model = BudgetDataModel
+    output = OUTPUT
+    timeout = 30
+
+    def get_data(self):
+        return self.data_model().new_data  # Monitors are isolated with find_new_data=False
+
+    def track(self):
+        return int(self.data.a.sum())
+
+
+class SleepingMonitor(BudgetMonitor):
+    timeout = 1
+
+    def track(self):
+        time.sleep(30)
+
+
+class AllocatingMonitor(BudgetMonitor):
+    timeout = 60
+    memory_limit = 500 * 1024 ** 2
+
+    def track(self):
+        hog = []
+
+        for _ in range(20):  # Up to 1 GB, in steps, until the worker is stopped
+            hog.append(np.ones(50 * 1024 ** 2 // 8))
+            time.sleep(0.05)
+
+        time.sleep(30)
+
+
+class FailingMonitor(BudgetMonitor):
+    def track(self):
+        raise ValueError('Monitor failed')
+
+
+class SharedDataModel(BaseDataModel):
+    primary_key = 'a'
+
+    def get_new_data(self):
+        return {'a': [1, 2, 3], 'b': [1.0, 2.0, 4.0], 'arr': [[1, 2], [3, 4], [5, 6]]}
+
+
+class SharedMonitor(BaseMonitor):
+    data_model = SharedDataModel
+    output = OUTPUT
+    column = 'a'
+
+    def get_data(self):
+        return self.shared_data
+
+    def track(self):
+        if self.column is None:
+            raise ValueError('Monitor failed')
+
+        if self.data.a.values.flags.writeable:
+            raise ValueError('Data is not shared')
+
+        if 'arr_dtype' in self.data or not isinstance(self.data.arr[0], np.ndarray):
+            raise ValueError('Arrays are not decoded')
+
+        return float(self.data[self.column].sum())
+
+
+class OtherSharedMonitor(SharedMonitor):
+    column = 'b'
+
+
+class FailingSharedMonitor(SharedMonitor):
+    column = None
+
+
+def clean_up(monitors):
+    """Drop the results tables and remove the figures of monitors."""
+    for monitor in monitors:
+        instance = monitor(find_new_data=False)
+
+        if instance._table.table_exists():
+            instance._table.drop_table()
+
+        for filename in os.listdir(OUTPUT):
+            if filename.startswith(f'{monitor.__name__}_') and filename.endswith('.html'):
+                os.remove(os.path.join(OUTPUT, filename))
+
+
+@pytest.fixture
+def budget_monitors():
+    """Test fixture for monitors that succeed, run too long, use too much memory or fail. This fixture also includes a
+    clean-up of the results tables.
+    """
+    monitors = [BudgetMonitor, SleepingMonitor, AllocatingMonitor, FailingMonitor]
+
+    yield monitors
+
+    clean_up(monitors)
+
+
+def last_result(monitor):
+    instance = monitor(find_new_data=False)
+
+    return instance.results_table.order_by(instance.datetime_col.desc()).first().result
+
+
+class TestBudgets:
+    """Test class for per-monitor resource budgets."""
+    def test_max_rows(self, budget_monitors, monkeypatch):
+        """Test that the row cap is enforced in-process and recorded."""
+        monkeypatch.setattr(BudgetMonitor, 'max_rows', 2)
+
+        with pytest.raises(BudgetExceeded) as error:
+            BudgetMonitor().monitor()
+
+        assert error.value.budget == 'max_rows'
+        assert last_result(BudgetMonitor)['status'] == 'budget_exceeded'
+
+    def test_isolated_success(self, budget_monitors):
+        """Test that a monitor runs successfully in an isolated worker."""
+        run_isolated(BudgetMonitor)
+
+        assert last_result(BudgetMonitor) == {'results': 6}
+
+    def test_timeout(self, budget_monitors):
+        """Test that a monitor that runs too long is stopped and the status is recorded."""
+        start = time.monotonic()
+
+        with pytest.raises(BudgetExceeded) as error:
+            run_isolated(SleepingMonitor)
+
+        assert error.value.budget == 'timeout'
+        assert time.monotonic() - start < 10
+        assert last_result(SleepingMonitor)['budget'] == 'timeout'
+
+    def test_memory_limit(self, budget_monitors):
+        """Test that a monitor that uses too much memory is stopped."""
+        with pytest.raises(BudgetExceeded) as error:
+            run_isolated(AllocatingMonitor)
+
+        assert error.value.budget == 'memory_limit'
+
+    def test_memory_limit_not_measurable(self, budget_monitors, monkeypatch):
+        """Test that a warning is issued when a memory limit is set but memory use can't be measured."""
+        monkeypatch.setattr(isolation, '_rss', lambda pid: None)
+        monkeypatch.setattr(BudgetMonitor, 'memory_limit', 500 * 1024 ** 2)
+
+        with pytest.warns(RuntimeWarning, match='not enforced'):
+            run_isolated(BudgetMonitor)
+
+    def test_failure(self, budget_monitors):
+        """Test that failures in the worker are raised with the worker's traceback."""
+        with pytest.raises(RuntimeError, match='Monitor failed'):
+            run_isolated(FailingMonitor)
+
+
+@pytest.fixture
+def shared_monitors():
+    """Test fixture for monitors that use the same data model's table. This fixture also includes a clean-up of the
+    data and results tables.
+    """
+    model = SharedDataModel()
+    model.ingest()
+
+    monitors = [SharedMonitor, OtherSharedMonitor, FailingSharedMonitor]
+
+    yield monitors
+
+    clean_up(monitors)
+    model.model.drop_table()
+
+
+def test_run_isolated_all(shared_monitors):
+    """Test that monitors of the same data model run in isolated workers on read-only views of its shared table."""
+    errors = run_isolated_all(shared_monitors, workers=2)
+
+    assert errors['SharedMonitor'] is None and errors['OtherSharedMonitor'] is None
+    assert 'Monitor failed' in str(errors['FailingSharedMonitor'])
+    assert last_result(SharedMonitor) == {'results': 6.0}
+    assert last_result(OtherSharedMonitor) == {'results': 7.0}
@@ -1,8 +1,19 @@
+import itertools
+import json
+import numpy as np
+import pandas as pd
 import pytest
 import os
+import warnings
 
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from monitorframe import stats
+from monitorframe.images import block_reduce
 from monitorframe.monitor import BaseMonitor
 from monitorframe.datamodel import BaseDataModel
+from monitorframe.database import BaseResultsModel
 
 NEW_DATA = {
     'a': ['A', 'B', 'C'],
@@ -211,7 +222,300 @@ class TestMonitor:
         if monitor_test_instance.labels is not None:
             assert monitor_test_instance.data.hover_text[0] == 'a    A'
 
+    def test_initialize_data_without_new_data(self, monitor_test_instance):
+        """Test that a clear error is raised when get_data uses new_data that wasn't retrieved."""
+        monitor = monitor_test_instance.__class__(find_new_data=False)
+
+        with pytest.raises(ValueError, match='find_new_data=True'):
+            monitor.initialize_data()
+
     def test_init_basemonitor_fails(self):
         """Test that BaseMonitor can't be used directly."""
         with pytest.raises(TypeError):
             BaseMonitor()
+
+
+@pytest.fixture(params=[None, 2])
+def chunked_monitor_test_instance(datamodel_test_instance, request):
+    """Test fixture for a Monitor object whose get_data yields chunks of data, run with and without chunk workers."""
+    class ChunkedMonitorTestObject(BaseMonitor):
+        data_model = datamodel_test_instance
+        chunk_workers = request.param
+        plottype = 'scatter'
+        x = 'b'
+        y = 'c'
+
+        def get_data(self):
+            data = self.model.new_data
+
+            for start in range(0, len(data), 2):
+                yield data.iloc[start:start + 2]
+
+        def track(self):
+            pass
+
+        def track_chunk(self, chunk):
+            return chunk.c.sum()
+
+        def reduce_results(self, partials):
+            return sum(partials)
+
+        def find_outliers_chunk(self, chunk):
+            return chunk.c >= 8
+
+        def plot_data_chunk(self, chunk):
+            return chunk[['b', 'c']]
+
+    monitor_test_instance = ChunkedMonitorTestObject()
+
+    yield monitor_test_instance
+
+    if monitor_test_instance.results_table is not None:
+        monitor_test_instance._table.drop_table()
+
+    if os.path.exists(monitor_test_instance.output):
+        os.remove(monitor_test_instance.output)
+
+
+class TestChunkedMonitor:
+    """Test class for monitors that process their data in chunks."""
+    def test_initialize_data(self, chunked_monitor_test_instance):
+        """Test that chunks are not loaded when the data is initialized."""
+        chunked_monitor_test_instance.initialize_data()
+
+        assert chunked_monitor_test_instance.chunked
+        assert chunked_monitor_test_instance.data is None
+
+    def test_run_analysis(self, chunked_monitor_test_instance):
+        """Test that the per-chunk results are reduced."""
+        chunked_monitor_test_instance.initialize_data()
+        chunked_monitor_test_instance.run_analysis()
+
+        assert chunked_monitor_test_instance.results == 24
+        assert chunked_monitor_test_instance.outliers.tolist() == [False, True, True]
+        assert chunked_monitor_test_instance.data.c.tolist() == [7, 8, 9]
+        assert not chunked_monitor_test_instance.chunked
+
+    def test_outliers_aligned(self, chunked_monitor_test_instance, monkeypatch):
+        """Test that outlier masks stay aligned with the plotted data when rows are dropped for plotting."""
+        monitor = type(chunked_monitor_test_instance)
+        monkeypatch.setattr(monitor, 'find_outliers_chunk', lambda self, chunk: (chunk.c >= 8).values)
+        monkeypatch.setattr(monitor, 'plot_data_chunk', lambda self, chunk: chunk.loc[chunk.c != 8, ['b', 'c']])
+
+        chunked_monitor_test_instance.initialize_data()
+        chunked_monitor_test_instance.run_analysis()
+
+        assert chunked_monitor_test_instance.data.c.tolist() == [7, 9]
+        assert chunked_monitor_test_instance.outliers.tolist() == [False, True]
+
+    def test_monitor(self, chunked_monitor_test_instance):
+        """Test that the monitor method executes successfully with chunked data and stores the reduced results."""
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', UserWarning)
+            chunked_monitor_test_instance.monitor()
+
+        assert os.path.exists(chunked_monitor_test_instance.output)
+        assert [row.result for row in chunked_monitor_test_instance.results_table] == [{'results': 24}]
+
+
+IMAGE = np.arange(3000 * 2000, dtype=float).reshape(3000, 2000)
+
+
+@pytest.fixture(params=['array', 'column', 'rows'])
+def image_monitor_test_instance(datamodel_test_instance, request, tmpdir):
+    """Test fixture for a Monitor that plots a large image given as a 2D array, a column with a 2D array, or a column
+    of 1D arrays (image rows).
+    """
+    class ImageMonitorTestObject(BaseMonitor):
+        data_model = datamodel_test_instance
+        plottype = 'image'
+        z = 'image'
+        max_image_size = (300, 400)
+        image_reduction = 'max'
+        image_tiles = str(tmpdir.join('tiles'))
+        output = str(tmpdir)
+
+        def get_data(self):
+            if request.param == 'array':
+                return IMAGE
+
+            if request.param == 'column':
+                return pd.DataFrame({'image': [IMAGE, IMAGE * 2]})
+
+            return pd.DataFrame({'image': list(IMAGE)})
+
+        def track(self):
+            pass
+
+    return ImageMonitorTestObject()
+
+
+class TestImageMonitor:
+    """Test class for plotting large images."""
+    def test_basic_image(self, image_monitor_test_instance):
+        """Test that the image is downsampled to the maximum size with the selected reduction."""
+        image_monitor_test_instance.initialize_data()
+        image_monitor_test_instance.plot()
+
+        heatmap = image_monitor_test_instance.figure.data[0]
+        z = np.asarray(heatmap.z)
+
+        assert z.shape == (300, 400)
+        assert z[0, 0] == IMAGE[:10, :5].max()
+        assert heatmap.x[0] == 2 and heatmap.y[0] == 4.5  # Block centers in image pixels
+
+    def test_tiles(self, image_monitor_test_instance, tmpdir):
+        """Test that a tile pyramid is written down to a single tile."""
+        image_monitor_test_instance.initialize_data()
+        image_monitor_test_instance.plot()
+
+        with open(tmpdir.join('tiles', 'tiles.json')) as f:
+            layout = json.load(f)
+
+        assert layout['levels'][0]['tiles'] == [6, 4]
+        assert layout['levels'][-1]['tiles'] == [1, 1]
+        assert np.load(str(tmpdir.join('tiles', '0', '5_3.npy'))).shape == (3000 - 5 * 512, 2000 - 3 * 512)
+
+        # Each level is reduced from the previous one; with "max" that's the same as reducing the full image
+        last = layout['levels'][-1]
+        expected = block_reduce(IMAGE, (last['factor'], last['factor']), 'max')
+        assert np.array_equal(np.load(str(tmpdir.join('tiles', str(last['level']), '0_0.npy'))), expected)
+
+
+def test_block_reduce_edges():
+    """Test that the partial blocks of ragged edges are reduced over the pixels that are available."""
+    image = np.arange(5 * 7, dtype=float).reshape(5, 7)
+    image[0, 0] = np.nan
+
+    reduced = block_reduce(image, (2, 3), 'mean')
+
+    assert reduced.shape == (3, 3)
+    assert reduced[0, 0] == np.nanmean(image[:2, :3])
+    assert reduced[1, 2] == image[2:4, 6].mean()
+    assert reduced[2, 1] == image[4, 3:6].mean()
+    assert reduced[2, 2] == image[4, 6]
+
+
+@pytest.fixture
+def concurrent_monitors(datamodel_test_instance):
+    """Test fixture for two Monitor classes that store their results from concurrent threads."""
+    class FirstResultsMonitor(BaseMonitor):
+        data_model = datamodel_test_instance
+
+        def get_data(self):
+            return self.model.new_data
+
+        def track(self):
+            return 1
+
+    class SecondResultsMonitor(FirstResultsMonitor):
+        def track(self):
+            return 2
+
+    yield FirstResultsMonitor, SecondResultsMonitor
+
+    for monitor in (FirstResultsMonitor, SecondResultsMonitor):
+        table = BaseResultsModel.for_monitor(monitor.__name__)
+
+        if table.table_exists():
+            table.drop_table()
+
+
+class TestResultsModels:
+    """Test class for the per-monitor results models."""
+    def test_for_monitor(self):
+        """Test that each monitor gets its own results model, which is created once."""
+        first = BaseResultsModel.for_monitor('FirstResultsMonitor')
+
+        assert first is BaseResultsModel.for_monitor('FirstResultsMonitor')
+        assert first is not BaseResultsModel.for_monitor('SecondResultsMonitor')
+        assert first._meta.table_name == 'FirstResultsMonitor'
+        assert BaseResultsModel._meta.table_name != 'FirstResultsMonitor'
+
+    def test_concurrent_store_results(self, concurrent_monitors):
+        """Test that monitors running in threads store their results in their own tables."""
+        def run(monitor_cls):
+            monitor = monitor_cls()
+            monitor.date = monitor.date.replace(microsecond=0) + timedelta(seconds=next(seconds))
+            monitor.initialize_data()
+            monitor.run_analysis()
+            monitor.store_results()
+
+        seconds = itertools.count()
+
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(run, concurrent_monitors * 10))
+
+        for monitor_cls in concurrent_monitors:
+            results = [row.result['results'] for row in BaseResultsModel.for_monitor(monitor_cls.__name__).select()]
+
+            assert results == [monitor_cls.track(None)] * 10
+
+    def test_store_dataframe(self, datamodel_test_instance):
+        """Test that DataFrame results, such as grouped statistics, are stored as one record per row."""
+        class FrameResultsMonitor(BaseMonitor):
+            data_model = datamodel_test_instance
+
+            def get_data(self):
+                return self.model.new_data
+
+            def track(self):
+                return stats.robust_stats(self.data.assign(c=[7, 8, np.nan]), 'c', by='a')
+
+        monitor = FrameResultsMonitor()
+        monitor.initialize_data()
+        monitor.run_analysis()
+        monitor.store_results()
+
+        try:
+            stored = monitor.results_table.get().result['results']
+
+        finally:
+            monitor._table.drop_table()
+
+        assert [record['a'] for record in stored] == ['A', 'B']
+        assert stored[0]['median'] == 7 and stored[0]['std'] is None
+
+
+@pytest.fixture
+def preview_monitor_test_instance(datamodel_test_instance):
+    """Test fixture for a Monitor in preview mode, with notifications turned on."""
+    datamodel_test_instance().ingest()
+
+    class PreviewMonitorTestObject(BaseMonitor):
+        data_model = datamodel_test_instance
+        notification_settings = NOTIFICATIONS['notification_settings']
+        preview_size = 2
+        x = 'b'
+        y = 'c'
+
+        def get_data(self):
+            return self.model.new_data
+
+        def track(self):
+            return self.data.c.sum()
+
+        def set_notification(self):
+            return 'notification'
+
+    monitor_test_instance = PreviewMonitorTestObject(preview=True)
+
+    yield monitor_test_instance
+
+    datamodel_test_instance(find_new=False).model.drop_table()
+
+    if os.path.exists(monitor_test_instance.output):
+        os.remove(monitor_test_instance.output)
+
+
+class TestPreviewMonitor:
+    """Test class for monitors in preview mode."""
+    def test_monitor(self, preview_monitor_test_instance, monkeypatch):
+        """Test that a preview uses the sample and writes a separate figure without storing or sending anything."""
+        monkeypatch.setattr(preview_monitor_test_instance, 'notify', lambda: pytest.fail('Notification sent'))
+        preview_monitor_test_instance.monitor()
+
+        assert len(preview_monitor_test_instance.data) == 2
+        assert preview_monitor_test_instance.output.endswith('_preview.html')
+        assert os.path.exists(preview_monitor_test_instance.output)
+        assert preview_monitor_test_instance.results_table is None
@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+import peewee
+import pytest
+
+from datetime import datetime
+from sqlite3 import IntegrityError
+
+from monitorframe.backends import PartitionedBackend
+from monitorframe.database import DATA_DB, DataVersionModel
+from monitorframe.datamodel import BaseDataModel
+
+NEW_DATA = {
+    'a': [1, 2, 3, 4, 5],
+    'date': pd.to_datetime(['2019-06-01', '2020-01-15', '2020-02-01', '2020-12-31 23:00', '2021-03-01']),
+    'value': [0.5, 1.5, 2.5, 3.5, 4.5],
+    'arr': [[1, 2], [3, 4], [5, 6], [7, 8], [9, 10]]
+}
+
+
+@pytest.fixture(params=['year', 'month'])
+def partitioned_test_instance(request):
+    """Test fixture that creates a datamodel object partitioned by year and by month, and cleans up the partitions."""
+    class PartitionedTestObject(BaseDataModel):
+        primary_key = 'a'
+        storage = PartitionedBackend('date', period=request.param)
+
+        def get_new_data(self):
+            return NEW_DATA
+
+    datamodel_test_instance = PartitionedTestObject()
+
+    yield datamodel_test_instance
+
+    with DATA_DB as db:
+        db.execute_sql('DROP VIEW IF EXISTS "PartitionedTestObject"')
+
+        for name in PartitionedTestObject.storage.partitions('PartitionedTestObject'):
+            db.execute_sql(f'DROP TABLE "{name}"')
+
+    DataVersionModel.drop_table(safe=True)
+
+
+class TestPartitionedBackend:
+    """Test class for time-partitioned data tables."""
+    def test_partitions(self, partitioned_test_instance):
+        """Test that one table is created per period, and combined in a view with the data model's name."""
+        partitioned_test_instance.ingest()
+        storage = partitioned_test_instance.storage
+
+        if storage.period == 'year':
+            expected = ['PartitionedTestObject_2019', 'PartitionedTestObject_2020', 'PartitionedTestObject_2021']
+
+        else:
+            expected = [
+                'PartitionedTestObject_2019_06',
+                'PartitionedTestObject_2020_01',
+                'PartitionedTestObject_2020_02',
+                'PartitionedTestObject_2020_12',
+                'PartitionedTestObject_2021_03'
+            ]
+
+        assert storage.partitions('PartitionedTestObject') == expected
+        assert storage.partitions('PartitionedTestObject', start='2020-02-15', end='2020-12-31')[0] in (
+            'PartitionedTestObject_2020', 'PartitionedTestObject_2020_02'
+        )
+        assert sorted(partitioned_test_instance.model._meta.columns) == ['a', 'arr', 'arr_dtype', 'date', 'value']
+
+    def test_query_to_pandas(self, partitioned_test_instance):
+        """Test that queries on the view return all partitions, and that arrays are decoded."""
+        partitioned_test_instance.ingest()
+        model = partitioned_test_instance.model
+
+        df = partitioned_test_instance.query_to_pandas(model.select().order_by(model.a), cache=False)
+
+        assert df.a.tolist() == [1, 2, 3, 4, 5]
+        assert np.array_equal(df.arr[4], [9, 10])
+
+    def test_model_select(self, partitioned_test_instance):
+        """Test that the view can be queried directly with the data model's model."""
+        partitioned_test_instance.ingest()
+        model = partitioned_test_instance.model
+
+        assert model.select().count() == 5
+        assert [row['a'] for row in model.select(model.a).where(model.value > 2).order_by(model.a).dicts()] == [3, 4, 5]
+
+    def test_primary_key(self, partitioned_test_instance):
+        """Test that the primary key is enforced within partitions."""
+        partitioned_test_instance.ingest()
+
+        with pytest.raises(IntegrityError):
+            partitioned_test_instance.ingest()
+
+    def test_pruning(self, partitioned_test_instance):
+        """Test that range queries only read the overlapping partitions."""
+        partitioned_test_instance.ingest()
+        model = partitioned_test_instance.model
+        storage = partitioned_test_instance.storage
+
+        query = model.select(model.a).where(
+            (model.date >= datetime(2020, 2, 1)) & (model.date <= datetime(2020, 12, 31, 23, 30)) & (model.value > 0)
+        ).order_by(model.a)
+        sql, _ = storage._sql(query)
+
+        assert '"PartitionedTestObject_2019' not in sql and '"PartitionedTestObject_2021' not in sql
+        assert partitioned_test_instance.query_to_pandas(query, cache=False).a.tolist() == [3, 4]
+
+        between = model.select(model.a).where(model.date.between(datetime(2019, 1, 1), datetime(2019, 12, 31)))
+        assert partitioned_test_instance.query_to_pandas(between, cache=False).a.tolist() == [1]
+
+        empty = model.select(model.a).where(model.date > datetime(2030, 1, 1))
+        assert partitioned_test_instance.query_to_pandas(empty, cache=False).empty
+
+        # Conditions combined with OR are not used to prune
+        either = model.select(model.a).where((model.date < datetime(2020, 1, 1)) | (model.a == 5))
+        assert storage._sql(either)[0] == either.sql()[0]
+        assert sorted(partitioned_test_instance.query_to_pandas(either, cache=False).a) == [1, 5]
+
+    def test_archive(self, partitioned_test_instance, tmpdir):
+        """Test that an archived partition is moved to a standalone file and removed from the view."""
+        partitioned_test_instance.ingest()
+        storage = partitioned_test_instance.storage
+        oldest = storage.partitions('PartitionedTestObject')[0]
+        path = str(tmpdir.join('archive.db'))
+
+        storage.archive('PartitionedTestObject', oldest, path)
+
+        assert oldest not in storage.partitions('PartitionedTestObject')
+
+        model = partitioned_test_instance.model
+        assert partitioned_test_instance.query_to_pandas(model.select()).a.tolist() == [2, 3, 4, 5]
+
+        archive = peewee.SqliteDatabase(path)
+        assert archive.execute_sql(f'SELECT a FROM "{oldest}"').fetchall() == [(1,)]
+        archive.close()
+
+        with pytest.raises(ValueError):
+            storage.archive('PartitionedTestObject', oldest, path)
+
+    def test_mjd(self):
+        """Test that numeric times can be read as Modified Julian Dates."""
+        storage = PartitionedBackend('mjd', mjd=True)
+
+        assert storage._to_timestamps([58849.0])[0] == pd.Timestamp('2020-01-01')
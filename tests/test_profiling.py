@@ -0,0 +1,105 @@
+import os
+import pytest
+import tracemalloc
+
+from concurrent.futures import ThreadPoolExecutor
+
+from monitorframe import profiling
+from monitorframe.datamodel import BaseDataModel
+from monitorframe.monitor import BaseMonitor
+
+
+@pytest.fixture
+def profiled_monitor(tmpdir):
+    """Test fixture that turns profiling on and creates a monitor, cleaning up any tables created."""
+    class ProfiledDataModel(BaseDataModel):
+        def get_new_data(self):
+            return {'a': [1, 2, 3], 'b': [4, 5, 6]}
+
+    class ProfiledMonitor(BaseMonitor):
+        data_model = ProfiledDataModel
+        output = str(tmpdir)
+        plottype = 'scatter'
+        x = 'a'
+        y = 'b'
+
+        def get_data(self):
+            return self.model.new_data
+
+        def track(self):
+            return int(self.data.a.sum())
+
+    profiling.enable(str(tmpdir.join('profiles')))
+
+    monitor = ProfiledMonitor()
+
+    yield monitor
+
+    profiling.disable()
+
+    if monitor.results_table is not None:
+        monitor._table.drop_table()
+
+
+class TestProfiling:
+    """Test class for the opt-in stage profiling."""
+    def test_disabled(self, tmpdir):
+        """Test that nothing is written if profiling is off."""
+        with profiling.profile_stage('Owner', 'stage'):
+            pass
+
+        assert profiling.profiling_directory() is None
+        assert not os.listdir(str(tmpdir))
+
+    def test_stages(self, profiled_monitor, tmpdir):
+        """Test that a profile and allocation snapshot is written for each stage."""
+        profiled_monitor.monitor()
+
+        written = sorted(os.listdir(str(tmpdir.join('profiles', 'ProfiledMonitor'))))
+
+        for stage in ('initialize_data', 'run_analysis', 'plot', 'write_figure', 'store_results'):
+            assert f'{stage}.pstats' in written and f'{stage}.tracemalloc' in written
+
+        assert tmpdir.join('profiles', 'ProfiledDataModel', 'get_new_data.pstats').exists()
+
+    def test_summarize(self, profiled_monitor, tmpdir):
+        """Test that the summary lists the hotspots and allocation sites of each stage."""
+        profiled_monitor.monitor()
+
+        summary = profiling.summarize(str(tmpdir.join('profiles')), top=3)
+
+        assert 'ProfiledMonitor.plot' in summary
+        assert 'hotspots' in summary and 'allocation sites' in summary
+
+    def test_concurrent_stages(self, tmpdir):
+        """Test that stages profiled in several threads at once are profiled one at a time."""
+        profiling.enable(str(tmpdir))
+
+        def run(owner):
+            with profiling.profile_stage(owner, 'stage'):
+                return sum(range(10000))
+
+        try:
+            with ThreadPoolExecutor(4) as executor:
+                list(executor.map(run, [f'Owner{i}' for i in range(8)]))
+
+        finally:
+            profiling.disable()
+
+        assert all(tmpdir.join(f'Owner{i}', 'stage.pstats').exists() for i in range(8))
+
+    def test_failed_stage(self, tmpdir):
+        """Test that profiling is cleaned up if a stage fails."""
+        profiling.enable(str(tmpdir))
+
+        try:
+            with pytest.raises(ValueError):
+                with profiling.profile_stage('Owner', 'stage'):
+                    raise ValueError
+
+        finally:
+            profiling.disable()
+
+        assert not getattr(profiling._state, 'active', False)
+        assert not tracemalloc.is_tracing()
+        assert tmpdir.join('Owner', 'stage.pstats').exists()
@@ -0,0 +1,130 @@
+import os
+import pytest
+import tempfile
+import time
+
+from datetime import datetime, timedelta
+
+from monitorframe.database import RunStateModel
+from monitorframe.datamodel import BaseDataModel
+from monitorframe.monitor import BaseMonitor
+from monitorframe.scheduler import Scheduler, SUCCESS, FAILED, SKIPPED, BUDGET_EXCEEDED
+
+NEW_DATA = {
+    'a': [1, 2, 3],
+    'b': [4, 5, 6],
+}
+
+
+
+class SlowDataModel(BaseDataModel):
+    def get_new_data(self):
+        return NEW_DATA
+
+
+class SlowMonitor(BaseMonitor):
+    """Monitor with a budget, which is run in an isolated worker that imports it."""
+    data_model = SlowDataModel
+    output = tempfile.gettempdir()
+    timeout = 0.5
+
+    def get_data(self):
+        return self.model.query_to_pandas(self.model.model.select())
+
+    def track(self):
+        time.sleep(30)
+
+
+@pytest.fixture
+def scheduler_test_classes(tmpdir):
+    """Test fixture that creates a data model, a data model that fails to ingest, and a monitor for each. This fixture
+    also includes a clean-up of any tables and files that are created.
+    """
+    class SchedulerDataModel(BaseDataModel):
+        def get_new_data(self):
+            return NEW_DATA
+
+    class FailingDataModel(BaseDataModel):
+        def get_new_data(self):
+            raise ValueError('No data')
+
+    class SchedulerMonitor(BaseMonitor):
+        data_model = SchedulerDataModel
+        output = str(tmpdir)
+
+        def get_data(self):
+            return self.model.query_to_pandas(self.model.model.select())
+
+        def track(self):
+            return self.data.a.sum()
+
+    class FailingDataModelMonitor(SchedulerMonitor):
+        data_model = FailingDataModel
+
+    yield SchedulerDataModel, SchedulerMonitor, FailingDataModelMonitor
+
+    for model in (SchedulerDataModel, FailingDataModel):
+        if model._database.table_exists(model.__name__):
+            model(find_new=False).model.drop_table()
+
+    for monitor in (SchedulerMonitor, FailingDataModelMonitor):
+        instance = monitor(find_new_data=False)
+
+        if instance.results_table is not None:
+            instance._table.drop_table()
+
+    RunStateModel.drop_table(safe=True)
+
+
+class TestScheduler:
+    """Test class for the dependency-aware Scheduler."""
+    def test_graph(self, scheduler_test_classes):
+        """Test that monitors are grouped under their data model."""
+        data_model, monitor, failing_monitor = scheduler_test_classes
+        scheduler = Scheduler([monitor, failing_monitor])
+
+        graph = {job.name: [dependent.name for dependent in dependents] for job, dependents in scheduler.graph.items()}
+
+        assert graph == {
+            'SchedulerDataModel': ['SchedulerMonitor'],
+            'FailingDataModel': ['FailingDataModelMonitor']
+        }
+
+    def test_run_pending(self, scheduler_test_classes):
+        """Test that monitors run after a successful ingest, and are skipped after a failed ingest."""
+        data_model, monitor, failing_monitor = scheduler_test_classes
+        scheduler = Scheduler([monitor, failing_monitor], retries=1, workers=1)
+
+        statuses = scheduler.run_pending()
+
+        assert statuses == {
+            'SchedulerDataModel': SUCCESS,
+            'SchedulerMonitor': SUCCESS,
+            'FailingDataModel': FAILED,
+            'FailingDataModelMonitor': SKIPPED
+        }
+
+        failed = RunStateModel.get(RunStateModel.job == 'FailingDataModel')
+        assert failed.attempts == 2 and 'No data' in failed.error
+
+    def test_intervals(self, scheduler_test_classes):
+        """Test that a data model isn't ingested again before its interval has elapsed."""
+        data_model, monitor, _ = scheduler_test_classes
+        scheduler = Scheduler([monitor], intervals={data_model: timedelta(hours=1)}, workers=1)
+
+        assert 'SchedulerDataModel' in scheduler.run_pending()
+        assert scheduler.run_pending() == {}
+        assert 'SchedulerDataModel' in scheduler.run_pending(now=datetime.now() + timedelta(hours=2))
+        assert os.path.exists(monitor(find_new_data=False).output)
+
+    def test_budget_exceeded(self, scheduler_test_classes):
+        """Test that monitors with budgets run isolated, and that exceeding a budget is recorded without retries."""
+        statuses = Scheduler([SlowMonitor], retries=2, workers=1).run_pending()
+
+        try:
+            assert statuses['SlowMonitor'] == BUDGET_EXCEEDED
+            assert RunStateModel.get(RunStateModel.job == 'SlowMonitor').attempts == 1
+
+        finally:
+            SlowMonitor(find_new_data=False)._table.drop_table()
+            SlowDataModel(find_new=False).model.drop_table()
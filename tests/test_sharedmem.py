@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+import pickle
+import pytest
+
+from monitorframe.database import ArrayStoreModel
+from monitorframe.datamodel import BaseDataModel
+from monitorframe.isolation import _context
+from monitorframe import sharedmem
+from monitorframe.sharedmem import SharedFrame
+
+GRID = np.arange(6.0).reshape(2, 3)
+
+FRAME = pd.DataFrame(
+    {
+        'a': [1, 2, 3],
+        'name': ['x', 'y', None],
+        'value': [0.5, np.nan, 2.5],
+        'date': pd.to_datetime(['2020-01-01', '2020-06-01', '2021-01-01']),
+        'grid': [GRID, np.ones((4, 1)), GRID],
+        'mode': pd.Categorical(['u', 'v', 'u']),
+        'b': [4, 5, 6],
+    },
+    index=[10, 20, 30]
+)
+
+
+def _attach_in_worker(state: bytes, connection):
+    shared = pickle.loads(state)
+    df = shared.to_pandas()
+    connection.send((df.drop(columns='grid'), [array.tolist() for array in df.grid], df.a.values.flags.writeable))
+    connection.close()
+
+
+class TestSharedFrame:
+    """Test class for DataFrames in shared memory."""
+    def test_round_trip(self):
+        """Test that the DataFrame is rebuilt with read-only views of the shared memory."""
+        with SharedFrame(FRAME) as shared:
+            df = shared.to_pandas()
+
+            pd.testing.assert_frame_equal(df.drop(columns='grid'), FRAME.drop(columns='grid'))
+            assert all(np.array_equal(left, right) for left, right in zip(df.grid, FRAME.grid))
+            assert len(shared) == 3
+
+            # Rows that share an array still share it, and nothing can be modified
+            assert df.grid[10] is df.grid[30]
+            assert not df.grid[10].flags.writeable and not df.a.values.flags.writeable
+
+            with pytest.raises(ValueError):
+                df.a.values[0] = 0
+
+            # Columns are views of the shared memory, also when selected before filtering
+            buffer = np.frombuffer(shared._segment.buf, dtype=np.uint8)
+            assert np.shares_memory(df.a.values, buffer) and np.shares_memory(df.b.values, buffer)
+            assert np.shares_memory(df.grid[20], buffer)
+            assert len(df.a[df.a > 1]) == 2 and np.shares_memory(df.a.values, buffer)
+
+            del df, buffer
+
+    def test_other_process(self):
+        """Test that a pickled SharedFrame is attached to by another process."""
+        receiver, sender = _context().Pipe(duplex=False)
+
+        with SharedFrame(FRAME) as shared:
+            state = pickle.dumps(shared)
+            process = _context().Process(target=_attach_in_worker, args=(state, sender))
+            process.start()
+
+            df, grids, writeable = receiver.recv()
+            process.join()
+
+        assert len(state) < 1000
+        pd.testing.assert_frame_equal(df, FRAME.drop(columns='grid'))
+        assert grids == [array.tolist() for array in FRAME.grid]
+        assert not writeable
+
+    def test_unavailable(self, monkeypatch):
+        """Test that sharing fails clearly where shared memory isn't available (Python < 3.8)."""
+        monkeypatch.setattr(sharedmem, 'SharedMemory', None)
+
+        with pytest.raises(RuntimeError, match='3.8'):
+            SharedFrame(FRAME)
+
+    def test_empty(self):
+        """Test that an empty DataFrame can be shared."""
+        with SharedFrame(FRAME.iloc[:0]) as shared:
+            assert shared.to_pandas().columns.tolist() == FRAME.columns.tolist()
+
+
+@pytest.fixture
+def share_test_instance():
+    """Test fixture that creates a datamodel object with ingested, deduplicated arrays to share."""
+    class ShareTestObject(BaseDataModel):
+        primary_key = 'a'
+        deduplicate_arrays = ['grid']
+
+        def get_new_data(self):
+            return FRAME[['a', 'value', 'grid']].assign(arr=[[1, 2], [3, 4], [5, 6]])
+
+    datamodel_test_instance = ShareTestObject()
+    datamodel_test_instance.ingest()
+
+    yield datamodel_test_instance
+
+    if datamodel_test_instance.model:
+        datamodel_test_instance.model.drop_table()
+
+    ArrayStoreModel.drop_table(safe=True)
+
+
+def test_share(share_test_instance):
+    """Test that a data model's table is shared with its arrays."""
+    with share_test_instance.share() as shared:
+        df = shared.to_pandas()
+
+        assert df.a.tolist() == [1, 2, 3]
+        assert df.grid[0] is df.grid[2]
+
+        del df
+
+    with share_test_instance.share(share_test_instance.model.select().where(share_test_instance.model.a > 1),
+                                   columns=['a']) as shared:
+        assert shared.to_pandas().columns.tolist() == ['a'] and len(shared) == 2
+
+
+def test_share_without_new_data(share_test_instance):
+    """Test that all array columns are decoded when the data model hasn't retrieved new data."""
+    data_model = type(share_test_instance)(find_new=False)
+
+    with data_model.share() as shared:
+        df = shared.to_pandas()
+
+        assert df.columns.tolist() == ['a', 'value', 'grid', 'arr']
+        assert np.array_equal(df.grid[0], GRID) and np.array_equal(df.arr[2], [5, 6])
+
+        del df
+
+    with data_model.share(columns=['a', 'arr']) as shared:
+        assert shared.to_pandas().columns.tolist() == ['a', 'arr']
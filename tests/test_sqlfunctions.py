@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from peewee import fn
+
+from monitorframe.compression import decode
+from monitorframe.database import ArrayStoreModel
+from monitorframe.datamodel import BaseDataModel
+from monitorframe.sqlfunctions import to_array
+
+FLUX = [np.array([1.0, 2.0, 3.0, 4.0]), np.array([3.0, 2.0, np.nan, 0.0]), np.array([-1.0, 5.0, 1.0, 2.0])]
+GRID = np.arange(6, dtype=np.int32).reshape(2, 3)
+
+
+@pytest.fixture
+def array_function_test_instance():
+    """Test fixture that creates a datamodel object with plain, compressed and deduplicated array columns."""
+    class ArrayFunctionTestObject(BaseDataModel):
+        primary_key = 'a'
+        compression = {'compressed': 'zlib'}
+        deduplicate_arrays = ['grid']
+
+        def get_new_data(self):
+            return {
+                'a': [1, 2, 3],
+                'group': ['x', 'x', 'y'],
+                'flux': FLUX,
+                'compressed': FLUX,
+                'grid': [GRID, GRID, GRID + 1],
+            }
+
+    datamodel_test_instance = ArrayFunctionTestObject()
+    datamodel_test_instance.ingest()
+
+    yield datamodel_test_instance
+
+    if datamodel_test_instance.model:
+        datamodel_test_instance.model.drop_table()
+
+    ArrayStoreModel.drop_table(safe=True)
+
+
+class TestArrayFunctions:
+    """Test class for the SQL functions of array columns."""
+    @pytest.mark.parametrize('column', ['flux', 'compressed'])
+    def test_reductions(self, array_function_test_instance, column):
+        """Test that scalar reductions of each row's array are computed in the database. Results aren't converted by the
+        array column's field.
+        """
+        model = array_function_test_instance.model
+        array = model._meta.columns[column]
+
+        rows = list(
+            model.select(
+                fn.array_length(array).coerce(False),
+                fn.array_mean(array).coerce(False),
+                fn.array_max(array).coerce(False),
+                fn.array_norm(array).coerce(False),
+                fn.array_norm(array, 1).coerce(False),
+                fn.array_element(array, -1).coerce(False),
+                fn.array_sum(fn.array_slice(array, 1, 3)).coerce(False),
+            ).order_by(model.a).tuples()
+        )
+
+        assert rows[0] == (4, 2.5, 4.0, pytest.approx(np.sqrt(30)), 10.0, 4.0, 5.0)
+        assert rows[1][1] is None  # NaN is returned as NULL
+        assert rows[2][2] == 5.0
+
+    def test_filter(self, array_function_test_instance):
+        """Test that array functions can be used to filter rows."""
+        model = array_function_test_instance.model
+
+        assert [row.a for row in model.select(model.a).where(fn.array_min(model.flux) < 0)] == [3]
+
+    @pytest.mark.parametrize('column', ['flux', 'compressed'])
+    def test_elementwise_aggregates(self, array_function_test_instance, column):
+        """Test that element-wise aggregates combine the arrays of each group."""
+        model = array_function_test_instance.model
+        array = model._meta.columns[column]
+
+        rows = list(
+            model.select(model.group, fn.elementwise_mean(array).coerce(False), fn.elementwise_max(array).coerce(False))
+            .group_by(model.group)
+            .order_by(model.group)
+            .tuples()
+        )
+
+        assert np.array_equal(decode(rows[0][1]), [2.0, 2.0, np.nan, 2.0], equal_nan=True)
+        assert np.array_equal(decode(rows[0][2]), [3.0, 2.0, np.nan, 4.0], equal_nan=True)
+        assert np.array_equal(decode(rows[1][1]), FLUX[2])
+
+    def test_deduplicated(self, array_function_test_instance):
+        """Test that deduplicated arrays are reduced by joining the ArrayStore table."""
+        model = array_function_test_instance.model
+        data = fn.array_from_buffer(ArrayStoreModel.data, ArrayStoreModel.dtype, ArrayStoreModel.shape)
+
+        query = (
+            model.select(fn.array_max(data), fn.elementwise_sum(data))
+            .join(ArrayStoreModel, on=(model.grid == ArrayStoreModel.digest))
+            .where(model.group == 'x')
+        )
+        maximum, total = query.tuples()[0]
+
+        assert maximum == 5
+        assert np.array_equal(decode(total), 2 * GRID)
+
+
+@pytest.mark.parametrize(
+    'value,expected',
+    [
+        ('[1.0, 2.5, nan, -inf]', [1.0, 2.5, np.nan, -np.inf]),
+        ('[[1, 2], [3, 4]]', [[1, 2], [3, 4]]),
+        ('[True, False]', [True, False]),
+        ('[]', []),
+    ]
+)
+def test_to_array(value, expected):
+    """Test that array text is parsed with and without the fast path."""
+    assert np.array_equal(to_array(value), np.array(expected), equal_nan=np.array(expected).dtype.kind == 'f')
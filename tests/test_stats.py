@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from monitorframe import stats
+
+RNG = np.random.default_rng(0)
+GROUPS = 40
+POINTS = 30
+
+TREND_DATA = pd.DataFrame({
+    'segment': np.repeat(np.where(np.arange(GROUPS) % 2, 'FUVA', 'FUVB'), POINTS),
+    'cenwave': np.repeat(np.arange(GROUPS) * 10, POINTS),
+    'x': RNG.uniform(0, 100, GROUPS * POINTS),
+}).sample(frac=1, random_state=1).reset_index(drop=True)  # Groups are interleaved
+TREND_DATA['y'] = 1 + TREND_DATA.cenwave / 1000 * TREND_DATA.x + RNG.normal(0, 0.1, len(TREND_DATA))
+
+
+class TestFitTrends:
+    """Test class for grouped least squares fits."""
+    @pytest.mark.parametrize('degree', [1, 2, 3])
+    def test_matches_polyfit(self, degree):
+        """Test that the coefficients and residuals match a separate fit of each group."""
+        fits = stats.fit_trends(TREND_DATA, 'x', 'y', by=['segment', 'cenwave'], degree=degree)
+
+        assert len(fits) == GROUPS
+        assert list(fits.columns[:3]) == ['segment', 'cenwave', 'n']
+
+        for _, fit in fits.iterrows():
+            group = TREND_DATA[TREND_DATA.cenwave == fit.cenwave]
+            expected = np.polyfit(group.x, group.y, degree)[::-1]
+            rms = np.sqrt(np.mean((group.y - np.polyval(expected[::-1], group.x)) ** 2))
+
+            assert fit.n == POINTS
+            assert np.allclose([fit[f'coef_{j}'] for j in range(degree + 1)], expected, rtol=1e-6, atol=1e-9)
+            assert np.isclose(fit.rms, rms)
+
+    def test_cubic_mjd(self):
+        """Test that a cubic fit is well-conditioned when x is large compared to its range (MJDs)."""
+        df = pd.DataFrame({'g': np.repeat([1, 2], 100), 'x': 58000 + np.tile(np.linspace(0, 1000, 100), 2)})
+        t = (df.x - 58500) / 500
+        df['y'] = 1 + 2 * t - 3 * t ** 2 + 0.5 * t ** 3 + df.g
+
+        fits = stats.fit_trends(df, 'x', 'y', by='g', degree=3)
+
+        assert fits.filter(like='coef_').notna().all().all()
+        assert np.allclose(stats.evaluate_trends(fits, df, 'x', by='g'), df.y, atol=1e-6)
+        assert np.allclose(fits.rms, 0, atol=1e-6)
+
+    def test_linear(self):
+        """Test the slope and intercept of linear fits, with weights and without groups."""
+        df = pd.DataFrame({'x': [0.0, 1.0, 2.0, 3.0], 'y': [1.0, 3.0, 5.0, 100.0], 'w': [1.0, 1.0, 1.0, 0.0]})
+        fit = stats.fit_trends(df, 'x', 'y', weights='w').iloc[0]
+
+        assert np.isclose(fit.slope, 2) and np.isclose(fit.intercept, 1) and np.isclose(fit.rms, 0)
+
+    def test_underdetermined(self):
+        """Test that groups with too few distinct x values have NaN coefficients, and that missing values are
+        ignored.
+        """
+        df = pd.DataFrame({'g': [1, 1, 2, 2, 2], 'x': [1.0, 1.0, 1.0, 2.0, np.nan], 'y': [1.0, 2.0, 1.0, 2.0, 5.0]})
+        fits = stats.fit_trends(df, 'x', 'y', by='g')
+
+        assert fits.slope.isna().tolist() == [True, False]
+        assert fits.n.tolist() == [2, 2]
+
+    def test_evaluate_and_plot(self):
+        """Test that fits can be evaluated for each row, and sampled as lines for plotting."""
+        fits = stats.fit_trends(TREND_DATA, 'x', 'y', by='cenwave')
+        predicted = stats.evaluate_trends(fits, TREND_DATA, 'x', by='cenwave')
+
+        assert predicted.index.equals(TREND_DATA.index)
+        assert np.abs(predicted - TREND_DATA.y).max() < 1
+
+        lines = stats.trend_lines(fits, points=3)
+
+        assert list(lines.columns) == ['cenwave', 'x', 'y'] and len(lines) == 3 * GROUPS
+        assert np.isclose(lines.x.iloc[0], fits.x_min.iloc[0]) and np.isclose(lines.x.iloc[2], fits.x_max.iloc[0])
+
+
+class TestRobustStats:
+    """Test class for grouped robust statistics."""
+    def test_robust_stats(self):
+        """Test that the statistics match pandas' grouped reductions."""
+        result = stats.robust_stats(TREND_DATA, 'y', by='segment')
+        grouped = TREND_DATA.groupby('segment').y
+
+        assert result.segment.tolist() == ['FUVA', 'FUVB']
+        assert np.allclose(result['median'], grouped.median())
+        assert np.allclose(result['mean'], grouped.mean())
+        assert np.allclose(result['std'], grouped.std())
+        assert np.allclose(result['min'], grouped.min()) and np.allclose(result['max'], grouped.max())
+
+        mad = grouped.apply(lambda values: stats.MAD_SCALE * np.median(np.abs(values - values.median())))
+        assert np.allclose(result['mad'], mad)
+
+    def test_outliers(self):
+        """Test that values far from their group's median are flagged."""
+        df = pd.DataFrame({'g': ['a'] * 6 + ['b'] * 6, 'v': [1, 2, 1, 2, 1, 9, 10, 11, 10, 11, 10, 11]})
+        outliers = stats.robust_outliers(df, 'v', by='g', threshold=3)
+
+        assert outliers.tolist() == [False] * 5 + [True] + [False] * 6
+
+
+class TestBreakpoints:
+    """Test class for step change detection."""
+    def test_breakpoints(self):
+        """Test that the step is found in each group, regardless of the row order."""
+        rng = np.random.default_rng(2)
+        x = np.tile(np.arange(40.0), 2)
+        step = np.r_[np.arange(40) >= 25, np.arange(40) >= 10]
+        df = pd.DataFrame({'g': np.repeat(['a', 'b'], 40), 'x': x, 'y': 5 * step + rng.normal(0, 0.5, 80)})
+
+        result = stats.breakpoints(df.sample(frac=1, random_state=0), 'x', 'y', by='g')
+
+        assert result.break_x.tolist() == [25.0, 10.0]
+        assert np.allclose(result['shift'], 5, atol=0.5)
+        assert (result.t > 10).all()
+
+    def test_too_few_points(self):
+        """Test that groups without enough points for min_size have no breakpoint."""
+        df = pd.DataFrame({'x': np.arange(6.0), 'y': [0, 0, 0, 1, 1, 1]})
+
+        assert np.isnan(stats.breakpoints(df, 'x', 'y', min_size=4).break_x.iloc[0])
+        assert stats.breakpoints(df, 'x', 'y', min_size=3).break_x.iloc[0] == 3